@@ -2,13 +2,28 @@
 Controlador de Rutas de Autenticación OAuth
 Incluye tanto OAuth 2.0 con Google como autenticación por credenciales
 """
-from flask import Blueprint, redirect, url_for, render_template, jsonify, request, session, send_file
+from flask import Blueprint, redirect, url_for, render_template, jsonify, request, session, send_file, Response
+from werkzeug.utils import secure_filename
 from auth.models.oauth_model import OAuthModel
+import functools
+import os
 import requests
-import tempfile
+import threading
+import time
 from digital_signer import DigitalSigner
+from config import Config
+from auth.models.sign_jobs import SigningJobQueue, QueueFullError, DONE, FINAL_STATES
+from auth.models.signing_io import SigningWorkspace, open_and_unlink, zip_stream
+from auth.models.signed_cache import SignedOutputCache, certificate_fingerprint
 
-signer = DigitalSigner()
+# Cola de firmas en segundo plano (se inicializará en init_auth_routes)
+sign_jobs = None
+
+# Lotes de firma atendidos a la vez por este proceso
+batch_slots = threading.BoundedSemaphore(Config.SIGN_BATCH_MAX_ACTIVE)
+
+# Extensiones que acepta /sign/batch (ver DigitalSigner.sign_file)
+BATCH_EXTENSIONS = ('.pdf', '.txt', '.zip')
 
 # Crear Blueprint para el controlador de autenticación
 auth_bp = Blueprint('auth', __name__)
@@ -24,8 +39,35 @@ def init_auth_routes(app):
     Args:
         app: Aplicación Flask
     """
-    global oauth_model
+    global oauth_model, sign_jobs
     oauth_model = OAuthModel(app)
+    sign_jobs = SigningJobQueue(
+        Config.SIGN_JOBS_DIR,
+        # Cada proceso hijo de la cola crea su propio firmador
+        functools.partial(
+            DigitalSigner,
+            renderer_pool_size=Config.SIGNER_RENDERER_POOL,
+            signature_cache_size=Config.SIGNER_SIGNATURE_CACHE,
+            warm=Config.SIGNER_WARMUP
+        ),
+        max_workers=Config.SIGN_JOBS_WORKERS,
+        max_pending=Config.SIGN_JOBS_MAX_PENDING,
+        timeout=Config.SIGN_JOBS_TIMEOUT,
+        ttl=Config.SIGN_JOBS_TTL,
+        memory_dir=Config.SIGN_MEMORY_DIR,
+        memory_limit=Config.SIGN_MEMORY_MAX_BYTES,
+        memory_total=Config.SIGN_MEMORY_TOTAL_BYTES,
+        cache=SignedOutputCache(Config.SIGN_CACHE_DIR, Config.SIGN_CACHE_MAX_BYTES) if Config.SIGN_CACHE_ENABLED else None
+    )
+
+
+def after_fork():
+    """
+    Reinicia en un worker recién creado (gunicorn con la app precargada) los
+    hilos que no sobreviven al fork.
+    """
+    if oauth_model is not None:
+        oauth_model.after_fork()
 
 
 @auth_bp.route('/')
@@ -36,7 +78,7 @@ def index():
     Returns:
         Template de login o redirección a página de chat
     """
-    if oauth_model.is_authenticated():
+    if oauth_model.is_authenticated(fresh=False):
         return redirect(url_for('auth.chat'))
     return render_template('login.html')
 
@@ -86,6 +128,7 @@ def credentials_login():
         }
         
         # Guardar en sesión usando el mismo formato que OAuth
+        oauth_model.regenerate_session()
         session['oauth_user'] = user_info
         session['chat_token'] = email
         
@@ -143,18 +186,17 @@ def chat():
     Returns:
         Template chat_room o redirección a login si no está autenticado
     """
-    if not oauth_model.is_authenticated():
+    if not oauth_model.is_authenticated(fresh=False):
         return redirect(url_for('auth.index'))
     
-    user = oauth_model.get_current_user()
-    response = render_template('chat_room.html', user=user)
+    user = oauth_model.get_current_user(fresh=False)
+    response = render_template('chat_room.html', user=user, integrity_mode=Config.INTEGRITY_MODE)
     
-    # Agregar headers para prevenir caché del navegador
+    # La página (con datos del usuario) se revalida siempre y no pasa por cachés
+    # compartidas; sus CSS/JS con hash sí quedan en la caché del navegador
     from flask import make_response
     resp = make_response(response)
-    resp.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    resp.headers['Pragma'] = 'no-cache'
-    resp.headers['Expires'] = '0'
+    resp.headers['Cache-Control'] = 'private, no-cache'
     return resp
 
 
@@ -176,21 +218,51 @@ def get_chat_token():
 
 @auth_bp.route("/sign")
 def sign_page():
-    if not oauth_model.is_authenticated():
+    if not oauth_model.is_authenticated(fresh=False):
         return redirect(url_for('auth.index'))
 
     return render_template("sign_pdf.html")
 
-@auth_bp.route('/sign/pdf', methods=['POST'])
-def sign_pdf():
+def _job_payload(job):
     """
-    Firma un PDF usando IronPDF.
+    Representación JSON de un trabajo de firma.
+    
+    Args:
+        job: Estado del trabajo (dict de SigningJobQueue)
+        
+    Returns:
+        dict con estado y URLs de consulta/descarga
+    """
+    payload = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'filename': job['filename'],
+        'size': job.get('size'),
+        'sha256': job.get('sha256'),
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error'],
+        'cached': job.get('cached', False),
+        'status_url': url_for('auth.sign_job_status', job_id=job['id']),
+    }
+    if job['status'] == DONE:
+        payload['result_url'] = url_for('auth.sign_job_result', job_id=job['id'])
+    return payload
+
+
+@auth_bp.route('/sign/jobs', methods=['POST'])
+def submit_sign_job():
+    """
+    Encola la firma de un PDF y responde inmediatamente.
     Requiere autenticación.
+    
+    Returns:
+        JSON con el trabajo (202), o error 400/401/503
     """
     if not oauth_model.is_authenticated():
         return jsonify({'error': 'No autenticado'}), 401
 
-    # 1. Obtener los archivos enviados
     pdf_file = request.files.get("file")
     pfx_file = request.files.get("pfx")
     password = request.form.get("password")
@@ -198,26 +270,241 @@ def sign_pdf():
     if not pdf_file or not pfx_file or not password:
         return jsonify({'error': 'file, pfx y password son obligatorios'}), 400
 
-    # 2. Crear temporales
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-        input_pdf = tmp_pdf.name
-        pdf_file.save(input_pdf)
+    try:
+        job = sign_jobs.submit(
+            oauth_model.get_chat_token(),
+            pdf_file,
+            pfx_file,
+            password,
+            filename=pdf_file.filename,
+            size_hint=request.content_length
+        )
+    except QueueFullError:
+        resp = jsonify({'error': 'Demasiadas firmas en curso, inténtalo más tarde'})
+        resp.headers['Retry-After'] = '5'
+        return resp, 503
+
+    resp = jsonify(_job_payload(job))
+    resp.headers['Location'] = url_for('auth.sign_job_status', job_id=job['id'])
+    return resp, 202
+
+
+@auth_bp.route('/sign/jobs/<job_id>')
+def sign_job_status(job_id):
+    """
+    Consulta el estado de un trabajo de firma del usuario.
+    
+    Returns:
+        JSON con el trabajo o error 401/404
+    """
+    if not oauth_model.is_authenticated(fresh=False):
+        return jsonify({'error': 'No autenticado'}), 401
+
+    # Sin dueño (la entrada de la caché caducó y la sesión ya no existe) no hay trabajo
+    owner = oauth_model.get_chat_token(fresh=False)
+    job = sign_jobs.get(job_id, owner=owner) if owner else None
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(_job_payload(job)), 200
+
+
+def _send_signed(source, job):
+    """
+    Respuesta con el PDF firmado de un trabajo.
+    
+    ``X-Signed-Cache: hit`` indica que el PDF salió de la caché de firmas: es
+    la firma hecha la primera vez, con su fecha, no una firma nueva.
+    """
+    resp = send_file(source, mimetype='application/pdf', as_attachment=True, download_name="signed.pdf")
+    resp.headers['X-Signed-Cache'] = 'hit' if job.get('cached') else 'miss'
+    return resp
+
+
+@auth_bp.route('/sign/jobs/<job_id>/result')
+def sign_job_result(job_id):
+    """
+    Descarga el PDF firmado de un trabajo terminado.
+    
+    Returns:
+        Archivo PDF, o error 401/404/409 (aún no terminado o fallido)
+    """
+    if not oauth_model.is_authenticated():
+        return jsonify({'error': 'No autenticado'}), 401
+
+    owner = oauth_model.get_chat_token()
+    job = sign_jobs.get(job_id, owner=owner)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pfx") as tmp_pfx:
-        pfx_path = tmp_pfx.name
-        pfx_file.save(pfx_path)
+    path = sign_jobs.result_path(job_id, owner=owner)
+    if path is None:
+        return jsonify(dict(_job_payload(job), error=job['error'] or 'El trabajo no ha terminado')), 409
+    return _send_signed(path, job)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_out:
-        output_pdf = tmp_out.name
 
-    # 3. Firmar el PDF
+@auth_bp.route('/sign/jobs/<job_id>', methods=['DELETE'])
+def cancel_sign_job(job_id):
+    """
+    Cancela un trabajo de firma (si ya terminó, no cambia su estado).
+    
+    Returns:
+        JSON con el estado final o error 401/404
+    """
+    if not oauth_model.is_authenticated():
+        return jsonify({'error': 'No autenticado'}), 401
+
+    job = sign_jobs.cancel(job_id, owner=oauth_model.get_chat_token())
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(_job_payload(job)), 200
+
+
+@auth_bp.route('/sign/pdf', methods=['POST'])
+def sign_pdf():
+    """
+    Firma un PDF usando IronPDF y devuelve el resultado en la misma respuesta.
+    Requiere autenticación.
+    
+    Compatibilidad con clientes anteriores: la firma se ejecuta en la cola de
+    trabajos y la petición espera como mucho ``SIGN_PDF_MAX_WAIT`` segundos.
+    Si no ha terminado, responde 202 con el trabajo (como ``/sign/jobs``) en
+    lugar de ocupar el worker web hasta ``SIGN_JOBS_TIMEOUT``.
+    
+    Returns:
+        Archivo PDF, 202 con el trabajo pendiente, o error 400/401/500/503
+    """
+    resp = submit_sign_job()
+    body, status = resp if isinstance(resp, tuple) else (resp, 200)
+    if status != 202:
+        return resp
+
+    job_id = body.get_json()['job_id']
+    owner = oauth_model.get_chat_token()
+    deadline = time.monotonic() + Config.SIGN_PDF_MAX_WAIT
+    job = sign_jobs.get(job_id, owner=owner)
+    while job is not None and job['status'] not in FINAL_STATES and time.monotonic() < deadline:
+        time.sleep(0.1)
+        job = sign_jobs.get(job_id, owner=owner)
+
+    if job is not None and job['status'] not in FINAL_STATES:
+        # Sigue en la cola: el cliente lo consulta en la URL de Location
+        resp = jsonify(_job_payload(job))
+        resp.headers['Location'] = url_for('auth.sign_job_status', job_id=job_id)
+        return resp, 202
+
+    path = sign_jobs.result_path(job_id, owner=owner)
+    if path is None:
+        error = (job or {}).get('error') or 'El trabajo de firma desapareció'
+        sign_jobs.delete(job_id)
+        return jsonify({'error': f'Error firmando PDF: {error}'}), 500
+
+    # El PDF se envía desde el descriptor abierto y el trabajo se borra ya:
+    # no queda ninguna copia en disco después de la respuesta
+    signed = open_and_unlink(path)
+    sign_jobs.delete(job_id)
+    return _send_signed(signed, job)
+
+@auth_bp.route('/sign/batch', methods=['POST'])
+def sign_batch():
+    """
+    Firma varios documentos (PDF, TXT o ZIP) con un mismo certificado.
+    Requiere autenticación.
+    
+    Recibe ``files`` (varios), ``pfx`` y ``password``. Responde con un ZIP que
+    se va enviando a medida que terminan las firmas; los documentos que
+    fallen se listan en ``errores.txt`` dentro del mismo ZIP.
+    
+    Returns:
+        ZIP en streaming, o error 400/401/413/503
+    """
+    if not oauth_model.is_authenticated():
+        return jsonify({'error': 'No autenticado'}), 401
+
+    files = [f for f in request.files.getlist("files") if f and f.filename]
+    pfx_file = request.files.get("pfx")
+    password = request.form.get("password")
+
+    if not files or not pfx_file or not password:
+        return jsonify({'error': 'files, pfx y password son obligatorios'}), 400
+    if len(files) > Config.SIGN_BATCH_MAX_FILES:
+        return jsonify({'error': f'Máximo {Config.SIGN_BATCH_MAX_FILES} documentos por lote'}), 413
+
+    names = []
+    for i, f in enumerate(files):
+        name = secure_filename(f.filename) or f'documento_{i + 1}.pdf'
+        if os.path.splitext(name)[1].lower() not in BATCH_EXTENSIONS:
+            return jsonify({'error': f'Tipo de archivo no soportado: {f.filename}'}), 400
+        names.append(name)
+
+    if not batch_slots.acquire(blocking=False):
+        resp = jsonify({'error': 'Demasiados lotes en curso, inténtalo más tarde'})
+        resp.headers['Retry-After'] = '5'
+        return resp, 503
+
+    workspace = SigningWorkspace(request.content_length, Config.SIGN_MEMORY_MAX_BYTES, Config.SIGN_MEMORY_DIR,
+                                 memory_total=Config.SIGN_MEMORY_TOTAL_BYTES)
     try:
-        signer.sign_pdf(input_pdf, output_pdf, pfx_path, password)
-    except Exception as e:
-        return jsonify({'error': f'Error firmando PDF: {str(e)}'}), 500
+        workspace.save_stream('cert.pfx', pfx_file.stream)
+        try:
+            # Falla pronto (contraseña incorrecta) en lugar de una vez por documento
+            certificate_fingerprint(workspace.file('cert.pfx'), password)
+        except Exception as e:
+            raise ValueError(f'No se pudo cargar el certificado: {e}') from e
+
+        for i, (f, name) in enumerate(zip(files, names)):
+            workspace.save_stream(f'{i:04d}-{name}', f.stream)
 
-    # 4. Devolver archivo firmado
-    return send_file(output_pdf, as_attachment=True, download_name="signed.pdf")
+        # Rutas tras escribir todo: si el tmpfs se llenó, la carpeta pasó a disco
+        pfx_path = workspace.file('cert.pfx')
+        documents = {}
+        used = set()
+        for i, (f, name) in enumerate(zip(files, names)):
+            input_path = workspace.file(f'{i:04d}-{name}')
+            stem = os.path.splitext(name)[0]
+            arcname = f'{stem}_firmado.pdf'
+            if arcname in used:
+                arcname = f'{stem}_{i + 1}_firmado.pdf'
+            used.add(arcname)
+            documents[input_path] = (workspace.file(f'{i:04d}-signed.pdf'), arcname, f.filename)
+    except ValueError as e:
+        workspace.cleanup()
+        batch_slots.release()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        workspace.cleanup()
+        batch_slots.release()
+        raise
+
+    results = sign_jobs.sign_many(
+        ((input_path, output) for input_path, (output, _, _) in documents.items()),
+        pfx_path,
+        password,
+        max_workers=Config.SIGN_BATCH_WORKERS
+    )
+
+    def entries():
+        errors = []
+        for input_path, output, error in results:
+            _, arcname, original = documents[input_path]
+            os.remove(input_path)
+            if error is not None:
+                errors.append(f'{original}: {error}')
+                continue
+            yield arcname, output
+            # Ya está en el ZIP: liberar el espacio (tmpfs) cuanto antes
+            os.remove(output)
+        if errors:
+            yield 'errores.txt', ('\n'.join(errors) + '\n').encode('utf-8')
+
+    def cleanup():
+        results.close()
+        workspace.cleanup()
+        batch_slots.release()
+
+    resp = Response(zip_stream(entries()), mimetype='application/zip')
+    resp.headers['Content-Disposition'] = 'attachment; filename="documentos_firmados.zip"'
+    resp.call_on_close(cleanup)
+    return resp
 
 @auth_bp.route('/logout')
 def logout():
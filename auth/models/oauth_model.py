@@ -7,6 +7,9 @@ import ssl
 import certifi
 from authlib.integrations.flask_client import OAuth
 from flask import session
+from config import Config
+from auth.models.oidc_cache import OIDCMetadataCache
+from auth.models.session_store import TTLCache
 
 
 class OAuthModel:
@@ -24,6 +27,9 @@ class OAuthModel:
         """
         self.oauth = OAuth()
         self.google = None
+        self.oidc_cache = None
+        # Usuario de cada sesión del servidor (por sid) para las páginas de solo lectura
+        self._users = TTLCache(Config.SESSION_CACHE_TTL)
         if app:
             self.init_app(app)
 
@@ -44,13 +50,36 @@ class OAuthModel:
             name='google',
             client_id=os.getenv('GOOGLE_CLIENT_ID'),
             client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            server_metadata_url=Config.OIDC_DISCOVERY_URL,
             client_kwargs={
                 'scope': 'openid email profile',
                 'verify': certifi.where()  # Usar certificados de certifi
             }
         )
 
+        # Metadatos de descubrimiento y JWKS desde la caché en disco: el primer
+        # login tras un despliegue no espera a Google. Si no hay copia ni red,
+        # Authlib los descargará de server_metadata_url como siempre.
+        self.oidc_cache = OIDCMetadataCache(
+            Config.OIDC_DISCOVERY_URL,
+            Config.OIDC_CACHE_FILE,
+            ttl=Config.OIDC_CACHE_TTL,
+            timeout=Config.OIDC_FETCH_TIMEOUT,
+            fixture=Config.OIDC_FIXTURE or None
+        )
+        if self.oidc_cache.prefill(self.google):
+            self.oidc_cache.start_background_refresh(self.google)
+
+    def after_fork(self):
+        """
+        Rearranca en un worker recién creado el hilo de renovación OIDC.
+
+        Los hilos no sobreviven al fork: con la app precargada, el hilo del
+        proceso maestro no existe en los workers.
+        """
+        if self.oidc_cache is not None:
+            self.oidc_cache.start_background_refresh(self.google)
+
     def get_authorization_url(self, redirect_uri):
         """
         Genera la URL de autorización de Google.
@@ -61,6 +90,9 @@ class OAuthModel:
         Returns:
             Respuesta de redirección a Google OAuth
         """
+        # Por si el proceso viene de un fork que no pasó por after_fork()
+        self.oidc_cache.start_background_refresh(self.google)
+        self.oidc_cache.sync(self.google)
         return self.google.authorize_redirect(redirect_uri)
 
     def get_token(self):
@@ -73,6 +105,8 @@ class OAuthModel:
         Raises:
             Exception: Si falla la obtención del token
         """
+        # Claves (JWKS) renovadas por otro worker para validar el id_token
+        self.oidc_cache.sync(self.google)
         return self.google.authorize_access_token()
 
     def get_user_info(self, token):
@@ -98,6 +132,7 @@ class OAuthModel:
         Args:
             user_info: Información del usuario obtenida de Google
         """
+        self.regenerate_session()
         session['oauth_user'] = {
             'email': user_info.get('email'),
             'name': user_info.get('name'),
@@ -107,37 +142,84 @@ class OAuthModel:
         # También guardamos el email como token para el chat
         session['chat_token'] = user_info.get('email')
 
-    def get_current_user(self):
+    def regenerate_session(self):
+        """
+        Asigna un nuevo identificador a la sesión del servidor (evita la
+        fijación de sesión al autenticarse). Sin sesiones en el servidor no hace nada.
+        """
+        regenerate = getattr(session, 'regenerate', None)
+        if regenerate is not None:
+            self._users.pop(session.sid)
+            regenerate()
+
+    def _session_user(self, fresh):
+        """
+        Usuario y token del chat de la sesión actual, como (usuario, token).
+
+        Con ``fresh=False`` se sirve durante ``SESSION_CACHE_TTL`` segundos
+        desde la caché de este proceso (por sid, con el email del usuario) sin
+        leer la sesión del backend. Una lectura fresca actualiza la caché, así
+        que un cierre de sesión en otro worker deja de servirse en cuanto
+        cualquier ruta sensible lo ve.
+        """
+        sid = getattr(session, 'sid', None)
+        if sid is None:
+            # Sesión en cookie: ya está en la petición
+            return session.get('oauth_user'), session.get('chat_token')
+        if not fresh:
+            cached = self._users.get(sid)
+            if cached is not None:
+                return cached
+        user, token = session.get('oauth_user'), session.get('chat_token')
+        if user is not None and session.sid == sid:
+            self._users.set(sid, (user, token))
+        else:
+            self._users.pop(sid)
+        return user, token
+
+    def get_current_user(self, fresh=True):
         """
         Obtiene el usuario actual de la sesión.
         
+        Args:
+            fresh: False en páginas de solo lectura para usar la caché de usuarios
+            
         Returns:
             Información del usuario o None si no está autenticado
         """
-        return session.get('oauth_user')
+        return self._session_user(fresh)[0]
 
-    def get_chat_token(self):
+    def get_chat_token(self, fresh=True):
         """
         Obtiene el token (email) para autenticación del chat.
         
+        Args:
+            fresh: False en páginas de solo lectura para usar la caché de usuarios
+            
         Returns:
             Email del usuario autenticado o None
         """
-        return session.get('chat_token')
+        return self._session_user(fresh)[1]
 
-    def is_authenticated(self):
+    def is_authenticated(self, fresh=True):
         """
         Verifica si el usuario está autenticado.
         
+        Args:
+            fresh: False en páginas de solo lectura para usar la caché de usuarios
+            
         Returns:
             True si el usuario está autenticado, False en caso contrario
         """
-        user = self.get_current_user()
+        user = self.get_current_user(fresh)
         return user is not None and user.get('authenticated', False)
 
     def logout_user(self):
         """
         Cierra la sesión del usuario eliminando datos de sesión.
         """
+        sid = getattr(session, 'sid', None)
+        if sid is not None:
+            self._users.pop(sid)
         session.pop('oauth_user', None)
         session.pop('chat_token', None)
@@ -0,0 +1,208 @@
+"""
+Caché en disco del documento de descubrimiento OpenID y de las claves (JWKS).
+
+Authlib descarga ``/.well-known/openid-configuration`` y ``jwks_uri`` de forma
+perezosa en cada worker y tras cada reinicio, justo durante el primer login.
+``OIDCMetadataCache`` guarda ambos en un archivo compartido con un TTL, los
+entrega al cliente OAuth ya cargados y los renueva en segundo plano antes de
+que caduquen; si el proveedor está lento o caído se sigue usando la copia
+anterior en lugar de bloquear los logins. Solo un worker descarga cada
+renovación: los demás recargan su cliente desde el archivo al ver que su
+``fetched_at`` es más reciente que el de la copia que tienen en memoria.
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+
+
+class OIDCMetadataCache:
+    """
+    Metadatos OIDC + JWKS cacheados en disco.
+
+    Args:
+        discovery_url: URL del documento de descubrimiento
+        path: Archivo de la caché (compartido por todos los workers)
+        ttl: Segundos tras los que se vuelve a descargar
+        timeout: Timeout de cada petición HTTP
+        fixture: Archivo JSON local que sustituye al proveedor (pruebas)
+    """
+
+    def __init__(self, discovery_url, path, ttl=21600, timeout=5, fixture=None):
+        self.discovery_url = discovery_url
+        self.path = str(path)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.fixture = fixture
+        self._lock = threading.Lock()
+        # fetched_at de la copia cargada en el cliente (None = ninguna); con su
+        # propio lock para no esperar a una descarga en curso
+        self._applied_at = None
+        self._apply_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    # ===== API PÚBLICA =====
+
+    def load(self):
+        """
+        Retorna los metadatos con ``jwks`` incluido.
+
+        Usa la copia en disco si existe (aunque haya caducado: en ese caso la
+        renovación queda para el hilo de fondo) y solo descarga de forma
+        síncrona cuando no hay ninguna copia.
+
+        Returns:
+            dict o None si no hay copia y la descarga falla
+        """
+        record = self._load_record()
+        return record['metadata'] if record is not None else None
+
+    def prefill(self, client):
+        """
+        Carga los metadatos en ``client.server_metadata`` de Authlib.
+
+        Con ``_loaded_at`` y ``jwks`` presentes, Authlib ya no hace las
+        peticiones de descubrimiento ni de claves durante el login.
+
+        Returns:
+            True si se pudieron cargar
+        """
+        record = self._load_record()
+        if record is None:
+            return False
+        self._apply(client, record)
+        return True
+
+    def sync(self, client):
+        """
+        Recarga ``client.server_metadata`` si el archivo tiene una copia más
+        reciente que la cargada (la renovó otro worker).
+
+        Returns:
+            True si se actualizó el cliente
+        """
+        if self.fixture:
+            return False
+        record = self._read()
+        if record is None:
+            return False
+        return self._apply(client, record)
+
+    def refresh(self):
+        """
+        Descarga el documento de descubrimiento y el JWKS y los guarda.
+
+        Returns:
+            dict con ``fetched_at`` y ``metadata``
+        """
+        with self._lock:
+            # Otro worker pudo renovarla mientras esperábamos
+            record = self._read()
+            if record is not None and not self._is_stale(record):
+                return record
+
+            metadata = self._get_json(self.discovery_url)
+            jwks_uri = metadata.get('jwks_uri')
+            if jwks_uri:
+                metadata['jwks'] = self._get_json(jwks_uri)
+
+            record = {'fetched_at': time.time(), 'metadata': metadata}
+            self._write(record)
+            return record
+
+    def start_background_refresh(self, client=None, interval=None):
+        """
+        Lanza un hilo daemon que renueva la caché antes de que caduque.
+
+        Es idempotente y se puede llamar en cada login: tras un fork (workers
+        de gunicorn con la app precargada) arranca el hilo en el proceso hijo.
+
+        Args:
+            client: Cliente de Authlib cuyos metadatos se actualizan al renovar
+            interval: Segundos entre comprobaciones (por defecto, una décima del TTL)
+        """
+        if self.fixture or (self._thread is not None and self._thread_pid == os.getpid()):
+            return
+        interval = interval or max(30, self.ttl / 10)
+
+        def loop():
+            while not self._stop.wait(interval):
+                record = self._read()
+                if record is None or self._is_stale(record, margin=interval * 2):
+                    try:
+                        record = self.refresh()
+                    except Exception as e:
+                        print(f"⚠️  Error renovando la configuración OIDC: {e}")
+                        continue
+                if client is not None:
+                    # También cuando la renovó otro worker
+                    self._apply(client, record)
+
+        self._thread = threading.Thread(target=loop, name='OIDCMetadataRefresh', daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de renovación."""
+        self._stop.set()
+
+    # ===== AUXILIARES =====
+
+    def _load_record(self):
+        """Copia en disco, o la fixture, o una descarga si no hay ninguna."""
+        if self.fixture:
+            return {'fetched_at': 0, 'metadata': self._read_fixture()}
+
+        record = self._read()
+        if record is not None:
+            return record
+        try:
+            return self.refresh()
+        except Exception as e:
+            print(f"⚠️  No se pudo descargar la configuración OIDC ({self.discovery_url}): {e}")
+            return None
+
+    def _apply(self, client, record):
+        """Carga ``record`` en el cliente si es más reciente que la copia que tiene."""
+        fetched_at = record.get('fetched_at', 0)
+        with self._apply_lock:
+            if self._applied_at is not None and fetched_at <= self._applied_at:
+                return False
+            client.server_metadata.update(record['metadata'])
+            client.server_metadata['_loaded_at'] = time.time()
+            self._applied_at = fetched_at
+        return True
+
+    def _is_stale(self, record, margin=0):
+        return time.time() - record.get('fetched_at', 0) + margin >= self.ttl
+
+    def _get_json(self, url):
+        resp = requests.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not isinstance(record.get('metadata'), dict):
+            return None
+        return record
+
+    def _read_fixture(self):
+        with open(self.fixture, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, record):
+        """Escribe la caché de forma atómica (archivo temporal + rename)."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp, self.path)
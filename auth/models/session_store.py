@@ -0,0 +1,370 @@
+"""
+Sesiones de Flask guardadas en el servidor.
+
+La cookie solo lleva un identificador aleatorio; los datos viven en un backend
+compartido por todos los workers (SQLite o una carpeta de archivos), así que
+un usuario sigue autenticado aunque cada petición la atienda un proceso
+distinto. La sesión se lee del backend la primera vez que la petición la
+usa (los estáticos, o una página que resuelve el usuario desde la caché de
+OAuthModel, no la leen nunca) y solo se escribe cuando cambia.
+"""
+import functools
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class TTLCache:
+    """
+    Caché en memoria con caducidad por entrada y tamaño máximo (LRU).
+
+    Args:
+        ttl: Segundos de vida de cada entrada (0 = caché deshabilitada)
+        max_entries: Entradas como máximo
+    """
+
+    def __init__(self, ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna el valor o None si no está o caducó."""
+        if self.ttl <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# ===== BACKENDS =====
+
+class SessionBackend:
+    """
+    Almacén de sesiones: datos serializados (JSON) por identificador.
+
+    Las implementaciones deben poder usarse desde varios hilos y procesos.
+    """
+
+    def load(self, sid):
+        """Retorna el JSON de la sesión o None si no existe o caducó."""
+        raise NotImplementedError
+
+    def save(self, sid, data, ttl):
+        """Guarda el JSON de la sesión durante ``ttl`` segundos."""
+        raise NotImplementedError
+
+    def delete(self, sid):
+        """Elimina la sesión."""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Elimina las sesiones caducadas."""
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sesiones en una base SQLite local (modo WAL, una conexión por hilo).
+
+    Las conexiones se abren en el primer uso de cada hilo y proceso: crear el
+    backend no abre ninguna, así que un fork (gunicorn con la app precargada)
+    nunca comparte una conexión entre procesos.
+
+    Args:
+        path: Archivo de la base de datos
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # La heredada de otro proceso no se cierra: es del padre
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                ' sid TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL,'
+                ' expires REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        row = self._connection().execute(
+            'SELECT data FROM sessions WHERE sid = ? AND expires > ?',
+            (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data, ttl):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+            (sid, data, time.time() + ttl)
+        )
+
+    def delete(self, sid):
+        self._connection().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def purge_expired(self):
+        self._connection().execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+
+
+class FileSessionBackend(SessionBackend):
+    """
+    Sesiones como archivos JSON en una carpeta (escritura atómica).
+
+    El nombre de cada archivo es el SHA-256 del identificador, así que el
+    contenido de la carpeta no permite reconstruir cookies válidas.
+
+    Args:
+        directory: Carpeta de las sesiones
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, hashlib.sha256(sid.encode('utf-8')).hexdigest())
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get('expires', 0) <= time.time():
+            self.delete(sid)
+            return None
+        return record.get('data')
+
+    def save(self, sid, data, ttl):
+        path = self._path(sid)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'expires': time.time() + ttl, 'data': data}, f)
+        os.replace(tmp, path)
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expires = json.load(f).get('expires', 0)
+            except (OSError, ValueError):
+                continue
+            if expires <= now:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def create_session_backend(kind, path):
+    """
+    Crea el backend configurado.
+
+    Args:
+        kind: 'sqlite' o 'filesystem'
+        path: Archivo SQLite o carpeta de sesiones
+
+    Raises:
+        ValueError: Si el tipo no existe
+    """
+    if kind == 'sqlite':
+        return SQLiteSessionBackend(path)
+    if kind == 'filesystem':
+        return FileSessionBackend(path)
+    raise ValueError(f"Backend de sesiones desconocido: {kind}")
+
+
+# ===== INTERFAZ DE FLASK =====
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    Sesión de Flask que recuerda su identificador y si fue modificada.
+
+    Con ``loader`` los datos se leen al usarla por primera vez; si ya no
+    existen en el backend, pasa a ser una sesión nueva con otro identificador.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, loader=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+        self._loader = loader
+
+    @property
+    def loaded(self):
+        """Si los datos ya se leyeron del backend."""
+        return self._loader is None
+
+    def load(self):
+        """Lee los datos del backend si aún no se hizo."""
+        loader, self._loader = self._loader, None
+        if loader is None:
+            return
+        data = loader()
+        if data is None:
+            # Caducada o cerrada (quizá en otro worker)
+            self.sid = secrets.token_urlsafe(32)
+            self.new = True
+        else:
+            dict.update(self, data)
+
+    def regenerate(self):
+        """Cambia el identificador conservando los datos (al iniciar sesión)."""
+        self.load()
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+def _loading(name):
+    method = getattr(CallbackDict, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Cualquier lectura o escritura del dict carga antes la sesión
+for _name in ('__getitem__', '__contains__', '__iter__', '__len__', '__repr__', '__eq__', '__ne__',
+              '__or__', '__ior__', 'get', 'keys', 'values', 'items', 'copy', '__setitem__',
+              '__delitem__', 'setdefault', 'pop', 'popitem', 'update', 'clear'):
+    setattr(ServerSideSession, _name, _loading(_name))
+del _name
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    SessionInterface que guarda los datos en un SessionBackend.
+
+    Args:
+        backend: Almacén de sesiones
+        purge_interval: Segundos entre limpiezas de sesiones caducadas
+    """
+
+    def __init__(self, backend, purge_interval=600):
+        self.backend = backend
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+
+    def _ttl(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            return ServerSideSession(sid=sid, loader=functools.partial(self._load, sid))
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def _load(self, sid):
+        """Datos de la sesión ``sid`` o None si no existe o no se puede leer."""
+        data = self.backend.load(sid)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        self._maybe_purge()
+
+        if not getattr(session, 'loaded', True):
+            # La petición no la usó: nada que guardar
+            return
+
+        if getattr(session, 'previous_sid', None):
+            self.backend.delete(session.previous_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                # Logout: borrar en el backend
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session) and not session.new:
+            # Sin cambios: ni escritura en el backend ni Set-Cookie
+            return
+
+        data = json.dumps(dict(session), separators=(',', ':'))
+        self.backend.save(session.sid, data, self._ttl(app))
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        try:
+            self.backend.purge_expired()
+        except Exception as e:
+            print(f"⚠️  Error limpiando sesiones caducadas: {e}")
@@ -0,0 +1,565 @@
+"""
+Cola de trabajos de firma de PDF.
+
+Las firmas se ejecutan en un pool de hilos acotado fuera del ciclo de la
+petición HTTP. El estado de cada trabajo vive en disco (``job.json`` dentro de
+su carpeta) para que cualquier worker de gunicorn pueda consultarlo, descargar
+el resultado o cancelarlo; la contraseña del certificado solo se guarda en
+memoria mientras el trabajo espera su turno. El PDF de entrada y el PFX van a
+un ``SigningWorkspace`` propio del trabajo que se borra al terminar la firma.
+
+Cada hilo del pool firma a través de un proceso hijo (``SignerProcess``): una
+firma de IronPDF no se puede interrumpir, pero el proceso sí se puede matar,
+así que un trabajo que agota su tiempo o se cancela libera su hueco de verdad.
+Los lotes (``sign_many``) usan los mismos hilos y procesos, con el mismo tiempo
+máximo por documento.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+from crypto.digests import guardar_con_hash
+from auth.models.signing_io import SigningWorkspace, DEFAULT_MEMORY_DIR
+from auth.models.signed_cache import certificate_fingerprint
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+
+FINAL_STATES = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+INPUT_NAME = 'input.pdf'
+PFX_NAME = 'cert.pfx'
+OUTPUT_NAME = 'signed.pdf'
+STATE_NAME = 'job.json'
+CANCEL_NAME = 'cancel'
+
+# Cada cuánto (s) se comprueba la cancelación mientras firma el proceso hijo
+POLL_INTERVAL = 0.5
+
+
+class QueueFullError(RuntimeError):
+    """Demasiados trabajos pendientes en este proceso."""
+
+
+class SigningTimeout(RuntimeError):
+    """La firma superó su tiempo y se mató el proceso que la ejecutaba."""
+
+
+class SigningCancelled(RuntimeError):
+    """El trabajo se canceló mientras firmaba y se mató el proceso."""
+
+
+def _signer_main(conn, factory, tmpdir):
+    """Bucle del proceso hijo: recibe (método, argumentos) del firmador y responde."""
+    # Sus temporales (p. ej. las copias del PFX) van a una carpeta que borra el padre
+    tempfile.tempdir = tmpdir
+    try:
+        signer = factory()
+        startup_error = None
+    except Exception as e:
+        signer = None
+        startup_error = f'No se pudo iniciar el firmador: {e}'
+    while True:
+        try:
+            method, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if signer is None:
+            conn.send((False, startup_error))
+            continue
+        try:
+            getattr(signer, method)(*args)
+            conn.send((True, None))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class SignerProcess:
+    """
+    Proceso hijo con un firmador propio creado por ``factory``.
+
+    Se arranca (con ``spawn``: IronPDF y Chrome no sobreviven a un fork) en el
+    primer uso y se vuelve a arrancar después de matarlo. Sus temporales van a
+    una carpeta propia que se borra al pararlo, aunque haya muerto a la fuerza.
+
+    Args:
+        factory: Callable serializable que crea un objeto con ``sign_pdf``
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._process = None
+        self._conn = None
+        self._tmpdir = None
+
+    def sign_pdf(self, input_pdf, output_pdf, pfx_path, password, timeout, cancelled=None):
+        """
+        Firma un PDF en el proceso hijo esperando como máximo ``timeout`` segundos.
+
+        Raises:
+            SigningTimeout: Si se agotó el tiempo (el proceso se mata)
+            SigningCancelled: Si ``cancelled()`` pasó a ser cierto (el proceso se mata)
+            RuntimeError: Si la firma falló o el proceso murió
+        """
+        self._call('sign_pdf', (input_pdf, output_pdf, pfx_path, password), timeout, cancelled)
+
+    def sign_file(self, input_path, output_pdf, pfx_path, password, timeout, cancelled=None):
+        """
+        Como ``sign_pdf``, pero admite PDF, TXT o ZIP (``DigitalSigner.sign_file``).
+        """
+        self._call('sign_file', (input_path, output_pdf, pfx_path, password), timeout, cancelled)
+
+    def _call(self, method, args, timeout, cancelled):
+        if self._process is None or not self._process.is_alive():
+            self._start()
+        self._conn.send((method, args))
+        deadline = time.monotonic() + timeout
+        while not self._conn.poll(POLL_INTERVAL):
+            if time.monotonic() > deadline:
+                self.stop()
+                raise SigningTimeout('Tiempo de firma agotado')
+            if cancelled is not None and cancelled():
+                self.stop()
+                raise SigningCancelled('Firma cancelada')
+        try:
+            ok, error = self._conn.recv()
+        except EOFError:
+            self.stop()
+            raise RuntimeError('El proceso de firma terminó inesperadamente')
+        if not ok:
+            raise RuntimeError(error)
+
+    def stop(self):
+        """Mata el proceso hijo (si existe) y borra sus temporales."""
+        process, conn, tmpdir = self._process, self._conn, self._tmpdir
+        self._process = self._conn = self._tmpdir = None
+        if conn is not None:
+            conn.close()
+        if process is not None and process.is_alive():
+            process.kill()
+            process.join(5)
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _start(self):
+        self.stop()
+        context = multiprocessing.get_context('spawn')
+        self._tmpdir = tempfile.mkdtemp(prefix='pdf-sign-')
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_signer_main,
+            args=(child_conn, self.factory, self._tmpdir),
+            name='PdfSignProcess',
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+
+class SigningJobQueue:
+    """
+    Pool de firmas en segundo plano con concurrencia, cola y tiempo acotados.
+
+    Args:
+        directory: Carpeta donde se guardan los trabajos
+        signer_factory: Callable serializable que crea, dentro de cada proceso
+            hijo, un objeto con ``sign_pdf(input, output, pfx, password)``
+        max_workers: Firmas simultáneas (un proceso hijo por cada una)
+        max_pending: Trabajos en espera o en curso admitidos por proceso
+        timeout: Segundos máximos de una firma; al agotarse se mata su proceso
+        ttl: Segundos que se conservan los trabajos terminados
+        memory_dir: tmpfs para las entradas pequeñas ('' = siempre en disco)
+        memory_limit: Tamaño máximo de una subida que se guarda en memoria
+        memory_total: Bytes de tmpfs que pueden ocupar a la vez todas las subidas
+        cache: SignedOutputCache opcional; un acierto completa el trabajo sin firmar
+    """
+
+    def __init__(self, directory, signer_factory, max_workers=2, max_pending=32, timeout=120, ttl=3600,
+                 memory_dir=DEFAULT_MEMORY_DIR, memory_limit=16 * 1024 * 1024, memory_total=None,
+                 cache=None):
+        self.directory = directory
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.ttl = ttl
+        self.memory_dir = memory_dir
+        self.memory_limit = memory_limit
+        self.memory_total = memory_total
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Espacios de trabajo con las entradas de los trabajos de este proceso
+        self._workspaces = {}
+        self._last_purge = 0.0
+        os.makedirs(directory, exist_ok=True)
+        max_workers = max(1, max_workers)
+        self._signers = [SignerProcess(signer_factory) for _ in range(max_workers)]
+        # Procesos libres: cada hilo del pool toma uno mientras firma
+        self._idle_signers = queue.SimpleQueue()
+        for signer in self._signers:
+            self._idle_signers.put(signer)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='PdfSignThread'
+        )
+
+    # ===== API PÚBLICA =====
+
+    def submit(self, owner, pdf_file, pfx_file, password, filename=None, size_hint=None):
+        """
+        Guarda los archivos subidos y encola la firma.
+
+        Args:
+            owner: Email del usuario dueño del trabajo
+            pdf_file: FileStorage (o similar con ``stream``) del PDF
+            pfx_file: FileStorage del certificado PFX
+            password: Contraseña del certificado
+            filename: Nombre original del documento
+            size_hint: Tamaño aproximado de la subida (p. ej. Content-Length)
+
+        Returns:
+            dict: Estado inicial del trabajo
+
+        Raises:
+            QueueFullError: Si se alcanzó ``max_pending``
+        """
+        self.purge_expired()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError('Cola de firmas llena')
+            self._pending += 1
+
+        job_id = secrets.token_urlsafe(16)
+        job_dir = self._job_dir(job_id)
+        workspace = None
+        try:
+            os.makedirs(job_dir, mode=0o700)
+            workspace = SigningWorkspace(size_hint, self.memory_limit, self.memory_dir,
+                                         memory_total=self.memory_total)
+            # Se resume mientras se escribe: no hay que volver a leer el PDF
+            digests = workspace.save_stream(INPUT_NAME, pdf_file.stream, guardar_con_hash)
+            workspace.save_stream(PFX_NAME, pfx_file.stream)
+
+            state = {
+                'id': job_id,
+                'owner': owner,
+                'filename': filename or 'documento.pdf',
+                'size': digests['size'],
+                'sha256': digests['sha256'],
+                'status': QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'cached': False,
+            }
+
+            cache_key = self._cache_key(workspace, digests['sha256'], password)
+            if cache_key is not None and self.cache.get(cache_key, os.path.join(job_dir, OUTPUT_NAME)):
+                # Mismo documento y certificado: no hace falta firmar
+                now = time.time()
+                state.update(status=DONE, started_at=now, finished_at=now, cached=True)
+                self._write_state(job_id, state)
+                with self._lock:
+                    self._pending -= 1
+                workspace.cleanup()
+                return state
+
+            self._write_state(job_id, state)
+            with self._lock:
+                self._workspaces[job_id] = workspace
+            self._executor.submit(self._run, job_id, password, cache_key)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._workspaces.pop(job_id, None)
+            if workspace is not None:
+                workspace.cleanup()
+            self.delete(job_id)
+            raise
+        return state
+
+    def get(self, job_id, owner=None):
+        """
+        Retorna el estado de un trabajo.
+
+        Un trabajo en curso que superó ``timeout`` se reporta como ``timeout``
+        aunque el proceso que lo ejecuta aún no lo haya detectado (o haya muerto).
+
+        Args:
+            job_id: Identificador del trabajo
+            owner: Si se indica, solo se devuelve si pertenece a este usuario
+
+        Returns:
+            dict o None si no existe (o no es del usuario)
+        """
+        state = self._read_state(job_id)
+        if state is None or (owner is not None and state.get('owner') != owner):
+            return None
+        if state['status'] == RUNNING and time.time() - state['started_at'] > self.timeout:
+            state = self._finish(job_id, TIMEOUT, error='Tiempo de firma agotado')
+        return state
+
+    def result_path(self, job_id, owner=None):
+        """
+        Retorna la ruta del PDF firmado si el trabajo terminó correctamente.
+
+        Returns:
+            str o None
+        """
+        state = self.get(job_id, owner)
+        if state is None or state['status'] != DONE:
+            return None
+        path = os.path.join(self._job_dir(job_id), OUTPUT_NAME)
+        return path if os.path.exists(path) else None
+
+    def cancel(self, job_id, owner=None):
+        """
+        Cancela un trabajo.
+
+        Si aún no empezó, no llega a ejecutarse; si está en curso, el proceso
+        que lo firma se mata en menos de ``POLL_INTERVAL`` segundos.
+
+        Returns:
+            dict con el estado final, o None si no existe
+        """
+        state = self.get(job_id, owner)
+        if state is None:
+            return None
+        if state['status'] in FINAL_STATES:
+            return state
+        # Marca visible para el proceso que ejecuta la firma (puede ser otro worker)
+        open(os.path.join(self._job_dir(job_id), CANCEL_NAME), 'w').close()
+        return self._finish(job_id, CANCELLED)
+
+    def delete(self, job_id):
+        """Borra la carpeta de un trabajo."""
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def purge_expired(self):
+        """Elimina los trabajos terminados hace más de ``ttl`` segundos."""
+        now = time.time()
+        if now - self._last_purge < min(60, self.ttl):
+            return
+        self._last_purge = now
+
+        for job_id in os.listdir(self.directory):
+            state = self._read_state(job_id)
+            if state is None:
+                # Carpeta huérfana (proceso caído a mitad de submit)
+                job_dir = self._job_dir(job_id)
+                if os.path.isdir(job_dir) and now - os.path.getmtime(job_dir) > self.ttl:
+                    self.delete(job_id)
+                continue
+            finished = state.get('finished_at') or state.get('created_at', now)
+            if state['status'] in FINAL_STATES and now - finished > self.ttl:
+                self.delete(job_id)
+            elif state['status'] not in FINAL_STATES and now - state['created_at'] > self.ttl + self.timeout:
+                # Trabajo de un proceso que ya no existe
+                self.delete(job_id)
+
+    def sign_many(self, documents, pfx_path, password, max_workers=None):
+        """
+        Firma un lote en los procesos de la cola, con ``timeout`` por documento.
+
+        Los documentos comparten los huecos con los trabajos sueltos, pero el
+        lote solo ocupa ``max_workers`` a la vez: no deja a los demás trabajos
+        esperando detrás de todo el lote. Si el consumidor abandona el
+        generador, lo que falta no se firma y las firmas en curso se matan.
+
+        Args:
+            documents: Iterable de (ruta de entrada, ruta del PDF firmado)
+            pfx_path: Certificado PFX
+            password: Contraseña del certificado
+            max_workers: Documentos del lote firmándose a la vez
+
+        Yields:
+            (ruta de entrada, ruta del PDF firmado, excepción o None) en orden
+            de finalización
+        """
+        pending = list(documents)
+        pending.reverse()
+        window = max(1, min(max_workers or len(self._signers), len(self._signers)))
+        abandoned = threading.Event()
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < window:
+                    input_path, output_pdf = pending.pop()
+                    future = self._executor.submit(
+                        self._sign_item, input_path, output_pdf, pfx_path, password, abandoned.is_set
+                    )
+                    running[future] = (input_path, output_pdf)
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    input_path, output_pdf = running.pop(future)
+                    yield input_path, output_pdf, future.exception()
+        finally:
+            abandoned.set()
+            for future in running:
+                future.cancel()
+            # Las firmas en curso ven ``abandoned`` en menos de POLL_INTERVAL
+            futures.wait(running)
+
+    def shutdown(self, wait=True):
+        """Detiene el pool y sus procesos (los trabajos en espera se cancelan)."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        for signer in self._signers:
+            signer.stop()
+        with self._lock:
+            workspaces, self._workspaces = list(self._workspaces.values()), {}
+        for workspace in workspaces:
+            workspace.cleanup()
+
+    # ===== EJECUCIÓN =====
+
+    def _cache_key(self, workspace, input_sha256, password):
+        """Clave de la caché de firmas, o None si no hay caché o el PFX no abre."""
+        if self.cache is None:
+            return None
+        try:
+            fingerprint = certificate_fingerprint(workspace.file(PFX_NAME), password)
+        except Exception:
+            # IronPDF dará el error adecuado al firmar
+            return None
+        return self.cache.key(input_sha256, fingerprint, {'kind': 'pdf'})
+
+    def _run(self, job_id, password, cache_key=None):
+        """Ejecuta una firma en un hilo del pool."""
+        with self._lock:
+            workspace = self._workspaces.get(job_id)
+        try:
+            job_dir = self._job_dir(job_id)
+            if workspace is None or self._is_cancelled(job_id):
+                return
+
+            with self._lock:
+                state = self._read_state(job_id)
+                if state is None or state['status'] != QUEUED:
+                    return
+                state['status'] = RUNNING
+                state['started_at'] = time.time()
+                self._write_state(job_id, state)
+
+            tmp_output = os.path.join(job_dir, OUTPUT_NAME + '.tmp')
+            signer = self._idle_signers.get()
+            try:
+                signer.sign_pdf(
+                    workspace.file(INPUT_NAME),
+                    tmp_output,
+                    workspace.file(PFX_NAME),
+                    password,
+                    timeout=self.timeout,
+                    cancelled=lambda: self._is_cancelled(job_id)
+                )
+            except SigningCancelled:
+                self._remove(job_dir, OUTPUT_NAME + '.tmp')
+                return
+            except SigningTimeout as e:
+                print(f"⚠️  Firma abortada por tiempo (trabajo {job_id})")
+                self._finish(job_id, TIMEOUT, error=str(e))
+                return
+            except Exception as e:
+                print(f"❌ Error firmando PDF (trabajo {job_id}): {e}")
+                self._finish(job_id, FAILED, error=str(e))
+                return
+            finally:
+                password = None
+                self._idle_signers.put(signer)
+
+            if self._is_cancelled(job_id):
+                # Cancelado justo al terminar: el resultado se descarta
+                self._remove(job_dir, OUTPUT_NAME + '.tmp')
+                return
+
+            output = os.path.join(job_dir, OUTPUT_NAME)
+            os.replace(tmp_output, output)
+            if cache_key is not None:
+                self.cache.put(cache_key, output)
+            if (self._finish(job_id, DONE) or {}).get('status') != DONE:
+                # Cancelado desde otro proceso mientras se publicaba
+                self._remove(job_dir, OUTPUT_NAME)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._workspaces.pop(job_id, None)
+            if workspace is not None:
+                workspace.cleanup()
+
+    def _sign_item(self, input_path, output_pdf, pfx_path, password, cancelled):
+        """Firma un documento de un lote en un hilo del pool."""
+        if cancelled():
+            raise SigningCancelled('Lote abandonado')
+        signer = self._idle_signers.get()
+        try:
+            signer.sign_file(input_path, output_pdf, pfx_path, password,
+                             timeout=self.timeout, cancelled=cancelled)
+        finally:
+            self._idle_signers.put(signer)
+
+    def _finish(self, job_id, status, error=None):
+        """
+        Pasa un trabajo a un estado final (si no terminó bien, sin resultado).
+
+        Returns:
+            dict con el estado guardado (o el que ya era final)
+        """
+        with self._lock:
+            state = self._read_state(job_id)
+            if state is None:
+                return None
+            if state['status'] in FINAL_STATES:
+                return state
+            state['status'] = status
+            state['finished_at'] = time.time()
+            state['error'] = error
+            self._write_state(job_id, state)
+
+        if status != DONE:
+            self._remove(self._job_dir(job_id), OUTPUT_NAME, OUTPUT_NAME + '.tmp')
+        return state
+
+    # ===== PERSISTENCIA =====
+
+    @staticmethod
+    def _remove(job_dir, *names):
+        for name in names:
+            try:
+                os.remove(os.path.join(job_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def _job_dir(self, job_id):
+        """Carpeta de un trabajo (rechaza ids que no sean un nombre simple)."""
+        if not job_id or os.path.basename(job_id) != job_id or job_id.startswith('.'):
+            raise ValueError('Identificador de trabajo inválido')
+        return os.path.join(self.directory, job_id)
+
+    def _is_cancelled(self, job_id):
+        return os.path.exists(os.path.join(self._job_dir(job_id), CANCEL_NAME))
+
+    def _read_state(self, job_id):
+        try:
+            with open(os.path.join(self._job_dir(job_id), STATE_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            return None
+
+    def _write_state(self, job_id, state):
+        """Escribe ``job.json`` de forma atómica (archivo temporal + rename)."""
+        path = os.path.join(self._job_dir(job_id), STATE_NAME)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
@@ -0,0 +1,172 @@
+"""
+Caché en disco de PDFs firmados, direccionada por contenido.
+
+La clave combina el SHA-256 del documento de entrada, la huella del
+certificado de firma y las opciones de firma: volver a firmar el mismo
+documento con el mismo certificado devuelve el PDF ya firmado sin pasar por
+IronPDF. El tamaño total está acotado y se expulsan primero las entradas
+usadas hace más tiempo (la fecha de modificación hace de marca LRU, así que
+todos los workers del servidor web comparten el mismo orden).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+logger = logging.getLogger(__name__)
+
+
+def certificate_fingerprint(pfx_path, password):
+    """
+    Huella SHA-256 del certificado contenido en un PFX.
+
+    Abrir el PFX comprueba también la contraseña, así que una contraseña
+    incorrecta nunca obtiene un PDF de la caché.
+
+    Raises:
+        ValueError: Si el PFX no se puede abrir con esa contraseña o no tiene certificado
+    """
+    with open(pfx_path, 'rb') as f:
+        data = f.read()
+    _, certificate, _ = pkcs12.load_key_and_certificates(data, password.encode('utf-8'))
+    if certificate is None:
+        raise ValueError('El PFX no contiene un certificado')
+    return certificate.fingerprint(hashes.SHA256()).hex()
+
+
+class SignedOutputCache:
+    """
+    Caché LRU de PDFs firmados con tamaño máximo en bytes.
+
+    Args:
+        directory: Carpeta de la caché
+        max_bytes: Tamaño total máximo; al superarlo se expulsa hasta el 90 %
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = self._scan_size()
+
+    @staticmethod
+    def key(input_sha256, fingerprint, options=None):
+        """
+        Clave de caché de una firma.
+
+        Args:
+            input_sha256: SHA-256 del documento de entrada
+            fingerprint: Huella del certificado (certificate_fingerprint)
+            options: dict con las opciones que cambian el resultado
+        """
+        material = json.dumps(
+            [input_sha256, fingerprint, options or {}],
+            sort_keys=True,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key, dest):
+        """
+        Copia la entrada ``key`` a ``dest`` (enlace duro si es posible).
+
+        Returns:
+            True si estaba en caché
+        """
+        path = self._path(key)
+        try:
+            self._link_or_copy(path, dest)
+        except FileNotFoundError:
+            return False
+        try:
+            # Marca de uso reciente para la expulsión LRU
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def put(self, key, source):
+        """
+        Guarda ``source`` como la entrada ``key`` (atómico; no falla si ya existe).
+        """
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self._link_or_copy(source, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("⚠️  No se pudo guardar la firma en caché: %s", e)
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            return
+
+        with self._lock:
+            self._size += os.path.getsize(path)
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Borra las entradas menos usadas hasta quedar por debajo del 90 % del límite."""
+        with self._lock:
+            entries = []
+            for path in self._entries():
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._size = total
+
+    # ===== AUXILIARES =====
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def _entries(self):
+        for sub in os.listdir(self.directory):
+            folder = os.path.join(self.directory, sub)
+            if os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    if name.endswith('.pdf'):
+                        yield os.path.join(folder, name)
+
+    def _scan_size(self):
+        total = 0
+        for path in self._entries():
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    @staticmethod
+    def _link_or_copy(source, dest):
+        """Enlace duro (sin copiar datos) o copia si están en otro sistema de archivos."""
+        try:
+            os.link(source, dest)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(source, dest)
@@ -0,0 +1,241 @@
+"""
+Archivos temporales del proceso de firma.
+
+IronPDF trabaja con rutas, así que cada firma necesita una carpeta para el PDF
+de entrada y el certificado. ``SigningWorkspace`` la crea en memoria (tmpfs,
+``/dev/shm``) cuando el documento es pequeño y en el directorio temporal del
+sistema si no, y la borra completa al salir del bloque ``with``, termine la
+firma bien o mal. Lo que ocupan en memoria todos los espacios de trabajo del
+proceso está acotado, y si el tmpfs se llena a mitad de escritura la carpeta
+pasa a disco.
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+# Carpeta en memoria compartida por defecto en Linux
+DEFAULT_MEMORY_DIR = '/dev/shm'
+
+# Bytes de tmpfs reservados por los espacios de trabajo vivos de este proceso
+_memory_lock = threading.Lock()
+_memory_reserved = 0
+
+
+def _reserve_memory(size, memory_dir, memory_total):
+    """Reserva ``size`` bytes de tmpfs si caben en el presupuesto y en el disco."""
+    global _memory_reserved
+    try:
+        stat = os.statvfs(memory_dir)
+    except OSError:
+        return False
+    with _memory_lock:
+        if memory_total is not None and _memory_reserved + size > memory_total:
+            return False
+        # Otros procesos (workers) también escriben en el mismo tmpfs
+        if stat.f_bavail * stat.f_frsize < size:
+            return False
+        _memory_reserved += size
+        return True
+
+
+def _release_memory(size):
+    global _memory_reserved
+    with _memory_lock:
+        _memory_reserved -= size
+
+
+def _copy_stream(source, path):
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(source, f)
+
+
+class SigningWorkspace:
+    """
+    Carpeta privada (0700) y de vida acotada para los archivos de una firma.
+
+    Args:
+        size_hint: Tamaño esperado de los archivos en bytes (None = desconocido)
+        memory_limit: Hasta este tamaño se usa ``memory_dir``
+        memory_dir: Sistema de archivos en memoria ('' = no usarlo)
+        prefix: Prefijo del nombre de la carpeta
+        memory_total: Máximo de bytes en ``memory_dir`` entre todos los espacios
+            de trabajo del proceso (None = sin límite)
+    """
+
+    def __init__(self, size_hint=None, memory_limit=16 * 1024 * 1024,
+                 memory_dir=DEFAULT_MEMORY_DIR, prefix='sign-', memory_total=None):
+        self.path = None
+        self._reserved = 0
+        in_memory = (
+            bool(memory_dir)
+            and size_hint is not None
+            and size_hint <= memory_limit
+            and os.path.isdir(memory_dir)
+            and os.access(memory_dir, os.W_OK)
+            and _reserve_memory(size_hint, memory_dir, memory_total)
+        )
+        self.in_memory = in_memory
+        self.prefix = prefix
+        if in_memory:
+            self._reserved = size_hint
+        try:
+            self.path = tempfile.mkdtemp(prefix=prefix, dir=memory_dir if in_memory else None)
+        except OSError:
+            if not in_memory:
+                raise
+            self._to_disk()
+
+    def file(self, name):
+        """
+        Ruta de un archivo dentro del espacio de trabajo.
+
+        Args:
+            name: Nombre simple (sin separadores)
+        """
+        if os.path.basename(name) != name:
+            raise ValueError(f"Nombre de archivo inválido: {name}")
+        return os.path.join(self.path, name)
+
+    def save_stream(self, name, source, copy=_copy_stream):
+        """
+        Guarda un flujo como ``name``.
+
+        Si el tmpfs se llena (``OSError``, p. ej. ENOSPC) la carpeta entera
+        pasa a disco y la escritura se repite desde la posición inicial de
+        ``source``. Por eso las rutas de ``file()`` deben pedirse después de
+        escribir: un cambio a disco las mueve.
+
+        Args:
+            name: Nombre simple del archivo
+            source: Flujo binario posicionable (p. ej. ``FileStorage.stream``)
+            copy: Función ``(source, ruta)`` que escribe; se devuelve su resultado
+
+        Returns:
+            Lo que devuelva ``copy``
+        """
+        start = source.tell()
+        try:
+            return copy(source, self.file(name))
+        except OSError as e:
+            if not self.in_memory:
+                raise
+            print(f"⚠️  tmpfs lleno al guardar {name} ({e}), se usa el disco")
+            self._to_disk()
+            source.seek(start)
+            return copy(source, self.file(name))
+
+    def _to_disk(self):
+        """Mueve la carpeta (y lo ya escrito) al directorio temporal en disco."""
+        path = tempfile.mkdtemp(prefix=self.prefix)
+        if self.path:
+            for entry in os.listdir(self.path):
+                shutil.move(os.path.join(self.path, entry), os.path.join(path, entry))
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.path = path
+        self.in_memory = False
+        self._release()
+
+    def _release(self):
+        if self._reserved:
+            _release_memory(self._reserved)
+            self._reserved = 0
+
+    def cleanup(self):
+        """Borra la carpeta y todo su contenido (idempotente)."""
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+        return False
+
+    def __del__(self):
+        # Red de seguridad si alguien olvida el with / cleanup()
+        self.cleanup()
+
+
+def open_and_unlink(path):
+    """
+    Abre un archivo para lectura y lo elimina del sistema de archivos.
+
+    El descriptor sigue siendo válido hasta cerrarse, así que la respuesta
+    puede enviarse en streaming sin dejar una copia en disco cuando termine
+    (ni aunque el cliente corte la descarga).
+
+    Returns:
+        Archivo binario abierto
+    """
+    f = open(path, 'rb')
+    try:
+        os.unlink(path)
+    except OSError:
+        f.close()
+        raise
+    return f
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Destino no posicionable donde escribe zipfile; se vacía tras cada bloque."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_stream(entries, chunk_size=256 * 1024):
+    """
+    Genera un ZIP por bloques a medida que llegan sus entradas.
+
+    No necesita conocer todas las entradas de antemano ni un archivo temporal:
+    cada una se comprime y se emite en cuanto está disponible, y en memoria
+    solo hay un bloque a la vez.
+
+    Args:
+        entries: Iterable de (nombre en el ZIP, ruta del archivo o bytes)
+        chunk_size: Bytes leídos de cada archivo por iteración
+
+    Yields:
+        bytes del ZIP
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for arcname, content in entries:
+            with zf.open(arcname, 'w', force_zip64=True) as dest:
+                if isinstance(content, bytes):
+                    dest.write(content)
+                else:
+                    with open(content, 'rb') as src:
+                        while True:
+                            block = src.read(chunk_size)
+                            if not block:
+                                break
+                            dest.write(block)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,120 @@
+"""
+Archivos estáticos compilados (minificados, con hash y precomprimidos).
+
+``scripts/build_static.py`` escribe en ``auth/static/dist`` cada CSS/JS con un
+hash de su contenido en el nombre, sus versiones ``.gz``/``.br`` y un
+``manifest.json``. Con el manifiesto presente, ``url_for('static', ...)``
+apunta a la versión con hash y esta se sirve con ``Cache-Control: immutable``
+y la variante comprimida que acepte el navegador: en visitas posteriores no
+se vuelve a pedir ningún CSS ni JS. Sin manifiesto (desarrollo) los estáticos
+se sirven como siempre.
+"""
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+DIST_NAME = 'dist'
+
+# Un año: el nombre cambia con el contenido, así que nunca hay que revalidar
+IMMUTABLE_MAX_AGE = 31536000
+
+# Codificaciones precomprimidas, por orden de preferencia
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticManifest:
+    """
+    Correspondencia entre los estáticos originales y sus versiones con hash.
+
+    Args:
+        path: Ruta de manifest.json
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.dist_dir = os.path.dirname(self.path)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self.entries = json.load(f)
+        # Variantes disponibles de cada archivo (se comprueba una sola vez)
+        self._variants = {
+            hashed: [
+                (encoding, suffix) for encoding, suffix in ENCODINGS
+                if os.path.isfile(os.path.join(self.dist_dir, hashed + suffix))
+            ]
+            for hashed in self.entries.values()
+        }
+
+    def url_filename(self, filename):
+        """Retorna ``dist/<nombre con hash>`` o None si el archivo no está compilado."""
+        hashed = self.entries.get(filename)
+        return f"{DIST_NAME}/{hashed}" if hashed else None
+
+    def __contains__(self, hashed):
+        return hashed in self._variants
+
+    def send(self, hashed):
+        """
+        Respuesta para ``dist/<hashed>`` con la mejor codificación aceptada.
+
+        Args:
+            hashed: Ruta relativa a dist (como en el manifiesto)
+        """
+        mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+        name, content_encoding = hashed, None
+        for encoding, suffix in self._variants.get(hashed, ()):
+            if request.accept_encodings[encoding]:
+                name, content_encoding = hashed + suffix, encoding
+                break
+
+        resp = send_from_directory(self.dist_dir, name, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        if content_encoding:
+            resp.headers['Content-Encoding'] = content_encoding
+        if self._variants.get(hashed):
+            resp.vary.add('Accept-Encoding')
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
+
+
+def init_static_assets(app, manifest_path):
+    """
+    Activa los estáticos compilados si existe el manifiesto.
+
+    Args:
+        app: Aplicación Flask (con la ruta 'static' registrada)
+        manifest_path: Ruta de manifest.json
+
+    Returns:
+        StaticManifest o None si no hay compilación
+    """
+    try:
+        manifest = StaticManifest(manifest_path)
+    except FileNotFoundError:
+        print("⚠️  Estáticos sin compilar: se sirven sin hash ni caché larga "
+              "(python scripts/build_static.py)")
+        return None
+    except ValueError as e:
+        print(f"❌ manifest.json de estáticos inválido ({manifest_path}): {e}")
+        return None
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            hashed = manifest.url_filename(values['filename'])
+            if hashed:
+                values['filename'] = hashed
+
+    default_static = app.view_functions['static']
+    prefix = DIST_NAME + '/'
+
+    def static(filename):
+        # Solo los archivos con hash son inmutables (manifest.json no)
+        if filename.startswith(prefix) and filename[len(prefix):] in manifest:
+            return manifest.send(filename[len(prefix):])
+        return default_static(filename=filename)
+
+    app.view_functions['static'] = static
+    print(f"✓ {len(manifest.entries)} estáticos compilados ({manifest.dist_dir})")
+    return manifest
@@ -2,6 +2,9 @@
  * Cliente de Chat Seguro - WebSocket con cifrado RSA
  */
 
+// Versión del protocolo de chat que habla este cliente (ver core/protocol.py)
+const PROTOCOL_VERSION = 2;
+
 class SecureChatClient {
     constructor() {
         this.ws = null;
@@ -9,10 +12,14 @@ class SecureChatClient {
         this.authenticated = false;
         this.connecting = false;
         this.nickname = '';
+        this.room = 'general';
         this.serverPublicKey = null;
         this.clientKeys = null;
         this.pendingResolve = null;
         this.pendingReject = null;
+        // Modo de integridad configurado en el servidor (inyectado por la plantilla)
+        this.integrityMode = window.CHAT_INTEGRITY_MODE || 'legacy';
+        this.integrityKey = null;
         
         // Elementos del DOM
         this.elements = {
@@ -20,6 +27,8 @@ class SecureChatClient {
             chatSection: document.getElementById('chatSection'),
             nicknameInput: document.getElementById('nicknameInput'),
             passwordInput: document.getElementById('passwordInput'),
+            roomInput: document.getElementById('roomInput'),
+            currentRoom: document.getElementById('currentRoom'),
             loginBtn: document.getElementById('loginBtn'),
             messagesContainer: document.getElementById('messages'),
             messageInput: document.getElementById('messageInput'),
@@ -65,10 +74,12 @@ class SecureChatClient {
         
         this.connecting = true;
         this.nickname = nickname;
+        this.room = (this.elements.roomInput && this.elements.roomInput.value.trim()) || 'general';
         this.elements.loginBtn.disabled = true;
         this.elements.loginBtn.textContent = 'Conectando...';
         
         try {
+            this.integrityKey = await this.deriveIntegrityKey(password);
             await this.connect(nickname, password);
             // Conexión exitosa, no mostrar error
         } catch (error) {
@@ -161,6 +172,10 @@ class SecureChatClient {
         
         try {
             if (message === 'PUBLIC_KEY_READY') {
+                if (this.clientKeys) {
+                    // Reconexión: se reutilizan las claves ya generadas
+                    return;
+                }
                 console.log('🔑 Generando claves RSA...');
                 try {
                     this.clientKeys = await this.generateRSAKeys();
@@ -209,7 +224,11 @@ class SecureChatClient {
                     
                     console.log('📤 Enviando nuestra clave pública (PEM en Base64)');
                     console.log('📄 Tamaño PEM:', publicKeyPem.length);
-                    this.ws.send(publicKeyPemBase64);
+                    // Token del buzón (correo offline) cifrado para el servidor; "new" si aún no hay
+                    const inboxToken = localStorage.getItem(`chatInbox:${nickname}`) || 'new';
+                    const encryptedInbox = await this.encryptWithServerKey(inboxToken);
+                    // Negociar protocolo y formato de mensajes en el mismo paso
+                    this.ws.send(`HELLO ${PROTOCOL_VERSION} pipe ${publicKeyPemBase64} room=${this.room} inbox=${encryptedInbox}`);
                 } catch (error) {
                     console.error('❌ Error procesando claves:', error);
                     if (this.pendingReject) {
@@ -219,6 +238,14 @@ class SecureChatClient {
                     this.ws.close();
                 }
                 
+            } else if (message.startsWith('PROTOCOL ')) {
+                const [, version, format, integrityMode] = message.split(' ');
+                console.log(`🤝 Protocolo ${version} negociado (formato ${format}, integridad ${integrityMode})`);
+                if (integrityMode !== this.integrityMode) {
+                    this.integrityMode = integrityMode;
+                    this.integrityKey = await this.deriveIntegrityKey(password);
+                }
+                
             } else if (message === 'NICK') {
                 console.log('📤 Enviando nickname cifrado');
                 const encryptedNick = await this.encryptWithServerKey(nickname);
@@ -249,6 +276,27 @@ class SecureChatClient {
                 }
                 this.ws.close();
                 
+            } else if (message.startsWith('INBOX ')) {
+                // Buzón nuevo: guardar su token para recuperar el correo offline al volver
+                const token = await this.decryptWithClientKey(message.slice(6));
+                localStorage.setItem(`chatInbox:${nickname}`, token);
+                console.log('📥 Buzón de mensajes offline creado');
+                
+            } else if (message.startsWith('RECONNECT ')) {
+                // Reinicio ordenado del servidor: reconectar tras la espera indicada
+                const delayMs = parseInt(message.split(' ')[1], 10) || 0;
+                console.log(`🔁 Servidor reiniciando; reconectando en ${delayMs} ms`);
+                this.authenticated = false;
+                this.updateStatus('connected', 'Reconectando...');
+                this.ws.onclose = null;
+                this.ws.close();
+                setTimeout(() => {
+                    this.connect(nickname, password).catch((error) => {
+                        console.error('❌ Error al reconectar:', error);
+                        this.updateStatus('error', 'Error de conexión');
+                    });
+                }, delayMs);
+                
             } else if (message === 'SERVIDOR_LLENO') {
                 const error = new Error('Servidor lleno');
                 if (this.pendingReject) {
@@ -273,6 +321,11 @@ class SecureChatClient {
     async handleChatMessage(encryptedMessage) {
         try {
             const decrypted = await this.decryptWithClientKey(encryptedMessage);
+            const roomChange = decrypted.match(/^📢 Ahora estás en #(\S+)/);
+            if (roomChange) {
+                this.room = roomChange[1];
+                this.elements.currentRoom.textContent = `#${this.room}`;
+            }
             this.displayMessage(decrypted, false);
         } catch (error) {
             console.error('❌ Error descifrando mensaje:', error);
@@ -291,20 +344,19 @@ class SecureChatClient {
             const encrypted = await this.encryptWithServerKey(text);
             console.log('   Cifrado:', encrypted.substring(0, 50) + '...');
             
-            // Calcular hashes
-            const sha256Hash = await this.sha256(text);
-            const md5Hash = await this.md5Simple(text);
-            
-            console.log('   SHA256:', sha256Hash.substring(0, 32) + '...');
-            console.log('   MD5:', md5Hash);
+            // Calcular etiqueta de integridad (una sola por mensaje)
+            const tag = await this.integrityTag(text);
+            console.log(`   Integridad (${this.integrityMode}):`, tag.substring(0, 16) + '...');
             
-            // Formato: cipher|hash|md5
-            const payload = `${encrypted}|${sha256Hash}|${md5Hash}`;
+            // Formato: cipher|etiqueta (en modo legacy: cipher|hash|md5)
+            const payload = `${encrypted}|${tag}`;
             
             this.ws.send(payload);
             
-            // Mostrar mensaje propio
-            this.displayMessage(`${this.nickname}: ${text}`, true);
+            // Mostrar mensaje propio (los comandos se responden desde el servidor)
+            if (!text.startsWith('/')) {
+                this.displayMessage(`${this.nickname}: ${text}`, true);
+            }
             this.elements.messageInput.value = '';
             
         } catch (error) {
@@ -405,12 +457,49 @@ class SecureChatClient {
         return new TextDecoder().decode(decrypted);
     }
     
+    async deriveIntegrityKey(password) {
+        // Misma derivación que crypto/integrity.py: SHA-256("chat-integridad|" + contraseña)
+        if (this.integrityMode !== 'hmac-sha256') return null;
+        const material = new TextEncoder().encode(`chat-integridad|${password}`);
+        const rawKey = await window.crypto.subtle.digest('SHA-256', material);
+        return await window.crypto.subtle.importKey(
+            'raw',
+            rawKey,
+            { name: 'HMAC', hash: 'SHA-256' },
+            false,
+            ['sign']
+        );
+    }
+    
+    async integrityTag(text) {
+        switch (this.integrityMode) {
+            case 'hmac-sha256': {
+                const signature = await window.crypto.subtle.sign(
+                    'HMAC',
+                    this.integrityKey,
+                    new TextEncoder().encode(text)
+                );
+                return this.toHex(signature);
+            }
+            case 'sha256':
+                return await this.sha256(text);
+            case 'legacy':
+                return `${await this.sha256(text)}|${await this.md5Simple(text)}`;
+            default:
+                throw new Error(`Modo de integridad no soportado en el navegador: ${this.integrityMode}`);
+        }
+    }
+    
+    toHex(buffer) {
+        return Array.from(new Uint8Array(buffer))
+            .map(b => b.toString(16).padStart(2, '0'))
+            .join('');
+    }
+    
     async sha256(text) {
         const encoded = new TextEncoder().encode(text);
         const hash = await window.crypto.subtle.digest('SHA-256', encoded);
-        return Array.from(new Uint8Array(hash))
-            .map(b => b.toString(16).padStart(2, '0'))
-            .join('');
+        return this.toHex(hash);
     }
     
     async md5Simple(str) {
@@ -9,13 +9,14 @@ import traceback
 import time
 import os
 import sys
-import hashlib
 import json
 from pathlib import Path
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from crypto.rsa_crypto import RSACrypto
+from crypto.integrity import IntegrityVerifier, MODOS_CON_CLAVE
+from core.protocol import PROTOCOLO_VERSION
 from cryptography.hazmat.primitives import serialization
 from config import Config
 
@@ -23,7 +24,8 @@ from config import Config
 class ChatClient:
     """Cliente de chat con cifrado RSA."""
     
-    def __init__(self, host: str | None = None, port: int | None = None, enable_ssl: bool | None = None):
+    def __init__(self, host: str | None = None, port: int | None = None, enable_ssl: bool | None = None,
+                 room: str | None = None):
         """Inicializa el cliente de chat con un flujo amigable."""
         print("\n" + "="*60)
         print("    🎯 BIENVENIDO AL CHAT SEGURO CON CIFRADO RSA")
@@ -101,26 +103,69 @@ class ChatClient:
         
         print("Para conectarte, necesitas conocer la contraseña del servidor.")
         self.server_password = input("  → Contraseña del servidor: ").strip()
+        self.integridad = IntegrityVerifier(Config.INTEGRITY_MODE, self.server_password or None)
         
         print("\nElige un nombre de usuario para el chat.")
         self.nickname = input("  → Tu nombre de usuario: ").strip()
         
+        self.room = room or Config.DEFAULT_ROOM
+        
         print(f"\n  ✓ Configurado como: {self.nickname}")
+        print(f"  ✓ Sala inicial: #{self.room}")
         
         print("\n🔌 PASO 4: Estableciendo Conexión")
         print("-" * 60)
         protocol = "TLS" if self.enable_ssl else "TCP"
         print(f"  → Conectando a {host}:{port} mediante {protocol}...")
         
+        self.server_port = port
+        self._conectar()
+        
+        self.authenticated = False
+        self.running = True
+        self.buffer_size = Config.BUFFER_SIZE
+        
+        print("\n" + "="*60)
+
+    def _clave_buzon(self) -> str:
+        return f'{self.server_host}:{self.server_port}:{self.nickname}'
+
+    def _token_buzon(self) -> str | None:
+        """Token del buzón de este nickname en este servidor, si se guardó."""
+        try:
+            with open(Config.CLIENT_INBOX_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f).get(self._clave_buzon())
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_token_buzon(self, token: str) -> None:
+        """Guarda el token del buzón (solo legible por el usuario)."""
+        try:
+            with open(Config.CLIENT_INBOX_FILE, 'r', encoding='utf-8') as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            tokens = {}
+        tokens[self._clave_buzon()] = token
+        temporal = Config.CLIENT_INBOX_FILE.with_name(Config.CLIENT_INBOX_FILE.name + '.tmp')
+        try:
+            fd = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(tokens, f)
+            os.replace(temporal, Config.CLIENT_INBOX_FILE)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el token del buzón: {e}")
+
+    def _conectar(self) -> None:
+        """Abre la conexión TCP (y TLS si está habilitado) con el servidor."""
         try:
             # Crear socket base
             base_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            base_socket.connect((host, port))
+            base_socket.connect((self.server_host, self.server_port))
             
             # Envolver con SSL si está habilitado
             if self.enable_ssl:
                 ssl_context = self._configurar_ssl_cliente()
-                self.client = ssl_context.wrap_socket(base_socket, server_hostname=host)
+                self.client = ssl_context.wrap_socket(base_socket, server_hostname=self.server_host)
                 print("  ✓ Conexión TLS establecida")
                 print(f"  ✓ Protocolo: {self.client.version()}")
                 print(f"  ✓ Cifrado: {self.client.cipher()[0]}")
@@ -137,12 +182,6 @@ class ChatClient:
         except Exception as e:
             print(f"  ✗ Error de conexión: {e}")
             raise
-        
-        self.authenticated = False
-        self.running = True
-        self.buffer_size = Config.BUFFER_SIZE
-        
-        print("\n" + "="*60)
 
     def _configurar_ssl_cliente(self) -> ssl.SSLContext:
         """Configura el contexto SSL/TLS para el cliente."""
@@ -163,6 +202,21 @@ class ChatClient:
         
         return context
 
+    def _negociar_integridad(self, modo: str) -> None:
+        """Firma con el modo de integridad anunciado por el servidor.
+        
+        El servidor descarta los mensajes cuya etiqueta no sea de su modo, así
+        que el modo local (Config.INTEGRITY_MODE) solo vale si coincide.
+        
+        Raises:
+            ValueError: Si el modo no existe o tiene clave y no hay contraseña
+        """
+        if modo == self.integridad.modo:
+            return
+        if modo in MODOS_CON_CLAVE and not self.server_password:
+            raise ValueError(f"El servidor exige integridad {modo}, que necesita la contraseña del servidor")
+        self.integridad = IntegrityVerifier(modo, self.server_password or None)
+
     def recibir(self):
         """Recibe mensajes del servidor de chat."""
         buffer = ""
@@ -193,9 +247,24 @@ class ChatClient:
                             format=serialization.PublicFormat.SubjectPublicKeyInfo
                         )
                         my_public_key_b64 = base64.b64encode(my_public_key_pem).decode('utf-8')
-                        self.client.send(f'{my_public_key_b64}\n'.encode('utf-8'))
+                        # Token del buzón cifrado para el servidor ("new" si aún no hay)
+                        buzon_cifrado = self.server_rsa.cifrar(self._token_buzon() or 'new')
+                        saludo = (f'HELLO {PROTOCOLO_VERSION} json {my_public_key_b64} '
+                                  f'room={self.room} inbox={buzon_cifrado}')
+                        self.client.send(f'{saludo}\n'.encode('utf-8'))
                         print("🔑 Tu clave pública enviada al servidor")
                     
+                    elif mensaje.startswith('PROTOCOL '):
+                        _, version, formato, modo = mensaje.split()
+                        print(f"🤝 Protocolo {version} negociado (formato {formato}, integridad {modo})")
+                        try:
+                            self._negociar_integridad(modo)
+                        except ValueError as e:
+                            print(f"❌ {e}. Saliendo...")
+                            self.running = False
+                            self.client.close()
+                            break
+                    
                     elif mensaje == 'NICK':
                         print("  → Enviando nombre de usuario cifrado...")
                         nickname_cifrado = self.server_rsa.cifrar(self.nickname)
@@ -212,12 +281,39 @@ class ChatClient:
                         self.client.close()
                         break
                     
+                    elif mensaje.startswith('INBOX '):
+                        # Token del buzón nuevo: sin él no se recupera el correo offline
+                        self._guardar_token_buzon(self.rsa_crypto.descifrar(mensaje.split(' ', 1)[1]))
+                        print("📥 Buzón creado: recibirás los mensajes que lleguen mientras no estés")
+                    
+                    elif mensaje.startswith('RECONNECT '):
+                        # Reinicio ordenado del servidor: volver a conectar tras la espera indicada
+                        espera_ms = int(mensaje.split()[1]) if mensaje.split()[1].isdigit() else 0
+                        print(f"🔁 El servidor se está reiniciando; reconectando en {espera_ms} ms...")
+                        self.authenticated = False
+                        buffer = ""
+                        try:
+                            self.client.close()
+                        except Exception:
+                            pass
+                        time.sleep(espera_ms / 1000)
+                        for intento in range(5):
+                            try:
+                                self._conectar()
+                                break
+                            except OSError:
+                                if intento == 4:
+                                    raise
+                                time.sleep(1 + intento)
+                        break
+                    
                     elif mensaje == 'AUTH_SUCCESS':
                         print("\n" + "="*60)
                         print("  ✅ ¡AUTENTICACIÓN EXITOSA!")
                         print("="*60)
                         print("\n💬 Ya puedes escribir mensajes.")
                         print("   • Escribe tu mensaje y presiona Enter para enviarlo")
+                        print("   • Salas: /join <sala>, /leave, /rooms · Privados: /msg <nick> <texto>")
                         print(f"   • Cifrado de aplicación: RSA-{Config.RSA_KEY_SIZE}")
                         if self.enable_ssl:
                             print(f"   • Cifrado de transporte: TLS (capa adicional de seguridad)")
@@ -228,6 +324,9 @@ class ChatClient:
                     else:
                         try:
                             mensaje_descifrado = self.rsa_crypto.descifrar(mensaje)
+                            if mensaje_descifrado.startswith('📢 Ahora estás en #'):
+                                # Recordar la sala para volver a ella si hay que reconectar
+                                self.room = mensaje_descifrado.rsplit('#', 1)[1]
                             print(mensaje_descifrado)
                         except Exception as e:
                             print(f"[Sin cifrar] {mensaje}")
@@ -254,22 +353,16 @@ class ChatClient:
                 if not self.running:
                     break
                 
-                try:
-                    mensaje_hash = hashlib.sha256(mensaje.encode('utf-8')).hexdigest()
-                    mensaje_md5 = hashlib.md5(mensaje.encode('utf-8')).hexdigest()
-                    print(f"\n🔒 MD5 del mensaje enviado: {mensaje_md5}")
-                except Exception:
-                    mensaje_hash = ''
-                    mensaje_md5 = ''
+                etiqueta = self.integridad.calcular(mensaje)
+                print(f"\n🔒 Etiqueta de integridad ({self.integridad.modo}): {etiqueta[:16]}...")
 
                 mensaje_cifrado = self.server_rsa.cifrar(mensaje)
 
                 payload = json.dumps({
                     'cipher': mensaje_cifrado,
-                    'hash': mensaje_hash,
-                    'md5': mensaje_md5
+                    'tag': etiqueta
                 })
-                self.client.send(payload.encode('utf-8'))
+                self.client.send(f'{payload}\n'.encode('utf-8'))
             
             except Exception as e:
                 print(f"❌ Error al enviar mensaje: {e}")
@@ -306,6 +399,7 @@ def main():
     parser.add_argument('--port', type=int, help=f'Puerto del servidor (default: {Config.DEFAULT_PORT})')
     parser.add_argument('--enable-ssl', action='store_true', help='Habilitar SSL/TLS')
     parser.add_argument('--disable-ssl', action='store_true', help='Deshabilitar SSL/TLS')
+    parser.add_argument('--room', type=str, help=f'Sala inicial (default: {Config.DEFAULT_ROOM})')
     
     args = parser.parse_args()
     
@@ -317,7 +411,7 @@ def main():
         enable_ssl = False
     
     try:
-        cliente = ChatClient(host=args.host, port=args.port, enable_ssl=enable_ssl)
+        cliente = ChatClient(host=args.host, port=args.port, enable_ssl=enable_ssl, room=args.room)
         cliente.iniciar()
     except KeyboardInterrupt:
         print("\n👋 Saliendo del chat...")
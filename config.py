@@ -3,6 +3,7 @@ Módulo de configuración centralizado para el sistema de chat.
 Maneja configuración desde variables de entorno y valores por defecto.
 """
 import os
+import tempfile
 from pathlib import Path
 from typing import Optional
 
@@ -25,6 +26,9 @@ class Config:
     # Tamaño de clave RSA en bits
     RSA_KEY_SIZE: int = int(os.getenv('CHAT_RSA_KEY_SIZE', '2048'))
     
+    # Hilos para cifrar/descifrar por lotes (1 = secuencial)
+    CRYPTO_BATCH_WORKERS: int = int(os.getenv('CHAT_CRYPTO_BATCH_WORKERS', str(min(4, os.cpu_count() or 1))))
+    
     # Rutas de claves RSA
     SERVER_PRIVATE_KEY_PATH: Path = Path(
         os.getenv('CHAT_SERVER_PRIVATE_KEY', 
@@ -35,6 +39,9 @@ class Config:
                   str(BASE_DIR / 'server_public_key.pem'))
     )
     
+    # Etiqueta de integridad por mensaje: legacy, sha256, hmac-sha256 o blake2b
+    INTEGRITY_MODE: str = os.getenv('CHAT_INTEGRITY_MODE', 'hmac-sha256').lower()
+    
     # ===== CONFIGURACIÓN SSL/TLS =====
     # Habilitar SSL/TLS por defecto
     ENABLE_SSL: bool = os.getenv('CHAT_ENABLE_SSL', 'True').lower() in ('true', '1', 'yes')
@@ -59,25 +66,196 @@ class Config:
     
     # ===== CONFIGURACIÓN DEL SERVIDOR =====
     MAX_CLIENTS: int = int(os.getenv('CHAT_MAX_CLIENTS', '500'))
+    DEFAULT_ROOM: str = os.getenv('CHAT_DEFAULT_ROOM', 'general')
+    MAX_ROOMS: int = int(os.getenv('CHAT_MAX_ROOMS', '1000'))
     BUFFER_SIZE: int = int(os.getenv('CHAT_BUFFER_SIZE', '4096'))
     THREAD_STACK_SIZE: int = int(os.getenv('CHAT_THREAD_STACK_SIZE', '67108864'))  # 64MB
     
+    # ===== HISTORIAL DE MENSAJES =====
+    HISTORY_ENABLED: bool = os.getenv('CHAT_HISTORY_ENABLED', 'True').lower() in ('true', '1', 'yes')
+    HISTORY_DIR: Path = Path(os.getenv('CHAT_HISTORY_DIR', str(BASE_DIR / 'data' / 'history')))
+    # Rotación de segmentos por tamaño (bytes) o antigüedad (segundos)
+    HISTORY_SEGMENT_BYTES: int = int(os.getenv('CHAT_HISTORY_SEGMENT_BYTES', '16777216'))  # 16MB
+    HISTORY_SEGMENT_SECONDS: float = float(os.getenv('CHAT_HISTORY_SEGMENT_SECONDS', '86400'))
+    # Segmentos conservados; los más antiguos se eliminan
+    HISTORY_MAX_SEGMENTS: int = int(os.getenv('CHAT_HISTORY_MAX_SEGMENTS', '64'))
+    HISTORY_FSYNC: bool = os.getenv('CHAT_HISTORY_FSYNC', 'False').lower() in ('true', '1', 'yes')
+    # Puesta al día al entrar en una sala: últimos N mensajes y/o últimos T minutos (0 = sin límite)
+    HISTORY_REPLAY_COUNT: int = int(os.getenv('CHAT_HISTORY_REPLAY_COUNT', '20'))
+    HISTORY_REPLAY_MINUTES: float = float(os.getenv('CHAT_HISTORY_REPLAY_MINUTES', '0'))
+    HISTORY_REPLAY_WORKERS: int = int(os.getenv('CHAT_HISTORY_REPLAY_WORKERS', '2'))
+    
+    # ===== BÚSQUEDA EN EL HISTORIAL =====
+    SEARCH_ENABLED: bool = os.getenv('CHAT_SEARCH_ENABLED', 'True').lower() in ('true', '1', 'yes')
+    SEARCH_DB: Path = Path(os.getenv('CHAT_SEARCH_DB', str(BASE_DIR / 'data' / 'search.db')))
+    # Inserciones por lotes: tamaño máximo y espera máxima (segundos) de un mensaje en cola
+    SEARCH_BATCH_SIZE: int = int(os.getenv('CHAT_SEARCH_BATCH_SIZE', '256'))
+    SEARCH_FLUSH_INTERVAL: float = float(os.getenv('CHAT_SEARCH_FLUSH_INTERVAL', '0.5'))
+    SEARCH_MAX_RESULTS: int = int(os.getenv('CHAT_SEARCH_MAX_RESULTS', '20'))
+    
+    # ===== MENSAJES PENDIENTES (OFFLINE) =====
+    # Lo perdido en la sala se lee del historial: sin HISTORY_ENABLED no se abren los buzones
+    SPOOL_ENABLED: bool = os.getenv('CHAT_SPOOL_ENABLED', 'True').lower() in ('true', '1', 'yes')
+    SPOOL_DIR: Path = Path(os.getenv('CHAT_SPOOL_DIR', str(BASE_DIR / 'data' / 'spool')))
+    # Límites por nickname y caducidad (segundos) de los mensajes guardados
+    SPOOL_MAX_MESSAGES: int = int(os.getenv('CHAT_SPOOL_MAX_MESSAGES', '200'))
+    SPOOL_MAX_BYTES: int = int(os.getenv('CHAT_SPOOL_MAX_BYTES', '262144'))
+    SPOOL_TTL: float = float(os.getenv('CHAT_SPOOL_TTL', '86400'))
+    
+    # ===== REINICIO SIN CORTES =====
+    # Socket Unix por el que un proceso nuevo (--takeover) hereda el socket de escucha
+    HANDOFF_SOCKET: str = os.getenv('CHAT_HANDOFF_SOCKET', str(BASE_DIR / 'data' / 'chat_server.sock'))
+    # Segundos que el proceso saliente espera a que los clientes reconecten
+    HANDOFF_DRAIN_TIMEOUT: float = float(os.getenv('CHAT_HANDOFF_DRAIN_TIMEOUT', '10'))
+    # Espera aleatoria máxima (ms) antes de reconectar, para repartir la carga
+    HANDOFF_JITTER_MS: int = int(os.getenv('CHAT_HANDOFF_JITTER_MS', '3000'))
+    
+    # ===== ADMINISTRACIÓN =====
+    # Socket Unix de administración (scripts/chat_admin.py); vacío = deshabilitado
+    ADMIN_SOCKET: str = os.getenv('CHAT_ADMIN_SOCKET', str(BASE_DIR / 'data' / 'chat_admin.sock'))
+    
+    # ===== PERFILADO =====
+    # Ventana de muestreo lanzada con SIGUSR2 o el comando "profile" de administración
+    PROFILE_DIR: Path = Path(os.getenv('CHAT_PROFILE_DIR', str(BASE_DIR / 'data' / 'profiles')))
+    PROFILE_SECONDS: float = float(os.getenv('CHAT_PROFILE_SECONDS', '10'))
+    PROFILE_INTERVAL_MS: float = float(os.getenv('CHAT_PROFILE_INTERVAL_MS', '10'))
+    # speedscope (JSON para https://www.speedscope.app) o collapsed (flamegraph.pl)
+    PROFILE_FORMAT: str = os.getenv('CHAT_PROFILE_FORMAT', 'speedscope').lower()
+    
+    # ===== LÍMITES ANTI-ABUSO =====
+    # Tiempo máximo (segundos) para completar TLS + intercambio de claves + autenticación
+    HANDSHAKE_TIMEOUT: float = float(os.getenv('CHAT_HANDSHAKE_TIMEOUT', '10'))
+    # Conexiones simultáneas que aún no se han autenticado
+    MAX_UNAUTHENTICATED: int = int(os.getenv('CHAT_MAX_UNAUTHENTICATED', '64'))
+    # Token buckets: tasa por segundo y ráfaga máxima
+    RATE_CONNECTIONS_PER_IP: float = float(os.getenv('CHAT_RATE_CONNECTIONS_PER_IP', '2'))
+    RATE_CONNECTIONS_BURST: int = int(os.getenv('CHAT_RATE_CONNECTIONS_BURST', '10'))
+    RATE_DECRYPTS_PER_IP: float = float(os.getenv('CHAT_RATE_DECRYPTS_PER_IP', '20'))
+    RATE_DECRYPTS_BURST: int = int(os.getenv('CHAT_RATE_DECRYPTS_BURST', '40'))
+    RATE_MESSAGES_PER_CLIENT: float = float(os.getenv('CHAT_RATE_MESSAGES_PER_CLIENT', '10'))
+    RATE_MESSAGES_BURST: int = int(os.getenv('CHAT_RATE_MESSAGES_BURST', '20'))
+    
     # ===== CONFIGURACIÓN DE LOGGING =====
     LOG_LEVEL: str = os.getenv('CHAT_LOG_LEVEL', 'INFO')
     LOG_FORMAT: str = '%(asctime)s - %(levelname)s: %(message)s'
     LOG_DATE_FORMAT: str = '%Y-%m-%d %H:%M:%S'
+    # Niveles por módulo, p. ej. "crypto=WARNING,server=DEBUG"
+    LOG_MODULE_LEVELS: str = os.getenv('CHAT_LOG_LEVELS', '')
+    # Escribir los logs desde un hilo dedicado (QueueHandler/QueueListener)
+    LOG_ASYNC: bool = os.getenv('CHAT_LOG_ASYNC', 'True').lower() in ('true', '1', 'yes')
     
     # ===== CONFIGURACIÓN DE CLIENTE =====
     CLIENT_RECEIVE_TIMEOUT: float = float(os.getenv('CHAT_CLIENT_TIMEOUT', '0.1'))
+    # Tokens de buzón (correo offline) del cliente de terminal, por servidor y nickname
+    CLIENT_INBOX_FILE: Path = Path(os.getenv('CHAT_CLIENT_INBOX_FILE', '~/.chat_inbox.json')).expanduser()
     
     # ===== CONFIGURACIÓN OAUTH 2.0 =====
     GOOGLE_CLIENT_ID: str = os.getenv('GOOGLE_CLIENT_ID', '')
     GOOGLE_CLIENT_SECRET: str = os.getenv('GOOGLE_CLIENT_SECRET', '')
-    OAUTH_SECRET_KEY: str = os.getenv('SECRET_KEY', os.urandom(24).hex())
+    # Sin SECRET_KEY se genera una vez y se guarda en SECRET_KEY_FILE (ver get_secret_key)
+    OAUTH_SECRET_KEY: str = os.getenv('SECRET_KEY', '')
+    SECRET_KEY_FILE: Path = Path(os.getenv('SECRET_KEY_FILE', str(BASE_DIR / 'data' / 'secret_key')))
+    # Descubrimiento OpenID de Google: caché en disco de metadatos + JWKS y su TTL (s)
+    OIDC_DISCOVERY_URL: str = os.getenv('OIDC_DISCOVERY_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+    OIDC_CACHE_FILE: Path = Path(os.getenv('OIDC_CACHE_FILE', str(BASE_DIR / 'data' / 'oidc_google.json')))
+    OIDC_CACHE_TTL: int = int(os.getenv('OIDC_CACHE_TTL', '21600'))
+    OIDC_FETCH_TIMEOUT: float = float(os.getenv('OIDC_FETCH_TIMEOUT', '5'))
+    # JSON local que sustituye a Google (pruebas), p. ej. auth/fixtures/google_openid_configuration.json
+    OIDC_FIXTURE: str = os.getenv('OIDC_FIXTURE', '')
+    
+    # ===== SESIONES DEL SERVIDOR WEB =====
+    # sqlite o filesystem (compartidas entre workers) o cookie (sesión firmada de Flask)
+    SESSION_BACKEND: str = os.getenv('SESSION_BACKEND', 'sqlite').lower()
+    SESSION_DB: Path = Path(os.getenv('SESSION_DB', str(BASE_DIR / 'data' / 'sessions.db')))
+    SESSION_DIR: Path = Path(os.getenv('SESSION_DIR', str(BASE_DIR / 'data' / 'sessions')))
+    # Duración de una sesión y segundos que las páginas de solo lectura usan el
+    # usuario de la sesión desde la caché en memoria de cada worker
+    SESSION_LIFETIME: int = int(os.getenv('SESSION_LIFETIME', str(7 * 24 * 3600)))
+    SESSION_CACHE_TTL: float = float(os.getenv('SESSION_CACHE_TTL', '5'))
     
     # ===== CONFIGURACIÓN SERVIDOR WEB OAUTH =====
     WEB_SERVER_HOST: str = os.getenv('WEB_SERVER_HOST', '0.0.0.0')
     WEB_SERVER_PORT: int = int(os.getenv('WEB_SERVER_PORT', '5000'))
+    # Modo producción (python web_server.py --production, con gunicorn)
+    WEB_SERVER_WORKERS: int = int(os.getenv('WEB_SERVER_WORKERS', str(min(4, (os.cpu_count() or 1) * 2 + 1))))
+    WEB_SERVER_THREADS: int = int(os.getenv('WEB_SERVER_THREADS', '4'))
+    # Cargar la aplicación en el proceso maestro antes del fork. Desactivado por
+    # defecto: cada worker crea la suya (hilos y conexiones propios desde el inicio)
+    WEB_SERVER_PRELOAD: bool = os.getenv('WEB_SERVER_PRELOAD', 'False').lower() in ('true', '1', 'yes')
+    # Segundos máximos por petición (firmas PDF grandes) y para terminar al reiniciar
+    WEB_SERVER_TIMEOUT: int = int(os.getenv('WEB_SERVER_TIMEOUT', '120'))
+    WEB_SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv('WEB_SERVER_GRACEFUL_TIMEOUT', '30'))
+    # Reciclar cada worker tras N peticiones (0 = nunca)
+    WEB_SERVER_MAX_REQUESTS: int = int(os.getenv('WEB_SERVER_MAX_REQUESTS', '0'))
+    
+    # ===== FIRMA DE PDF EN SEGUNDO PLANO =====
+    # Carpeta de trabajos (compartida por todos los workers del servidor web)
+    SIGN_JOBS_DIR: Path = Path(os.getenv('SIGN_JOBS_DIR', str(BASE_DIR / 'data' / 'sign_jobs')))
+    # Firmas simultáneas y trabajos admitidos en cola por proceso
+    SIGN_JOBS_WORKERS: int = int(os.getenv('SIGN_JOBS_WORKERS', '2'))
+    SIGN_JOBS_MAX_PENDING: int = int(os.getenv('SIGN_JOBS_MAX_PENDING', '32'))
+    # Segundos máximos por firma y tiempo que se conservan los resultados
+    SIGN_JOBS_TIMEOUT: int = int(os.getenv('SIGN_JOBS_TIMEOUT', '120'))
+    SIGN_JOBS_TTL: int = int(os.getenv('SIGN_JOBS_TTL', '3600'))
+    # Segundos que /sign/pdf espera la firma antes de responder 202 con el trabajo
+    SIGN_PDF_MAX_WAIT: float = float(os.getenv('SIGN_PDF_MAX_WAIT', '5'))
+    # Entradas pequeñas (PDF y PFX) en tmpfs en lugar de disco ('' = nunca)
+    SIGN_MEMORY_DIR: str = os.getenv('SIGN_MEMORY_DIR', '/dev/shm')
+    SIGN_MEMORY_MAX_BYTES: int = int(os.getenv('SIGN_MEMORY_MAX_BYTES', str(16 * 1024 * 1024)))
+    # Máximo en tmpfs entre todas las firmas en curso del proceso (el resto va a disco)
+    SIGN_MEMORY_TOTAL_BYTES: int = int(os.getenv('SIGN_MEMORY_TOTAL_BYTES', str(64 * 1024 * 1024)))
+    # Caché de PDFs firmados (documento + certificado + opciones) con expulsión LRU
+    SIGN_CACHE_ENABLED: bool = os.getenv('SIGN_CACHE_ENABLED', 'True').lower() in ('true', '1', 'yes')
+    SIGN_CACHE_DIR: Path = Path(os.getenv('SIGN_CACHE_DIR', str(BASE_DIR / 'data' / 'sign_cache')))
+    SIGN_CACHE_MAX_BYTES: int = int(os.getenv('SIGN_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+    # Firma por lotes (/sign/batch): documentos por lote, huecos de la cola que ocupa
+    # cada lote a la vez (SIGN_JOBS_WORKERS como máximo) y lotes simultáneos
+    SIGN_BATCH_MAX_FILES: int = int(os.getenv('SIGN_BATCH_MAX_FILES', '100'))
+    SIGN_BATCH_WORKERS: int = int(os.getenv('SIGN_BATCH_WORKERS', '4'))
+    SIGN_BATCH_MAX_ACTIVE: int = int(os.getenv('SIGN_BATCH_MAX_ACTIVE', '2'))
+    # Renderers de Chrome reutilizados (TXT/ZIP a PDF) e identidades PFX en caché,
+    # en cada proceso de firma de la cola
+    SIGNER_RENDERER_POOL: int = int(os.getenv('SIGNER_RENDERER_POOL', os.getenv('SIGN_JOBS_WORKERS', '2')))
+    SIGNER_SIGNATURE_CACHE: int = int(os.getenv('SIGNER_SIGNATURE_CACHE', '8'))
+    # Arrancar los renderers al iniciar cada proceso de firma (se crean con spawn, no con fork)
+    SIGNER_WARMUP: bool = os.getenv('SIGNER_WARMUP', 'False').lower() in ('true', '1', 'yes')
+    
+    # ===== ESTÁTICOS DEL SERVIDOR WEB =====
+    # Manifiesto de scripts/build_static.py (si no existe se sirven los originales)
+    STATIC_MANIFEST: Path = Path(os.getenv('STATIC_MANIFEST', str(BASE_DIR / 'auth' / 'static' / 'dist' / 'manifest.json')))
+    
+    @classmethod
+    def get_secret_key(cls) -> str:
+        """Retorna SECRET_KEY o la clave persistida en SECRET_KEY_FILE.
+        
+        Si no existe, la genera con ``os.urandom``, la escribe completa en un
+        temporal (0600) y lo enlaza con ``os.link``, que falla si otro proceso
+        ya la creó: el archivo nunca se ve vacío ni a medias, y todos los
+        workers y reinicios usan la misma clave.
+        """
+        if cls.OAUTH_SECRET_KEY:
+            return cls.OAUTH_SECRET_KEY
+        
+        path = cls.SECRET_KEY_FILE
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.secret_key-', dir=path.parent)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(os.urandom(32).hex())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.link(tmp, path)
+            except FileExistsError:
+                # Otro worker la creó primero: se usa la suya
+                pass
+            finally:
+                os.unlink(tmp)
+        
+        key = path.read_text().strip()
+        if not key:
+            raise RuntimeError(f"Clave secreta vacía en {path}: bórrala para generar otra")
+        return key
     
     @classmethod
     def get_server_config(cls) -> dict:
@@ -87,8 +265,22 @@ class Config:
             'port': cls.DEFAULT_PORT,
             'password': cls.SERVER_PASSWORD,
             'max_clients': cls.MAX_CLIENTS,
+            'default_room': cls.DEFAULT_ROOM,
+            'max_rooms': cls.MAX_ROOMS,
             'buffer_size': cls.BUFFER_SIZE,
+            'handshake_timeout': cls.HANDSHAKE_TIMEOUT,
+            'max_unauthenticated': cls.MAX_UNAUTHENTICATED,
+            'history_enabled': cls.HISTORY_ENABLED,
+            'history_dir': str(cls.HISTORY_DIR),
+            'history_replay_count': cls.HISTORY_REPLAY_COUNT,
+            'history_replay_minutes': cls.HISTORY_REPLAY_MINUTES,
+            'search_enabled': cls.SEARCH_ENABLED,
+            'search_db': str(cls.SEARCH_DB),
+            'spool_enabled': cls.SPOOL_ENABLED,
+            'spool_dir': str(cls.SPOOL_DIR),
             'rsa_key_size': cls.RSA_KEY_SIZE,
+            'crypto_batch_workers': cls.CRYPTO_BATCH_WORKERS,
+            'integrity_mode': cls.INTEGRITY_MODE,
             'private_key_path': str(cls.SERVER_PRIVATE_KEY_PATH),
             'public_key_path': str(cls.SERVER_PUBLIC_KEY_PATH),
             'enable_ssl': cls.ENABLE_SSL,
@@ -106,6 +298,7 @@ class Config:
             'buffer_size': cls.BUFFER_SIZE,
             'public_key_path': str(cls.SERVER_PUBLIC_KEY_PATH),
             'receive_timeout': cls.CLIENT_RECEIVE_TIMEOUT,
+            'integrity_mode': cls.INTEGRITY_MODE,
         }
     
     @classmethod
@@ -117,8 +310,18 @@ class Config:
         print(f"Host por defecto: {cls.DEFAULT_HOST}")
         print(f"Puerto por defecto: {cls.DEFAULT_PORT}")
         print(f"Máximo de clientes: {cls.MAX_CLIENTS}")
+        print(f"Sala por defecto: #{cls.DEFAULT_ROOM}")
         print(f"Tamaño de buffer: {cls.BUFFER_SIZE} bytes")
+        print(f"Timeout de handshake: {cls.HANDSHAKE_TIMEOUT} s")
+        print(f"Conexiones sin autenticar: {cls.MAX_UNAUTHENTICATED}")
+        print(f"Historial: {cls.HISTORY_DIR if cls.HISTORY_ENABLED else 'deshabilitado'}")
+        print(f"Índice de búsqueda: {cls.SEARCH_DB if cls.SEARCH_ENABLED else 'deshabilitado'}")
+        if cls.SPOOL_ENABLED and not cls.HISTORY_ENABLED:
+            print("Mensajes pendientes: deshabilitado (requiere historial)")
+        else:
+            print(f"Mensajes pendientes: {cls.SPOOL_DIR if cls.SPOOL_ENABLED else 'deshabilitado'}")
         print(f"Tamaño de clave RSA: {cls.RSA_KEY_SIZE} bits")
+        print(f"Modo de integridad: {cls.INTEGRITY_MODE}")
         print(f"Nivel de logging: {cls.LOG_LEVEL}")
         print(f"Clave privada del servidor: {cls.SERVER_PRIVATE_KEY_PATH}")
         print(f"Clave pública del servidor: {cls.SERVER_PUBLIC_KEY_PATH}")
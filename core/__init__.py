@@ -0,0 +1 @@
+# Módulos de infraestructura compartidos por el servidor de chat y el puente
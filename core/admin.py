@@ -0,0 +1,122 @@
+"""
+Socket Unix de administración para inspeccionar un servidor en marcha.
+
+Protocolo de texto por líneas: el cliente envía `comando arg1 arg2...` y
+recibe una línea JSON `{"ok": true, "resultado": ...}` o
+`{"ok": false, "error": "..."}`. Cada conexión se atiende en su propio hilo,
+fuera de los hilos de clientes del chat.
+"""
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+ComandoAdmin = Callable[[list[str]], Any]
+
+_MAX_LINEA = 4096
+
+
+def volcar_hilos() -> dict[str, list[str]]:
+    """Pila actual de cada hilo del proceso, por nombre de hilo."""
+    nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+    return {
+        f'{nombres.get(ident, "?")} ({ident})': traceback.format_stack(marco)
+        for ident, marco in sys._current_frames().items()
+    }
+
+
+def instantanea_pilas() -> dict[str, int]:
+    """Pilas actuales agrupadas en formato "collapsed" (marcos separados por ';').
+    
+    Cuenta cuántos hilos comparten cada pila: una sola muestra, útil para ver
+    dónde están esperando los hilos en este instante.
+    """
+    pilas: dict[str, int] = {}
+    for marco in sys._current_frames().values():
+        funciones = []
+        while marco is not None:
+            codigo = marco.f_code
+            funciones.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{marco.f_lineno})')
+            marco = marco.f_back
+        pila = ';'.join(reversed(funciones))
+        pilas[pila] = pilas.get(pila, 0) + 1
+    return pilas
+
+
+class AdminServer:
+    """Servidor de comandos de administración sobre un socket Unix."""
+
+    def __init__(self, ruta: str | Path, comandos: dict[str, ComandoAdmin]):
+        """Prepara el servidor (no escucha hasta llamar a `iniciar`).
+        
+        Args:
+            ruta: Ruta del socket Unix (solo accesible por el usuario actual)
+            comandos: Nombre del comando -> función que recibe los argumentos
+                y devuelve un resultado serializable a JSON
+        """
+        self.ruta = Path(ruta)
+        self.comandos = dict(comandos)
+        self.comandos.setdefault('help', lambda args: sorted(self.comandos))
+        self._escucha: socket.socket | None = None
+
+    def iniciar(self) -> None:
+        """Crea el socket y atiende conexiones en un hilo daemon."""
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta.unlink(missing_ok=True)
+        self._escucha = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._escucha.bind(str(self.ruta))
+        os.chmod(self.ruta, 0o600)
+        self._escucha.listen(4)
+        threading.Thread(target=self._bucle, name="AdminSocket", daemon=True).start()
+        logger.info("🛠️  Socket de administración en %s", self.ruta)
+
+    def _bucle(self) -> None:
+        while True:
+            try:
+                conexion, _ = self._escucha.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._atender, args=(conexion,), name="AdminConn", daemon=True).start()
+
+    def _atender(self, conexion: socket.socket) -> None:
+        with conexion, conexion.makefile('rwb') as canal:
+            while True:
+                linea = canal.readline(_MAX_LINEA + 1)
+                if not linea:
+                    return
+                if len(linea) > _MAX_LINEA:
+                    respuesta = {'ok': False, 'error': 'Comando demasiado largo'}
+                else:
+                    respuesta = self.ejecutar(linea.decode('utf-8', 'replace').strip())
+                canal.write(json.dumps(respuesta, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+                canal.flush()
+
+    def ejecutar(self, linea: str) -> dict:
+        """Ejecuta una línea de comando y devuelve la respuesta."""
+        partes = linea.split()
+        if not partes:
+            return {'ok': False, 'error': 'Comando vacío'}
+        nombre, argumentos = partes[0].lower(), partes[1:]
+        comando = self.comandos.get(nombre)
+        if comando is None:
+            return {'ok': False, 'error': f'Comando desconocido: {nombre}'}
+        try:
+            return {'ok': True, 'resultado': comando(argumentos)}
+        except (ValueError, LookupError) as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logger.error("❌ Error en comando de administración %s: %s", nombre, e)
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+    def cerrar(self) -> None:
+        """Deja de aceptar conexiones de administración."""
+        if self._escucha is not None:
+            self._escucha.close()
+            self._escucha = None
@@ -0,0 +1,153 @@
+"""
+Relevo del socket de escucha entre procesos para reinicios sin cortes.
+
+El proceso en marcha escucha en un socket Unix. El proceso nuevo se conecta,
+pide el relevo y recibe el descriptor del socket de escucha mediante
+SCM_RIGHTS (socket.send_fds/recv_fds). Las conexiones que llegan mientras
+tanto esperan en la cola del kernel, así que no se pierde ninguna.
+
+Tras el descriptor, la misma conexión queda abierta como canal de reenvío:
+el proceso anterior, que ya cedió el almacenamiento, envía por ella (una
+línea JSON por registro) los mensajes que aún le llegan de sus clientes
+mientras reconectan, y la cierra al terminar.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_SOLICITUD = b'TAKEOVER\n'
+_RESPUESTA = b'LISTEN'
+
+
+class HandoffError(RuntimeError):
+    """No se pudo completar el relevo del socket de escucha."""
+
+
+def _crear_escucha_unix(ruta: Path) -> socket.socket:
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    # Un archivo de socket que sobrevive a un proceso anterior impide el bind
+    ruta.unlink(missing_ok=True)
+    escucha = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    escucha.bind(str(ruta))
+    os.chmod(ruta, 0o600)
+    escucha.listen(1)
+    return escucha
+
+
+def servir_relevo(
+    ruta: str | Path,
+    ceder: Callable[[], socket.socket],
+    al_entregar: Callable[[socket.socket], None] | None = None
+) -> threading.Thread:
+    """Atiende una petición de relevo en segundo plano.
+    
+    Args:
+        ruta: Ruta del socket Unix de control
+        ceder: Se invoca al recibir la petición; debe dejar de aceptar
+            conexiones y devolver el socket de escucha a entregar
+        al_entregar: Se invoca una vez enviado el descriptor con la conexión
+            de control, que pasa a ser suya como canal de reenvío (debe
+            cerrarla al terminar). Sin él se cierra en el acto
+            
+    Returns:
+        Hilo (daemon) que atiende la petición
+    """
+    escucha = _crear_escucha_unix(Path(ruta))
+
+    def atender() -> None:
+        with escucha:
+            while True:
+                conexion, _ = escucha.accept()
+                conexion.settimeout(5)
+                try:
+                    if conexion.recv(len(_SOLICITUD)) != _SOLICITUD:
+                        conexion.close()
+                        continue
+                except OSError:
+                    conexion.close()
+                    continue
+                try:
+                    servidor = ceder()
+                    socket.send_fds(conexion, [_RESPUESTA], [servidor.fileno()])
+                except Exception as e:
+                    logger.error("❌ Error cediendo el socket de escucha: %s", e)
+                    conexion.close()
+                    continue
+                logger.info("🔁 Socket de escucha entregado al nuevo proceso")
+                if al_entregar is not None:
+                    al_entregar(conexion)
+                else:
+                    conexion.close()
+                return
+
+    hilo = threading.Thread(target=atender, name="ListenerHandoff", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def solicitar_relevo(ruta: str | Path, timeout: float = 30.0) -> tuple[socket.socket, socket.socket]:
+    """Pide al proceso en marcha su socket de escucha.
+    
+    Args:
+        ruta: Ruta del socket Unix de control del proceso anterior
+        timeout: Segundos máximos de espera
+        
+    Returns:
+        Socket de escucha heredado (en modo bloqueante) y canal de reenvío
+        (ver recibir_reenvios), que el proceso anterior cierra al terminar
+        
+    Raises:
+        HandoffError: Si no hay proceso que ceda el socket o la respuesta es inválida
+    """
+    conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conexion.settimeout(timeout)
+        conexion.connect(str(ruta))
+        conexion.sendall(_SOLICITUD)
+        mensaje, descriptores, _, _ = socket.recv_fds(conexion, len(_RESPUESTA), 1)
+    except OSError as e:
+        conexion.close()
+        raise HandoffError(f"No se pudo obtener el socket de {ruta}: {e}") from e
+
+    if mensaje != _RESPUESTA or not descriptores:
+        for fd in descriptores:
+            os.close(fd)
+        conexion.close()
+        raise HandoffError("Respuesta de relevo inválida")
+    servidor = socket.socket(fileno=descriptores[0])
+    servidor.setblocking(True)
+    conexion.settimeout(None)
+    return servidor, conexion
+
+
+def reenviar(canal: socket.socket, registro: dict) -> None:
+    """Envía un registro por el canal de reenvío (una línea JSON)."""
+    canal.sendall(json.dumps(registro, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+def recibir_reenvios(canal: socket.socket) -> Iterator[dict]:
+    """Registros del canal de reenvío hasta que el proceso anterior lo cierra."""
+    pendiente = b''
+    while True:
+        try:
+            datos = canal.recv(65536)
+        except OSError as e:
+            logger.warning("⚠️  Canal de reenvío interrumpido: %s", e)
+            return
+        if not datos:
+            return
+        *lineas, pendiente = (pendiente + datos).split(b'\n')
+        for linea in lineas:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                logger.warning("⚠️  Registro de reenvío inválido descartado")
+                continue
+            if isinstance(registro, dict):
+                yield registro
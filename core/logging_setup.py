@@ -0,0 +1,98 @@
+"""
+Subsistema de logging del chat.
+Los registros se encolan en memoria y un hilo dedicado (QueueListener) hace la
+E/S, de modo que los hilos de conexión nunca se bloquean escribiendo logs.
+Permite fijar niveles por módulo para silenciar las rutas calientes.
+"""
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from config import Config
+
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+
+
+class _QueueHandlerDiferido(QueueHandler):
+    """QueueHandler que deja el formateo del mensaje al hilo del listener.
+
+    La cola es local al proceso, así que no hace falta serializar el registro
+    (el QueueHandler estándar lo formatea en el hilo que emite el log).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _parsear_niveles(especificacion: str) -> dict[str, int]:
+    """Convierte 'crypto=WARNING,server=DEBUG' en {'crypto': 30, 'server': 10}."""
+    niveles = {}
+    for entrada in especificacion.split(','):
+        if '=' not in entrada:
+            continue
+        nombre, nivel = (parte.strip() for parte in entrada.split('=', 1))
+        valor = logging.getLevelName(nivel.upper())
+        if nombre and isinstance(valor, int):
+            niveles[nombre] = valor
+    return niveles
+
+
+def configurar_logging(nivel: str | None = None, niveles_modulo: str | None = None) -> None:
+    """Configura el logging asíncrono del proceso (idempotente).
+    
+    Args:
+        nivel: Nivel raíz (por defecto Config.LOG_LEVEL)
+        niveles_modulo: Niveles por logger, p. ej. 'crypto=WARNING,server=INFO'
+            (por defecto Config.LOG_MODULE_LEVELS)
+    """
+    global _listener
+
+    with _lock:
+        raiz = logging.getLogger()
+        raiz.setLevel(getattr(logging, (nivel or Config.LOG_LEVEL).upper(), logging.INFO))
+
+        for nombre, valor in _parsear_niveles(niveles_modulo if niveles_modulo is not None
+                                              else Config.LOG_MODULE_LEVELS).items():
+            logging.getLogger(nombre).setLevel(valor)
+
+        if _listener is not None:
+            return
+
+        salida = logging.StreamHandler()
+        salida.setFormatter(logging.Formatter(Config.LOG_FORMAT, datefmt=Config.LOG_DATE_FORMAT))
+
+        if not Config.LOG_ASYNC:
+            raiz.handlers[:] = [salida]
+            return
+
+        cola: queue.SimpleQueue = queue.SimpleQueue()
+        raiz.handlers[:] = [_QueueHandlerDiferido(cola)]
+
+        _listener = QueueListener(cola, salida, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener_logging)
+
+
+def detener_logging() -> None:
+    """Vacía la cola de logs y detiene el hilo escritor."""
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def establecer_nivel(nombre: str, nivel: str) -> None:
+    """Cambia en caliente el nivel de un logger ('' o 'root' para el raíz).
+    
+    Raises:
+        ValueError: Si el nivel no existe
+    """
+    valor = logging.getLevelName(nivel.upper())
+    if not isinstance(valor, int):
+        raise ValueError(f"Nivel de logging desconocido: {nivel}")
+    logging.getLogger(None if nombre in ('', 'root') else nombre).setLevel(valor)
@@ -0,0 +1,407 @@
+"""
+Historial de mensajes persistente en un log segmentado de solo anexado.
+
+Cada segmento es un par de archivos con el offset base en el nombre:
+
+    00000000000000000000.log   registros: <longitud:u32><json utf-8>
+    00000000000000000000.idx   índice fijo: <posición:u64><timestamp:f64> por registro
+    00000000000000000000.sal   sala de cada registro: <longitud:u16><sala utf-8>
+
+Los segmentos se rotan por tamaño o antigüedad y se descartan los más viejos
+por encima de `max_segmentos`. Las lecturas de segmentos cerrados usan mmap y
+los índices en memoria permiten localizar un offset, un instante o los
+mensajes de una sala sin recorrer el historial.
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_CABECERA = struct.Struct('<I')
+_ENTRADA_INDICE = struct.Struct('<Qd')
+_CABECERA_SALA = struct.Struct('<H')
+
+
+class LogRecord(NamedTuple):
+    """Mensaje almacenado en el historial."""
+    offset: int
+    timestamp: float
+    sala: str
+    nickname: str
+    texto: str
+
+
+class _Segmento:
+    """Segmento del log con su índice cargado en memoria."""
+
+    __slots__ = ('base', 'ruta_log', 'ruta_idx', 'ruta_salas', 'posiciones', 'tiempos', 'salas',
+                 'tamano', 'creado', '_mapa', '_lock_mapa')
+
+    def __init__(self, directorio: Path, base: int):
+        self.base = base
+        self.ruta_log = directorio / f'{base:020d}.log'
+        self.ruta_idx = directorio / f'{base:020d}.idx'
+        self.ruta_salas = directorio / f'{base:020d}.sal'
+        self.posiciones = array('Q')
+        self.tiempos = array('d')
+        # sala -> posiciones locales (ordenadas) de sus registros en el segmento
+        self.salas: dict[str, array] = {}
+        self.tamano = 0
+        self.creado = time.time()
+        self._mapa: mmap.mmap | None = None
+        # Lectores concurrentes: un solo mmap por segmento
+        self._lock_mapa = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.posiciones)
+
+    def cargar(self) -> None:
+        """Carga el índice y reconstruye las entradas que falten tras un cierre abrupto."""
+        self.ruta_log.touch()
+        self.tamano = self.ruta_log.stat().st_size
+        if self.ruta_idx.exists():
+            datos = self.ruta_idx.read_bytes()
+            datos = datos[:len(datos) - len(datos) % _ENTRADA_INDICE.size]
+            for posicion, ts in _ENTRADA_INDICE.iter_unpack(datos):
+                if posicion >= self.tamano:
+                    break
+                self.posiciones.append(posicion)
+                self.tiempos.append(ts)
+        if self.tiempos:
+            self.creado = self.tiempos[0]
+
+        # Recorrer la cola del log no indexada (o truncar un registro incompleto)
+        posicion = self._fin_ultimo_registro()
+        nuevas = []
+        with open(self.ruta_log, 'rb') as f:
+            f.seek(posicion)
+            while posicion + _CABECERA.size <= self.tamano:
+                (longitud,) = _CABECERA.unpack(f.read(_CABECERA.size))
+                cuerpo = f.read(longitud)
+                if len(cuerpo) < longitud:
+                    break
+                nuevas.append((posicion, json.loads(cuerpo)['ts']))
+                posicion += _CABECERA.size + longitud
+        if posicion < self.tamano:
+            logger.warning("⚠️  Registro incompleto en %s; truncando", self.ruta_log.name)
+            os.truncate(self.ruta_log, posicion)
+            self.tamano = posicion
+        if nuevas:
+            with open(self.ruta_idx, 'ab') as f:
+                for posicion, ts in nuevas:
+                    f.write(_ENTRADA_INDICE.pack(posicion, ts))
+                    self.posiciones.append(posicion)
+                    self.tiempos.append(ts)
+
+        self._cargar_salas()
+
+    def _cargar_salas(self) -> None:
+        """Carga el índice por sala y completa las entradas que falten."""
+        datos = self.ruta_salas.read_bytes() if self.ruta_salas.exists() else b''
+        posicion = 0
+        i = 0
+        while i < len(self) and posicion + _CABECERA_SALA.size <= len(datos):
+            (longitud,) = _CABECERA_SALA.unpack_from(datos, posicion)
+            inicio = posicion + _CABECERA_SALA.size
+            if inicio + longitud > len(datos):
+                break
+            self.agregar_sala(datos[inicio:inicio + longitud].decode('utf-8'), i)
+            posicion = inicio + longitud
+            i += 1
+        if posicion < len(datos):
+            # Entradas de registros truncados o escritura incompleta
+            os.truncate(self.ruta_salas, posicion)
+
+        if i < len(self):
+            # Índice ausente (historial anterior) o incompleto tras un cierre abrupto
+            logger.warning("⚠️  Índice de salas incompleto en %s; reconstruyendo %d entradas",
+                           self.ruta_salas.name, len(self) - i)
+            with open(self.ruta_log, 'rb') as log, open(self.ruta_salas, 'ab') as f:
+                for j in range(i, len(self)):
+                    (longitud,) = _CABECERA.unpack(os.pread(log.fileno(), _CABECERA.size, self.posiciones[j]))
+                    cuerpo = os.pread(log.fileno(), longitud, self.posiciones[j] + _CABECERA.size)
+                    sala = json.loads(cuerpo)['sala']
+                    f.write(_entrada_sala(sala))
+                    self.agregar_sala(sala, j)
+
+    def agregar_sala(self, sala: str, i: int) -> None:
+        """Añade la posición local `i` al índice de `sala`."""
+        locales = self.salas.get(sala)
+        if locales is None:
+            locales = self.salas[sala] = array('I')
+        locales.append(i)
+
+    def indices(self, longitud: int, desde: int, sala: str | None) -> range | array:
+        """Posiciones locales en [desde, longitud), solo las de `sala` si se indica."""
+        if sala is None:
+            return range(desde, longitud)
+        locales = self.salas.get(sala)
+        if not locales:
+            return range(0)
+        return locales[bisect.bisect_left(locales, desde):bisect.bisect_left(locales, longitud)]
+
+    def _fin_ultimo_registro(self) -> int:
+        if not self.posiciones:
+            return 0
+        with open(self.ruta_log, 'rb') as f:
+            f.seek(self.posiciones[-1])
+            (longitud,) = _CABECERA.unpack(f.read(_CABECERA.size))
+        return self.posiciones[-1] + _CABECERA.size + longitud
+
+    def mapear(self) -> mmap.mmap:
+        """mmap de solo lectura del segmento (se usa una vez sellado)."""
+        mapa = self._mapa
+        if mapa is not None:
+            return mapa
+        with self._lock_mapa:
+            if self._mapa is None:
+                with open(self.ruta_log, 'rb') as f:
+                    self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mapa
+
+    def cerrar(self) -> None:
+        with self._lock_mapa:
+            if self._mapa is not None:
+                self._mapa.close()
+                self._mapa = None
+
+
+def _entrada_sala(sala: str) -> bytes:
+    """Entrada del índice de salas para un registro."""
+    nombre = sala.encode('utf-8')
+    return _CABECERA_SALA.pack(len(nombre)) + nombre
+
+
+class MessageLog:
+    """Log de mensajes de solo anexado con rotación de segmentos."""
+
+    def __init__(
+        self,
+        directorio: str | Path,
+        max_bytes_segmento: int = 16 * 1024 * 1024,
+        max_segundos_segmento: float = 24 * 3600,
+        max_segmentos: int = 64,
+        fsync: bool = False
+    ):
+        """Abre (o crea) el log en `directorio`.
+        
+        Args:
+            directorio: Carpeta de los segmentos
+            max_bytes_segmento: Tamaño a partir del cual se rota el segmento activo
+            max_segundos_segmento: Antigüedad a partir de la cual se rota
+            max_segmentos: Segmentos conservados; los más antiguos se borran
+            fsync: Forzar cada escritura a disco (más lento, más durable)
+        """
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes_segmento = max_bytes_segmento
+        self.max_segundos_segmento = max_segundos_segmento
+        self.max_segmentos = max(1, max_segmentos)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        bases = sorted(int(ruta.stem) for ruta in self.directorio.glob('*.log') if ruta.stem.isdigit())
+        self._segmentos: list[_Segmento] = []
+        for base in bases or [0]:
+            segmento = _Segmento(self.directorio, base)
+            segmento.cargar()
+            self._segmentos.append(segmento)
+
+        self._abrir_activo()
+        logger.info("🗄️  Historial abierto en %s (%d mensajes, %d segmentos)",
+                    self.directorio, self.siguiente_offset - self.primer_offset, len(self._segmentos))
+
+    @property
+    def primer_offset(self) -> int:
+        """Offset del mensaje más antiguo conservado."""
+        return self._segmentos[0].base
+
+    @property
+    def siguiente_offset(self) -> int:
+        """Offset que recibirá el próximo mensaje."""
+        activo = self._segmentos[-1]
+        return activo.base + len(activo)
+
+    def _abrir_activo(self) -> None:
+        activo = self._segmentos[-1]
+        self._log = open(activo.ruta_log, 'ab')
+        self._idx = open(activo.ruta_idx, 'ab')
+        self._salas = open(activo.ruta_salas, 'ab')
+
+    def _cerrar_activo(self) -> None:
+        self._log.close()
+        self._idx.close()
+        self._salas.close()
+
+    def _rotar(self) -> None:
+        # Requiere tener self._lock
+        self._cerrar_activo()
+        self._segmentos.append(_Segmento(self.directorio, self.siguiente_offset))
+        while len(self._segmentos) > self.max_segmentos:
+            viejo = self._segmentos.pop(0)
+            # Un lector que aún lo recorra lo verá como fin de datos (ver _leer_segmento)
+            viejo.cerrar()
+            viejo.ruta_log.unlink(missing_ok=True)
+            viejo.ruta_idx.unlink(missing_ok=True)
+            viejo.ruta_salas.unlink(missing_ok=True)
+        self._abrir_activo()
+
+    def anexar(self, sala: str, nickname: str, texto: str, timestamp: float | None = None) -> int:
+        """Añade un mensaje al historial y devuelve su offset."""
+        ts = time.time() if timestamp is None else timestamp
+        cuerpo = json.dumps({'ts': ts, 'sala': sala, 'nick': nickname, 'texto': texto},
+                            ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        with self._lock:
+            activo = self._segmentos[-1]
+            if len(activo) and (activo.tamano >= self.max_bytes_segmento
+                                or ts - activo.creado >= self.max_segundos_segmento):
+                self._rotar()
+                activo = self._segmentos[-1]
+            if not len(activo):
+                activo.creado = ts
+
+            offset = activo.base + len(activo)
+            posicion = activo.tamano
+            self._log.write(_CABECERA.pack(len(cuerpo)) + cuerpo)
+            self._log.flush()
+            self._idx.write(_ENTRADA_INDICE.pack(posicion, ts))
+            self._idx.flush()
+            self._salas.write(_entrada_sala(sala))
+            self._salas.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            activo.tamano += _CABECERA.size + len(cuerpo)
+            # La sala se indexa antes de publicar la posición: un lector sin lock
+            # nunca ve un registro sin su entrada de sala
+            activo.agregar_sala(sala, len(activo))
+            activo.posiciones.append(posicion)
+            activo.tiempos.append(ts)
+            return offset
+
+    @staticmethod
+    def _decodificar(segmento: _Segmento, i: int, cuerpo: bytes) -> LogRecord:
+        datos = json.loads(cuerpo)
+        return LogRecord(segmento.base + i, datos['ts'], datos['sala'], datos['nick'], datos['texto'])
+
+    def _leer_segmento(self, segmento: _Segmento, indices, activo: bool) -> Iterator[LogRecord]:
+        """Registros `indices` de un segmento, con un solo descriptor o mmap por lectura.
+        
+        Si la rotación borra el segmento mientras se lee, se trata como fin de
+        datos del segmento en lugar de fallar en el hilo del cliente.
+        """
+        if not len(indices):
+            return
+        if activo:
+            # El segmento activo sigue creciendo: lectura posicional sin mmap
+            try:
+                f = open(segmento.ruta_log, 'rb')
+            except FileNotFoundError:
+                return
+            with f:
+                fd = f.fileno()
+                for i in indices:
+                    posicion = segmento.posiciones[i]
+                    (longitud,) = _CABECERA.unpack(os.pread(fd, _CABECERA.size, posicion))
+                    yield self._decodificar(segmento, i, os.pread(fd, longitud, posicion + _CABECERA.size))
+            return
+
+        try:
+            mapa = segmento.mapear()
+        except FileNotFoundError:
+            return
+        for i in indices:
+            posicion = segmento.posiciones[i]
+            try:
+                (longitud,) = _CABECERA.unpack_from(mapa, posicion)
+                inicio = posicion + _CABECERA.size
+                cuerpo = mapa[inicio:inicio + longitud]
+            except ValueError:
+                # mmap cerrado por la rotación durante la lectura
+                return
+            yield self._decodificar(segmento, i, cuerpo)
+
+    def _instantanea(self, hasta_offset: int | None) -> tuple[list[_Segmento], list[int]]:
+        """Segmentos y número de registros visibles hasta `hasta_offset` (excluido)."""
+        with self._lock:
+            segmentos = list(self._segmentos)
+            longitudes = [len(s) for s in segmentos]
+        if hasta_offset is not None:
+            longitudes = [max(0, min(n, hasta_offset - s.base)) for s, n in zip(segmentos, longitudes)]
+        return segmentos, longitudes
+
+    def leer(
+        self,
+        desde_offset: int,
+        limite: int | None = None,
+        sala: str | None = None,
+        hasta_offset: int | None = None
+    ) -> list[LogRecord]:
+        """Mensajes desde `desde_offset` (incluido), en orden.
+        
+        Con `sala` solo se leen los registros de esa sala (índice por sala),
+        sin decodificar los demás.
+        
+        Args:
+            desde_offset: Primer offset a devolver (se ajusta al más antiguo conservado)
+            limite: Máximo de mensajes a devolver
+            sala: Si se indica, solo mensajes de esa sala
+            hasta_offset: Si se indica, offset final (excluido)
+        """
+        segmentos, longitudes = self._instantanea(hasta_offset)
+
+        resultado: list[LogRecord] = []
+        for n, (segmento, longitud) in enumerate(zip(segmentos, longitudes)):
+            if segmento.base + longitud <= desde_offset:
+                continue
+            indices = segmento.indices(longitud, max(0, desde_offset - segmento.base), sala)
+            for registro in self._leer_segmento(segmento, indices, n == len(segmentos) - 1):
+                resultado.append(registro)
+                if limite is not None and len(resultado) >= limite:
+                    return resultado
+        return resultado
+
+    def ultimos(self, n: int, sala: str | None = None, hasta_offset: int | None = None) -> list[LogRecord]:
+        """Los `n` mensajes más recientes (de una sala, si se indica), en orden.
+        
+        Con `hasta_offset` se ignoran los mensajes a partir de ese offset.
+        """
+        if n <= 0:
+            return []
+        segmentos, longitudes = self._instantanea(hasta_offset)
+
+        resultado: list[LogRecord] = []
+        for n_seg in range(len(segmentos) - 1, -1, -1):
+            segmento = segmentos[n_seg]
+            indices = segmento.indices(longitudes[n_seg], 0, sala)
+            # Solo los que faltan, del final hacia atrás
+            indices = indices[max(0, len(indices) - (n - len(resultado))):]
+            registros = list(self._leer_segmento(segmento, indices, n_seg == len(segmentos) - 1))
+            resultado[:0] = registros
+            if len(resultado) >= n:
+                break
+        return resultado[-n:]
+
+    def offset_desde_tiempo(self, timestamp: float) -> int:
+        """Primer offset cuyo mensaje es igual o posterior a `timestamp`."""
+        with self._lock:
+            for segmento in self._segmentos:
+                if segmento.tiempos and segmento.tiempos[-1] >= timestamp:
+                    return segmento.base + bisect.bisect_left(segmento.tiempos, timestamp)
+            return self.siguiente_offset
+
+    def cerrar(self) -> None:
+        """Cierra los archivos abiertos del log."""
+        with self._lock:
+            self._cerrar_activo()
+            for segmento in self._segmentos:
+                segmento.cerrar()
@@ -0,0 +1,189 @@
+"""
+Perfilador por muestreo para el servidor de chat y el puente WebSocket.
+
+Un hilo toma muestras periódicas de `sys._current_frames()` durante una
+ventana fija y agrupa las pilas; en el puente también se muestrean las
+tareas de asyncio desde el propio bucle de eventos. El resultado se escribe
+como pilas "collapsed" (flamegraph.pl, speedscope) o JSON de speedscope.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+FORMATOS_PERFIL = ('speedscope', 'collapsed')
+
+# (función, archivo, primera línea)
+Marco = tuple[str, str, int]
+Pila = tuple[Marco, ...]
+
+_SUFIJO_HILO = re.compile(r'[_-]\d+$')
+_perfil_activo = threading.Lock()
+
+
+def _pila_desde_marco(marco) -> list[Marco]:
+    funciones = []
+    while marco is not None:
+        codigo = marco.f_code
+        funciones.append((codigo.co_name, codigo.co_filename, codigo.co_firstlineno))
+        marco = marco.f_back
+    funciones.reverse()
+    return funciones
+
+
+def muestrear_hilos(duracion: float, intervalo: float = 0.01) -> Counter:
+    """Muestrea las pilas de todos los hilos (salvo el actual) durante `duracion` segundos.
+    
+    Cada pila empieza con un marco sintético con el nombre del hilo (sin el
+    sufijo numérico del pool) para separar clientes, lotes RSA, logging, etc.
+    """
+    propio = threading.get_ident()
+    muestras: Counter = Counter()
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        nombres = {hilo.ident: _SUFIJO_HILO.sub('', hilo.name) for hilo in threading.enumerate()}
+        for ident, marco in sys._current_frames().items():
+            if ident == propio:
+                continue
+            raiz = (f'[{nombres.get(ident, "hilo")}]', '', 0)
+            muestras[(raiz, *_pila_desde_marco(marco))] += 1
+        time.sleep(intervalo)
+    return muestras
+
+
+async def muestrear_tareas(duracion: float, intervalo: float = 0.01) -> Counter:
+    """Muestrea las pilas de las tareas de asyncio del bucle actual.
+    
+    Se ejecuta dentro del propio bucle, así que una tarea que bloquee el bucle
+    también retrasa las muestras: los huecos indican bloqueos.
+    """
+    propia = asyncio.current_task()
+    muestras: Counter = Counter()
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        for tarea in asyncio.all_tasks():
+            if tarea is propia or tarea.done():
+                continue
+            pila = [('[task] ' + tarea.get_name(), '', 0)]
+            for marco in tarea.get_stack():
+                codigo = marco.f_code
+                pila.append((codigo.co_name, codigo.co_filename, codigo.co_firstlineno))
+            muestras[tuple(pila)] += 1
+        await asyncio.sleep(intervalo)
+    return muestras
+
+
+def _nombre_marco(marco: Marco) -> str:
+    funcion, archivo, linea = marco
+    return f'{funcion} ({os.path.basename(archivo)}:{linea})' if archivo else funcion
+
+
+def a_collapsed(muestras: Counter) -> str:
+    """Formato "collapsed": una línea `marco;marco;... cuenta` por pila."""
+    return ''.join(
+        f"{';'.join(_nombre_marco(m) for m in pila)} {cuenta}\n"
+        for pila, cuenta in muestras.most_common()
+    )
+
+
+def a_speedscope(muestras: Counter, nombre: str, intervalo: float) -> dict:
+    """Perfil "sampled" de speedscope, con pesos en segundos."""
+    indices: dict[Marco, int] = {}
+    marcos = []
+    muestras_idx = []
+    pesos = []
+    for pila, cuenta in muestras.items():
+        fila = []
+        for marco in pila:
+            if marco not in indices:
+                indices[marco] = len(marcos)
+                funcion, archivo, linea = marco
+                marcos.append({'name': funcion, 'file': archivo, 'line': linea} if archivo else {'name': funcion})
+            fila.append(indices[marco])
+        muestras_idx.append(fila)
+        pesos.append(cuenta * intervalo)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': nombre,
+        'exporter': 'chat-profiler',
+        'shared': {'frames': marcos},
+        'profiles': [{
+            'type': 'sampled',
+            'name': nombre,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(pesos),
+            'samples': muestras_idx,
+            'weights': pesos,
+        }],
+    }
+
+
+def guardar_perfil(muestras: Counter, directorio: str | Path, nombre: str,
+                   formato: str = 'speedscope', intervalo: float = 0.01) -> Path:
+    """Escribe las muestras en `directorio` y devuelve la ruta del archivo."""
+    if formato not in FORMATOS_PERFIL:
+        raise ValueError(f"Formato de perfil desconocido: {formato}")
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    marca = time.strftime('%Y%m%d-%H%M%S')
+    if formato == 'collapsed':
+        ruta = directorio / f'{nombre}-{marca}.collapsed.txt'
+        ruta.write_text(a_collapsed(muestras), encoding='utf-8')
+    else:
+        ruta = directorio / f'{nombre}-{marca}.speedscope.json'
+        ruta.write_text(json.dumps(a_speedscope(muestras, nombre, intervalo)), encoding='utf-8')
+    return ruta
+
+
+def iniciar_perfil(
+    duracion: float,
+    directorio: str | Path,
+    nombre: str,
+    formato: str = 'speedscope',
+    intervalo: float = 0.01,
+    extra: Callable[[], Counter] | None = None
+) -> None:
+    """Lanza una ventana de muestreo de hilos en segundo plano.
+    
+    Args:
+        duracion: Segundos de muestreo
+        directorio: Carpeta de salida
+        nombre: Prefijo del archivo (p. ej. "server")
+        formato: 'speedscope' o 'collapsed'
+        intervalo: Segundos entre muestras
+        extra: Función opcional, llamada al terminar, cuyas muestras se suman
+            (p. ej. las tareas de asyncio del puente)
+        
+    Raises:
+        ValueError: Si el formato no existe
+        RuntimeError: Si ya hay un perfil en curso
+    """
+    if formato not in FORMATOS_PERFIL:
+        raise ValueError(f"Formato de perfil desconocido: {formato}")
+    if not _perfil_activo.acquire(blocking=False):
+        raise RuntimeError("Ya hay un perfil en curso")
+
+    def ejecutar() -> None:
+        try:
+            logger.info("📈 Perfil iniciado (%s s, cada %s ms)", duracion, intervalo * 1000)
+            muestras = muestrear_hilos(duracion, intervalo)
+            if extra is not None:
+                muestras.update(extra())
+            ruta = guardar_perfil(muestras, directorio, nombre, formato, intervalo)
+            logger.info("📈 Perfil guardado en %s (%d muestras)", ruta, sum(muestras.values()))
+        except Exception as e:
+            logger.error("❌ Error generando el perfil: %s", e)
+        finally:
+            _perfil_activo.release()
+
+    threading.Thread(target=ejecutar, name="SamplingProfiler", daemon=True).start()
@@ -0,0 +1,162 @@
+"""
+Negociación de protocolo y parseo rápido de mensajes del chat.
+
+Durante el handshake el cliente responde a CLIENT_PUBLIC_KEY con:
+
+    HELLO <versión> <formato> <clave_pública_b64> [clave=valor ...]
+
+y el servidor confirma con `PROTOCOL <versión> <formato> <modo_integridad>`.
+Un cliente que envía solo la clave en Base64 se trata como versión 1.
+
+Con el formato fijado, cada conexión usa un único parser precompilado que
+valida la estructura y la longitud del cifrado antes de tocar RSA, de modo
+que la entrada malformada se descarta sin operaciones de clave privada.
+"""
+import json
+import math
+import re
+from typing import NamedTuple
+
+from crypto.integrity import IntegrityVerifier
+
+PROTOCOLO_VERSION = 2
+
+# pipe: "cipher|etiqueta"     json: {"cipher": ..., "tag": ...}
+# auto: solo versión 1; se clasifica por estructura (pipe, JSON o cifrado sin
+#       etiqueta, esto último solo en los modos de integridad sin clave)
+FORMATOS = ('pipe', 'json')
+
+_HEX = '[0-9a-fA-F]'
+
+
+class ProtocolError(ValueError):
+    """Error de negociación de protocolo."""
+
+
+class Saludo(NamedTuple):
+    """Parámetros negociados en el handshake."""
+    version: int
+    formato: str
+    clave_publica_b64: str
+    opciones: dict[str, str]
+
+
+def parsear_saludo(linea: str) -> Saludo:
+    """Interpreta la respuesta del cliente a CLIENT_PUBLIC_KEY.
+    
+    Args:
+        linea: Línea recibida (HELLO ... o la clave en Base64 de la versión 1)
+        
+    Returns:
+        Saludo con la versión, el formato y la clave del cliente
+        
+    Raises:
+        ProtocolError: Si la versión o el formato no están soportados
+    """
+    partes = linea.split()
+    if not partes:
+        raise ProtocolError("Saludo vacío")
+
+    if partes[0] != 'HELLO':
+        return Saludo(1, 'auto', linea.strip(), {})
+
+    if len(partes) < 4:
+        raise ProtocolError("Saludo HELLO incompleto")
+
+    try:
+        version = int(partes[1])
+    except ValueError:
+        raise ProtocolError(f"Versión de protocolo inválida: {partes[1]}") from None
+
+    if not 2 <= version <= PROTOCOLO_VERSION:
+        raise ProtocolError(f"Versión de protocolo no soportada: {version}")
+
+    formato = partes[2]
+    if formato not in FORMATOS:
+        raise ProtocolError(f"Formato de mensaje no soportado: {formato}")
+
+    opciones = dict(p.split('=', 1) for p in partes[4:] if '=' in p)
+    return Saludo(version, formato, partes[3], opciones)
+
+
+def respuesta_protocolo(saludo: Saludo, integridad: IntegrityVerifier) -> bytes:
+    """Línea de confirmación que el servidor envía a clientes versión 2+."""
+    return f'PROTOCOL {saludo.version} {saludo.formato} {integridad.modo}\n'.encode('utf-8')
+
+
+class MessageParser:
+    """Parser de mensajes de una conexión, fijado en el handshake.
+
+    `parsear(linea)` devuelve (cifrado, etiqueta) o None si la línea no es
+    válida; se enlaza en el constructor a la variante del formato negociado.
+    """
+
+    def __init__(self, formato: str, tamano_clave_bits: int, integridad: IntegrityVerifier):
+        """Precompila las expresiones del formato negociado.
+        
+        Args:
+            formato: 'pipe', 'json' o 'auto' (versión 1)
+            tamano_clave_bits: Tamaño de la clave RSA del servidor
+            integridad: Verificador que fija la forma de la etiqueta
+        """
+        longitud = 4 * math.ceil(math.ceil(tamano_clave_bits / 8) / 3)
+        cifrado = f'[A-Za-z0-9+/]{{{longitud - 2}}}[A-Za-z0-9+/=]{{2}}'
+        etiqueta = (f'{_HEX}{{64}}\\|{_HEX}{{32}}' if integridad.modo == 'legacy'
+                    else f'{_HEX}{{{integridad.longitud_etiqueta}}}')
+
+        self.formato = formato
+        # En los modos con clave ningún mensaje puede omitir la etiqueta (tampoco en v1)
+        self._etiqueta_obligatoria = integridad.requiere_etiqueta
+        self._cifrado = re.compile(cifrado)
+        self._etiqueta = re.compile(etiqueta)
+        self._pipe = re.compile(f'({cifrado})\\|({etiqueta})')
+
+        if formato == 'pipe':
+            self.parsear = self._parsear_pipe
+        elif formato == 'json':
+            self.parsear = self._parsear_json
+        elif formato == 'auto':
+            self.parsear = self._parsear_auto
+        else:
+            raise ProtocolError(f"Formato de mensaje no soportado: {formato}")
+
+    def es_cifrado_valido(self, texto: str) -> bool:
+        """Comprueba que el texto tiene la forma de un bloque RSA en Base64."""
+        return self._cifrado.fullmatch(texto) is not None
+
+    def _parsear_pipe(self, linea: str) -> tuple[str, str | None] | None:
+        coincidencia = self._pipe.fullmatch(linea)
+        if coincidencia is None:
+            return None
+        return coincidencia.group(1), coincidencia.group(2)
+
+    def _parsear_json(self, linea: str, etiqueta_obligatoria: bool = True) -> tuple[str, str | None] | None:
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            return None
+        if not isinstance(datos, dict):
+            return None
+
+        cifrado = datos.get('cipher')
+        etiqueta = datos.get('tag')
+        if etiqueta is None and 'hash' in datos and 'md5' in datos:
+            etiqueta = f"{datos['hash']}|{datos['md5']}"
+
+        if not isinstance(cifrado, str) or self._cifrado.fullmatch(cifrado) is None:
+            return None
+        if etiqueta is None:
+            return None if etiqueta_obligatoria else (cifrado, None)
+        if not isinstance(etiqueta, str) or self._etiqueta.fullmatch(etiqueta) is None:
+            return None
+        return cifrado, etiqueta
+
+    def _parsear_auto(self, linea: str) -> tuple[str, str | None] | None:
+        # Clientes versión 1: se decide el formato por estructura, sin reintentos
+        if linea.startswith('{'):
+            return self._parsear_json(linea, etiqueta_obligatoria=self._etiqueta_obligatoria)
+        if '|' in linea:
+            return self._parsear_pipe(linea)
+        if self._etiqueta_obligatoria or self._cifrado.fullmatch(linea) is None:
+            return None
+        return linea, None
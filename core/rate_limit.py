@@ -0,0 +1,73 @@
+"""
+Limitación de tasa con token bucket para el servidor de chat.
+Protege las operaciones caras (descifrado RSA, handshakes) frente a ráfagas
+de una misma IP o conexión.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Token bucket de una sola clave, seguro entre hilos."""
+
+    __slots__ = ('tasa', 'capacidad', '_tokens', '_ultimo', '_lock')
+
+    def __init__(self, tasa: float, capacidad: float):
+        """Inicializa el bucket lleno.
+        
+        Args:
+            tasa: Tokens que se reponen por segundo
+            capacidad: Máximo de tokens acumulables (tamaño de ráfaga)
+        """
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, n: float = 1) -> bool:
+        """Intenta consumir `n` tokens; devuelve False si no hay suficientes."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            if self._tokens < n:
+                return False
+            self._tokens -= n
+            return True
+
+
+class RateLimiter:
+    """Conjunto de token buckets indexados por clave (p. ej. la IP del cliente).
+
+    Mantiene como máximo `max_claves` buckets; al superarlo descarta los usados
+    hace más tiempo, así que una inundación de IPs distintas no agota la memoria.
+    """
+
+    def __init__(self, tasa: float, capacidad: float, max_claves: int = 10000):
+        """Inicializa el limitador.
+        
+        Args:
+            tasa: Tokens por segundo de cada clave
+            capacidad: Ráfaga máxima por clave
+            max_claves: Número máximo de claves recordadas
+        """
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.max_claves = max_claves
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def permitir(self, clave: str, n: float = 1) -> bool:
+        """Consume `n` tokens del bucket de `clave`; False si excede la tasa."""
+        with self._lock:
+            bucket = self._buckets.get(clave)
+            if bucket is None:
+                bucket = TokenBucket(self.tasa, self.capacidad)
+                self._buckets[clave] = bucket
+                if len(self._buckets) > self.max_claves:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(clave)
+        return bucket.consumir(n)
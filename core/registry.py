@@ -0,0 +1,61 @@
+"""
+Registro de clientes conectados con publicación copy-on-write.
+Las altas y bajas (poco frecuentes) toman un lock y publican una tupla
+inmutable nueva; el broadcast (muy frecuente) recorre la última tupla
+publicada sin lock ni copias.
+"""
+import socket
+import threading
+
+from core.session import ClientSession
+
+
+class ClientRegistry:
+    """Conjunto de sesiones autenticadas indexado por socket."""
+
+    def __init__(self, capacidad: int):
+        """Inicializa el registro vacío.
+        
+        Args:
+            capacidad: Máximo de clientes registrados a la vez
+        """
+        self.capacidad = capacidad
+        self._por_socket: dict[socket.socket, ClientSession] = {}
+        # Índice por nickname para mensajes directos en O(1). Guarda todas las
+        # sesiones con ese nick (tupla inmutable, de la más antigua a la más
+        # reciente) para que al irse la más reciente se siga encontrando otra
+        self._por_nickname: dict[str, tuple[ClientSession, ...]] = {}
+        self._lock = threading.Lock()
+        # Instantánea inmutable; se reemplaza entera en cada alta/baja
+        self.snapshot: tuple[ClientSession, ...] = ()
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def buscar(self, nickname: str) -> ClientSession | None:
+        """Sesión más reciente conectada con ese nickname, o None (sin lock)."""
+        sesiones = self._por_nickname.get(nickname)
+        return sesiones[-1] if sesiones else None
+
+    def registrar(self, sesion: ClientSession) -> bool:
+        """Añade un cliente; devuelve False si el servidor está lleno."""
+        with self._lock:
+            if len(self._por_socket) >= self.capacidad:
+                return False
+            self._por_socket[sesion.socket] = sesion
+            self._por_nickname[sesion.nickname] = self._por_nickname.get(sesion.nickname, ()) + (sesion,)
+            self.snapshot = tuple(self._por_socket.values())
+            return True
+
+    def eliminar(self, sock: socket.socket) -> ClientSession | None:
+        """Quita un cliente y lo devuelve (None si no estaba registrado)."""
+        with self._lock:
+            sesion = self._por_socket.pop(sock, None)
+            if sesion is not None:
+                restantes = tuple(s for s in self._por_nickname.get(sesion.nickname, ()) if s is not sesion)
+                if restantes:
+                    self._por_nickname[sesion.nickname] = restantes
+                else:
+                    self._por_nickname.pop(sesion.nickname, None)
+                self.snapshot = tuple(self._por_socket.values())
+            return sesion
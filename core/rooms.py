@@ -0,0 +1,90 @@
+"""
+Salas (canales) del chat.
+Cada sala mantiene su conjunto de miembros y publica una tupla inmutable
+que el broadcast recorre sin lock, de modo que un mensaje solo toca a los
+miembros de su sala.
+"""
+import re
+import threading
+
+from core.session import ClientSession
+
+# Nombres de sala válidos: alfanuméricos, guion y guion bajo
+PATRON_SALA = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+
+def es_nombre_sala_valido(nombre: str) -> bool:
+    """Indica si `nombre` es un identificador de sala aceptable."""
+    return PATRON_SALA.fullmatch(nombre) is not None
+
+
+class RoomManager:
+    """Pertenencia de sesiones a salas, con una sala por sesión."""
+
+    def __init__(self, sala_por_defecto: str = 'general', max_salas: int = 1000):
+        """Inicializa el gestor.
+        
+        Args:
+            sala_por_defecto: Sala a la que vuelve un cliente al salir de otra
+            max_salas: Número máximo de salas con miembros a la vez
+        """
+        self.sala_por_defecto = sala_por_defecto
+        self.max_salas = max_salas
+        self._miembros: dict[str, set[ClientSession]] = {}
+        self._snapshots: dict[str, tuple[ClientSession, ...]] = {}
+        self._lock = threading.Lock()
+
+    def miembros(self, sala: str) -> tuple[ClientSession, ...]:
+        """Instantánea inmutable de los miembros de una sala (sin lock)."""
+        return self._snapshots.get(sala, ())
+
+    def listar(self) -> list[tuple[str, int]]:
+        """Salas existentes con su número de miembros, ordenadas por nombre."""
+        return sorted((sala, len(miembros)) for sala, miembros in self._snapshots.items())
+
+    def unir(self, sesion: ClientSession, sala: str) -> str | None:
+        """Mueve la sesión a `sala` y devuelve la sala anterior.
+        
+        Raises:
+            ValueError: Si el nombre no es válido o se alcanzó el máximo de salas
+        """
+        if not es_nombre_sala_valido(sala):
+            raise ValueError(f"Nombre de sala inválido: {sala}")
+
+        with self._lock:
+            anterior = sesion.sala
+            if anterior == sala:
+                return anterior
+            # La sala por defecto siempre está disponible: es el destino de respaldo
+            if (sala not in self._miembros and sala != self.sala_por_defecto
+                    and len(self._miembros) >= self.max_salas):
+                raise ValueError("Se alcanzó el máximo de salas")
+
+            if anterior is not None:
+                self._quitar(sesion, anterior)
+            miembros = self._miembros.setdefault(sala, set())
+            miembros.add(sesion)
+            self._snapshots[sala] = tuple(miembros)
+            sesion.sala = sala
+            return anterior
+
+    def salir(self, sesion: ClientSession) -> str | None:
+        """Saca la sesión de su sala y devuelve el nombre de esa sala."""
+        with self._lock:
+            sala = sesion.sala
+            if sala is not None:
+                self._quitar(sesion, sala)
+                sesion.sala = None
+            return sala
+
+    def _quitar(self, sesion: ClientSession, sala: str) -> None:
+        # Requiere tener self._lock
+        miembros = self._miembros.get(sala)
+        if miembros is None:
+            return
+        miembros.discard(sesion)
+        if miembros:
+            self._snapshots[sala] = tuple(miembros)
+        else:
+            del self._miembros[sala]
+            self._snapshots.pop(sala, None)
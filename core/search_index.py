@@ -0,0 +1,184 @@
+"""
+Índice de búsqueda de texto completo sobre el historial (SQLite FTS5).
+
+El servidor de chat añade los mensajes a una cola y un hilo escritor los
+inserta por lotes en una transacción; el `rowid` de cada fila es el offset del
+mensaje en el MessageLog, así que el índice puede reconstruirse desde el log.
+Las consultas abren su propia conexión por hilo y también pueden hacerse desde
+otro proceso en modo solo lectura.
+
+La sala es una columna indexada: el filtro por sala forma parte del MATCH, así
+que no se recorren los resultados de las demás salas. Un índice con el esquema
+anterior (sala sin indexar) se recrea vacío y se vuelve a llenar desde el log.
+"""
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_ESQUEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS mensajes USING fts5(
+    texto,
+    nick UNINDEXED,
+    sala,
+    ts UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+_TERMINO = re.compile(r'\w+\*?', re.UNICODE)
+
+
+class SearchResult(NamedTuple):
+    """Mensaje encontrado en el índice."""
+    offset: int
+    timestamp: float
+    sala: str
+    nickname: str
+    texto: str
+
+
+def construir_consulta(texto: str) -> str | None:
+    """Convierte texto libre en una consulta FTS5 segura.
+    
+    Cada palabra se busca literalmente (todas deben aparecer); una palabra
+    terminada en `*` se busca como prefijo si tiene al menos 2 caracteres
+    (los prefijos cortos recorrerían casi todo el índice). Devuelve None si no
+    hay términos.
+    """
+    terminos = []
+    for termino in _TERMINO.findall(texto):
+        palabra = termino.rstrip('*')
+        prefijo = termino.endswith('*') and len(palabra) >= 2
+        if palabra:
+            terminos.append(f'"{palabra}"' + ('*' if prefijo else ''))
+    return ' '.join(terminos) or None
+
+
+class SearchIndex:
+    """Índice FTS5 con inserciones incrementales en segundo plano."""
+
+    def __init__(
+        self,
+        ruta: str | Path,
+        solo_lectura: bool = False,
+        tamano_lote: int = 256,
+        intervalo_escritura: float = 0.5
+    ):
+        """Abre (o crea) el índice.
+        
+        Args:
+            ruta: Archivo SQLite del índice
+            solo_lectura: No crear el hilo escritor (p. ej. desde el servidor web)
+            tamano_lote: Mensajes máximos por transacción
+            intervalo_escritura: Segundos máximos que un mensaje espera en cola
+            
+        Raises:
+            FileNotFoundError: Si `solo_lectura` y el índice no existe
+        """
+        self.ruta = Path(ruta)
+        self.solo_lectura = solo_lectura
+        self.tamano_lote = tamano_lote
+        self.intervalo_escritura = intervalo_escritura
+        self._local = threading.local()
+        self._cola: queue.SimpleQueue = queue.SimpleQueue()
+        self._hilo: threading.Thread | None = None
+
+        if solo_lectura:
+            if not self.ruta.exists():
+                raise FileNotFoundError(f"Índice de búsqueda no encontrado: {self.ruta}")
+            return
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._escritor = sqlite3.connect(self.ruta, check_same_thread=False)
+        self._escritor.execute('PRAGMA journal_mode=WAL')
+        self._escritor.execute('PRAGMA synchronous=NORMAL')
+        fila = self._escritor.execute("SELECT sql FROM sqlite_master WHERE name = 'mensajes'").fetchone()
+        if fila is not None and 'sala UNINDEXED' in fila[0]:
+            logger.warning("⚠️  Índice de búsqueda con esquema antiguo: se reconstruye desde el historial")
+            with self._escritor:
+                self._escritor.execute('DROP TABLE mensajes')
+        self._escritor.executescript(_ESQUEMA)
+        self._hilo = threading.Thread(target=self._bucle_escritura, name="SearchIndexWriter", daemon=True)
+        self._hilo.start()
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Conexión de lectura propia del hilo actual."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(f'file:{self.ruta}?mode=ro', uri=True)
+            self._local.conexion = conexion
+        return conexion
+
+    @property
+    def ultimo_offset(self) -> int:
+        """Mayor offset indexado (-1 si el índice está vacío)."""
+        fila = self._conexion().execute('SELECT max(rowid) FROM mensajes').fetchone()
+        return -1 if fila[0] is None else fila[0]
+
+    def agregar(self, offset: int, timestamp: float, sala: str, nickname: str, texto: str) -> None:
+        """Encola un mensaje para indexarlo (no bloquea)."""
+        self._cola.put((offset, texto, nickname, sala, timestamp))
+
+    def _bucle_escritura(self) -> None:
+        while True:
+            lote = [self._cola.get()]
+            try:
+                while len(lote) < self.tamano_lote:
+                    lote.append(self._cola.get(timeout=self.intervalo_escritura))
+            except queue.Empty:
+                pass
+
+            detener = None in lote
+            filas = [fila for fila in lote if fila is not None]
+            if filas:
+                try:
+                    with self._escritor:
+                        self._escritor.executemany(
+                            'INSERT OR IGNORE INTO mensajes(rowid, texto, nick, sala, ts) VALUES (?, ?, ?, ?, ?)',
+                            filas
+                        )
+                except sqlite3.Error as e:
+                    logger.error("❌ Error indexando %d mensajes: %s", len(filas), e)
+            if detener:
+                return
+
+    def buscar(self, texto: str, sala: str | None = None, limite: int = 20) -> list[SearchResult]:
+        """Busca mensajes que contengan todas las palabras de `texto`.
+        
+        Args:
+            texto: Palabras a buscar (`palabra*` para prefijos)
+            sala: Si se indica, solo mensajes de esa sala
+            limite: Máximo de resultados, del más reciente al más antiguo
+        """
+        consulta = construir_consulta(texto)
+        if consulta is None:
+            return []
+        # Las palabras solo se buscan en el texto (la columna sala también está indexada)
+        consulta = f'texto : ({consulta})'
+        sql = 'SELECT rowid, ts, sala, nick, texto FROM mensajes WHERE mensajes MATCH ?'
+        parametros: list = [consulta]
+        if sala is not None:
+            # El MATCH descarta las demás salas usando el índice; la comparación
+            # exacta separa nombres que se tokenizan igual (mi-sala / mi_sala)
+            frase_sala = sala.replace('"', '""')
+            parametros[0] = f'sala : "{frase_sala}" AND {consulta}'
+            sql += ' AND sala = ?'
+            parametros.append(sala)
+        sql += ' ORDER BY rowid DESC LIMIT ?'
+        parametros.append(limite)
+        return [SearchResult(*fila) for fila in self._conexion().execute(sql, parametros)]
+
+    def cerrar(self) -> None:
+        """Vacía la cola pendiente y cierra el índice."""
+        if self._hilo is not None:
+            self._cola.put(None)
+            self._hilo.join()
+            self._hilo = None
+            self._escritor.close()
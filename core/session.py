@@ -0,0 +1,167 @@
+"""
+Estado compacto de una conexión de chat.
+Cada conexión tiene un único objeto ClientSession con __slots__, que reúne el
+socket, la identidad, la clave pública ya cargada, el buffer de salida, los
+contadores y las marcas de tiempo. Es lo que leen las métricas y las
+herramientas de administración.
+"""
+import socket
+import threading
+import time
+
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+
+
+class ClientSession:
+    """Estado de una conexión de cliente."""
+
+    __slots__ = (
+        'socket', 'address', 'nickname', 'buzon', 'clave_publica', 'version_protocolo',
+        'sala', 'buffer_salida', 'lock_envio', 'retenciones', 'retenidos', 'insercion',
+        'mensajes_recibidos', 'mensajes_enviados', 'bytes_recibidos', 'bytes_enviados',
+        'conectado_en', 'autenticado_en', 'ultima_actividad',
+    )
+
+    def __init__(self, sock: socket.socket, address: tuple[str, int]):
+        self.socket = sock
+        self.address = address
+        self.nickname: str | None = None
+        # Buzón de correo offline (ver core/spool.py); None si no tiene
+        self.buzon: str | None = None
+        self.clave_publica: RSAPublicKey | None = None
+        self.version_protocolo = 1
+        self.sala: str | None = None
+        self.buffer_salida = bytearray()
+        self.lock_envio = threading.Lock()
+        # Envíos retenidos mientras se prepara la puesta al día (ver retener())
+        self.retenciones = 0
+        self.retenidos: list[tuple[bytes, int]] = []
+        self.insercion = 0
+        self.mensajes_recibidos = 0
+        self.mensajes_enviados = 0
+        self.bytes_recibidos = 0
+        self.bytes_enviados = 0
+        self.conectado_en = time.time()
+        self.autenticado_en: float | None = None
+        self.ultima_actividad = self.conectado_en
+
+    def registrar_recepcion(self, num_bytes: int, num_mensajes: int = 0) -> None:
+        """Actualiza los contadores de entrada."""
+        self.bytes_recibidos += num_bytes
+        self.mensajes_recibidos += num_mensajes
+        self.ultima_actividad = time.time()
+
+    def encolar(self, datos: bytes, num_mensajes: int = 1) -> None:
+        """Añade datos al buffer de salida sin enviarlos todavía."""
+        with self.lock_envio:
+            self.buffer_salida += datos
+            self.mensajes_enviados += num_mensajes
+
+    def vaciar(self) -> None:
+        """Envía todo el buffer de salida en una sola escritura."""
+        with self.lock_envio:
+            if not self.buffer_salida:
+                return
+            datos = bytes(self.buffer_salida)
+            self.buffer_salida.clear()
+            self.socket.sendall(datos)
+            self.bytes_enviados += len(datos)
+
+    def enviar(self, datos: bytes, num_mensajes: int = 1, retenible: bool = True) -> None:
+        """Encola y envía inmediatamente (o lo retiene si hay una puesta al día en curso).
+        
+        Args:
+            retenible: False para mensajes de control que no esperan a la puesta al día
+        """
+        if retenible:
+            with self.lock_envio:
+                if self.retenciones:
+                    self.retenidos.append((datos, num_mensajes))
+                    return
+        self.encolar(datos, num_mensajes)
+        self.vaciar()
+
+    def retener(self) -> None:
+        """Retiene los envíos hasta el liberar() correspondiente.
+        
+        Así la difusión en vivo no adelanta al historial que se está preparando
+        para esta sesión. Las retenciones se pueden anidar.
+        """
+        with self.lock_envio:
+            self.retenciones += 1
+
+    def liberar(self, previos: list[bytes]) -> None:
+        """Coloca `previos` por delante de lo retenido y, al terminar la última
+        retención, lo envía todo en orden.
+        
+        Los clientes de protocolo 1 no delimitan mensajes, así que reciben un
+        envío por mensaje; los demás, una sola escritura.
+        """
+        with self.lock_envio:
+            bloques = [(linea, 1) for linea in previos]
+            self.retenidos[self.insercion:self.insercion] = bloques
+            self.insercion += len(bloques)
+            self.retenciones = max(0, self.retenciones - 1)
+            if self.retenciones:
+                return
+            pendientes, self.retenidos, self.insercion = self.retenidos, [], 0
+            if not pendientes:
+                return
+            self.mensajes_enviados += sum(n for _, n in pendientes)
+            if self.version_protocolo >= 2:
+                self.buffer_salida += b''.join(datos for datos, _ in pendientes)
+            else:
+                for datos, _ in pendientes:
+                    self.socket.sendall(datos)
+                    self.bytes_enviados += len(datos)
+                return
+            datos = bytes(self.buffer_salida)
+            self.buffer_salida.clear()
+            self.socket.sendall(datos)
+            self.bytes_enviados += len(datos)
+
+    def enviar_sin_bloquear(self, datos: bytes) -> bool:
+        """Intenta enviar `datos` sin esperar al lock de envío ni al socket.
+        
+        Para avisos de última hora (p. ej. una expulsión): si hay otro envío en
+        curso o el cliente no está leyendo, el aviso se descarta.
+        
+        Returns:
+            True si se escribió completo
+        """
+        if not hasattr(socket, 'MSG_DONTWAIT') or not self.lock_envio.acquire(blocking=False):
+            return False
+        try:
+            enviados = self.socket.send(datos, socket.MSG_DONTWAIT)
+        except (OSError, ValueError):
+            # ValueError: los sockets TLS no admiten flags en send()
+            return False
+        finally:
+            self.lock_envio.release()
+        self.bytes_enviados += enviados
+        return enviados == len(datos)
+
+    def retenido(self) -> tuple[int, int]:
+        """Mensajes y bytes retenidos a la espera de la puesta al día."""
+        retenidos = list(self.retenidos)
+        return len(retenidos), sum(len(datos) for datos, _ in retenidos)
+
+    def como_dict(self) -> dict:
+        """Resumen serializable para métricas y administración."""
+        mensajes_retenidos, bytes_retenidos = self.retenido()
+        return {
+            'nickname': self.nickname,
+            'address': f'{self.address[0]}:{self.address[1]}',
+            'protocolo': self.version_protocolo,
+            'sala': self.sala,
+            'mensajes_recibidos': self.mensajes_recibidos,
+            'mensajes_enviados': self.mensajes_enviados,
+            'bytes_recibidos': self.bytes_recibidos,
+            'bytes_enviados': self.bytes_enviados,
+            'puesta_al_dia': self.retenciones > 0,
+            'retenidos_mensajes': mensajes_retenidos,
+            'retenidos_bytes': bytes_retenidos,
+            'conectado_en': self.conectado_en,
+            'autenticado_en': self.autenticado_en,
+            'ultima_actividad': self.ultima_actividad,
+        }
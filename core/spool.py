@@ -0,0 +1,316 @@
+"""
+Correo pendiente para usuarios desconectados, ligado a un buzón.
+
+El nickname es texto libre y cualquiera con la contraseña del servidor puede
+usarlo, así que el correo no se guarda por nickname sino por buzón: un token
+secreto que el servidor entrega al cliente (línea `INBOX`) y que este presenta
+cifrado en el saludo al volver. En disco solo se guarda el hash del token. Un
+nickname queda ligado al buzón que lo reclamó, hasta que pasa `ttl` sin usarse.
+
+Por buzón hay dos archivos:
+- `<buzón>.spool`: los /msg recibidos estando desconectado, registros binarios
+  <timestamp:f64><longitud:u32><texto utf-8> a los que solo se anexa. Los
+  límites de tamaño se aplican compactando (se descartan los más antiguos).
+- `<buzón>.estado`: JSON con el nickname, la última sala y el offset del
+  historial al desconectarse. Lo que se perdió en la sala se lee del historial
+  (índice por sala) al volver, sin copiar cada mensaje a cada ausente.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_CABECERA = struct.Struct('<dI')
+_TOKEN_VALIDO = re.compile(r'[A-Za-z0-9_-]{43}')
+
+
+class Ausencia(NamedTuple):
+    """Lo que un buzón dejó pendiente al desconectarse."""
+    privados: list[tuple[float, str]]
+    sala: str | None
+    offset: int | None
+    desde: float
+
+
+class _EstadoCola:
+    """Contadores en memoria de una cola, para no releer el archivo al anexar."""
+
+    __slots__ = ('mensajes', 'bytes', 'mas_antiguo')
+
+    def __init__(self, mensajes: int = 0, num_bytes: int = 0, mas_antiguo: float = 0.0):
+        self.mensajes = mensajes
+        self.bytes = num_bytes
+        self.mas_antiguo = mas_antiguo
+
+
+class _EstadoBuzon:
+    """Dueño y última posición conocida de un buzón."""
+
+    __slots__ = ('nickname', 'sala', 'offset', 'visto', 'sesiones')
+
+    def __init__(self, nickname: str, sala: str | None = None, offset: int | None = None,
+                 visto: float = 0.0):
+        self.nickname = nickname
+        self.sala = sala
+        self.offset = offset
+        self.visto = visto
+        # Conexiones abiertas con este buzón (solo en memoria)
+        self.sesiones = 0
+
+
+class OfflineSpool:
+    """Buzones de correo pendiente con límite de tamaño y TTL."""
+
+    def __init__(
+        self,
+        directorio: str | Path,
+        max_mensajes: int = 200,
+        max_bytes: int = 256 * 1024,
+        ttl: float = 24 * 3600,
+        max_buzones: int = 10000
+    ):
+        """Abre (o crea) el directorio de buzones.
+
+        Args:
+            directorio: Carpeta de los archivos .spool y .estado
+            max_mensajes: Mensajes privados máximos por buzón
+            max_bytes: Tamaño máximo del archivo de cada buzón
+            ttl: Segundos que se conserva un mensaje y un buzón sin usar
+            max_buzones: Buzones conservados a la vez
+        """
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_mensajes = max_mensajes
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_buzones = max_buzones
+        self._lock = threading.Lock()
+        self._colas: dict[str, _EstadoCola] = {}
+        self._buzones: dict[str, _EstadoBuzon] = {}
+        self._dueno: dict[str, str] = {}
+
+        for ruta in self.directorio.glob('*.estado'):
+            try:
+                datos = json.loads(ruta.read_text(encoding='utf-8'))
+                estado = _EstadoBuzon(datos['nickname'], datos.get('sala'),
+                                      datos.get('offset'), float(datos['visto']))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("⚠️  Estado de buzón ilegible %s: %s", ruta.name, e)
+                continue
+            self._buzones[ruta.stem] = estado
+            self._dueno[estado.nickname] = ruta.stem
+
+        for ruta in self.directorio.glob('*.spool'):
+            registros = self._leer_archivo(ruta)
+            if registros and ruta.stem in self._buzones:
+                self._colas[ruta.stem] = _EstadoCola(
+                    len(registros), ruta.stat().st_size, registros[0][0]
+                )
+            else:
+                ruta.unlink(missing_ok=True)
+        with self._lock:
+            self._purgar(time.time())
+
+    @staticmethod
+    def nuevo_token() -> str:
+        """Genera el secreto de un buzón nuevo (43 caracteres URL-safe)."""
+        return secrets.token_urlsafe(32)
+
+    @staticmethod
+    def es_token_valido(token: str) -> bool:
+        """Indica si `token` tiene el formato de los generados por nuevo_token()."""
+        return _TOKEN_VALIDO.fullmatch(token) is not None
+
+    @staticmethod
+    def buzon(token: str) -> str:
+        """Identificador del buzón de `token` (su hash: el token no se guarda)."""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+
+    def _ruta(self, buzon: str) -> Path:
+        return self.directorio / f'{buzon}.spool'
+
+    def _ruta_estado(self, buzon: str) -> Path:
+        return self.directorio / f'{buzon}.estado'
+
+    @staticmethod
+    def _leer_archivo(ruta: Path) -> list[tuple[float, str]]:
+        try:
+            datos = ruta.read_bytes()
+        except FileNotFoundError:
+            return []
+        registros = []
+        posicion = 0
+        while posicion + _CABECERA.size <= len(datos):
+            ts, longitud = _CABECERA.unpack_from(datos, posicion)
+            inicio = posicion + _CABECERA.size
+            if inicio + longitud > len(datos):
+                break
+            registros.append((ts, datos[inicio:inicio + longitud].decode('utf-8', 'replace')))
+            posicion = inicio + longitud
+        return registros
+
+    def _guardar_estado(self, buzon: str, estado: _EstadoBuzon) -> None:
+        # Requiere tener self._lock; escritura atómica (temporal + rename)
+        ruta = self._ruta_estado(buzon)
+        temporal = ruta.with_suffix('.tmp')
+        try:
+            temporal.write_text(json.dumps({
+                'nickname': estado.nickname, 'sala': estado.sala,
+                'offset': estado.offset, 'visto': estado.visto,
+            }), encoding='utf-8')
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.error("❌ No se pudo guardar el estado del buzón de %s: %s", estado.nickname, e)
+
+    def _borrar_buzon(self, buzon: str) -> None:
+        # Requiere tener self._lock
+        estado = self._buzones.pop(buzon, None)
+        if estado is not None and self._dueno.get(estado.nickname) == buzon:
+            del self._dueno[estado.nickname]
+        self._colas.pop(buzon, None)
+        self._ruta(buzon).unlink(missing_ok=True)
+        self._ruta_estado(buzon).unlink(missing_ok=True)
+
+    def _caducado(self, estado: _EstadoBuzon, ahora: float) -> bool:
+        return estado.sesiones == 0 and ahora - estado.visto >= self.ttl
+
+    def _purgar(self, ahora: float) -> None:
+        # Requiere tener self._lock
+        for buzon in [b for b, e in self._buzones.items() if self._caducado(e, ahora)]:
+            self._borrar_buzon(buzon)
+
+    def _compactar(self, buzon: str, ahora: float) -> None:
+        """Reescribe la cola sin mensajes caducados y dentro de los límites."""
+        ruta = self._ruta(buzon)
+        registros = [r for r in self._leer_archivo(ruta) if ahora - r[0] < self.ttl]
+        # Dejar margen para que los siguientes anexados no compacten cada vez
+        objetivo_mensajes = max(1, self.max_mensajes * 3 // 4)
+        objetivo_bytes = self.max_bytes * 3 // 4
+        registros = registros[-objetivo_mensajes:]
+        codificados = [_CABECERA.pack(ts, len(b)) + b for ts, b in
+                       ((ts, texto.encode('utf-8')) for ts, texto in registros)]
+        total = sum(map(len, codificados))
+        while codificados and total > objetivo_bytes:
+            total -= len(codificados.pop(0))
+            registros.pop(0)
+
+        if not codificados:
+            ruta.unlink(missing_ok=True)
+            self._colas.pop(buzon, None)
+            return
+        temporal = ruta.with_suffix('.tmp')
+        temporal.write_bytes(b''.join(codificados))
+        os.replace(temporal, ruta)
+        self._colas[buzon] = _EstadoCola(len(codificados), total, registros[0][0])
+
+    def reclamar(self, nickname: str, buzon: str) -> Ausencia | None:
+        """Conecta `buzon` con `nickname` y devuelve lo que tenía pendiente.
+
+        Returns:
+            La ausencia (mensajes privados y posición en la sala al irse), o
+            None si el nickname pertenece a otro buzón o no caben más buzones:
+            esa conexión no tendrá correo offline.
+        """
+        ahora = time.time()
+        with self._lock:
+            dueno = self._dueno.get(nickname)
+            if dueno is not None and dueno != buzon:
+                if not self._caducado(self._buzones[dueno], ahora):
+                    return None
+                self._borrar_buzon(dueno)
+
+            estado = self._buzones.get(buzon)
+            if estado is None:
+                if len(self._buzones) >= self.max_buzones:
+                    self._purgar(ahora)
+                    if len(self._buzones) >= self.max_buzones:
+                        return None
+                estado = self._buzones[buzon] = _EstadoBuzon(nickname, visto=ahora)
+            elif estado.nickname != nickname:
+                # El buzón cambia de nickname: el anterior queda libre
+                if self._dueno.get(estado.nickname) == buzon:
+                    del self._dueno[estado.nickname]
+                estado.nickname = nickname
+            self._dueno[nickname] = buzon
+
+            if estado.sesiones == 0:
+                # Otro proceso (relevo) pudo anexar sin que conste en _colas:
+                # se lee el archivo siempre
+                ruta = self._ruta(buzon)
+                privados = [r for r in self._leer_archivo(ruta) if ahora - r[0] < self.ttl]
+                ruta.unlink(missing_ok=True)
+                self._colas.pop(buzon, None)
+                ausencia = Ausencia(privados, estado.sala, estado.offset, estado.visto)
+            else:
+                # Ya conectado desde otra sesión: lo pendiente ya se entregó
+                ausencia = Ausencia([], None, None, ahora)
+            estado.sesiones += 1
+            estado.sala = estado.offset = None
+            estado.visto = ahora
+            self._guardar_estado(buzon, estado)
+        return ausencia
+
+    def marcar_desconectado(self, buzon: str, sala: str | None, offset: int | None) -> None:
+        """Registra que una conexión de `buzon` se fue estando en `sala`.
+
+        Args:
+            buzon: Buzón de la conexión
+            sala: Última sala (None si ya no estaba en ninguna)
+            offset: Siguiente offset del historial en ese momento (None sin historial)
+        """
+        with self._lock:
+            estado = self._buzones.get(buzon)
+            if estado is None:
+                return
+            estado.sesiones = max(0, estado.sesiones - 1)
+            if estado.sesiones:
+                return
+            estado.sala, estado.offset, estado.visto = sala, offset, time.time()
+            self._guardar_estado(buzon, estado)
+
+    def buzon_de(self, nickname: str) -> str | None:
+        """Buzón ligado a `nickname` (None si no tiene o ya caducó)."""
+        buzon = self._dueno.get(nickname)
+        estado = self._buzones.get(buzon) if buzon is not None else None
+        if estado is None or self._caducado(estado, time.time()):
+            return None
+        return buzon
+
+    def encolar(self, buzon: str, texto: str, timestamp: float | None = None) -> None:
+        """Añade un mensaje privado a la cola de `buzon`."""
+        ahora = time.time() if timestamp is None else timestamp
+        cuerpo = texto.encode('utf-8')
+        registro = _CABECERA.pack(ahora, len(cuerpo)) + cuerpo
+        with self._lock:
+            estado = self._colas.get(buzon)
+            if estado is not None and (
+                estado.mensajes >= self.max_mensajes
+                or estado.bytes + len(registro) > self.max_bytes
+                or ahora - estado.mas_antiguo >= self.ttl
+            ):
+                self._compactar(buzon, ahora)
+                estado = self._colas.get(buzon)
+            try:
+                with open(self._ruta(buzon), 'ab') as f:
+                    f.write(registro)
+            except OSError as e:
+                logger.error("❌ No se pudo guardar el mensaje pendiente: %s", e)
+                return
+            if estado is None:
+                self._colas[buzon] = _EstadoCola(1, len(registro), ahora)
+            else:
+                estado.mensajes += 1
+                estado.bytes += len(registro)
+
+    def tiene_pendientes(self, buzon: str) -> bool:
+        """Indica si `buzon` tiene mensajes privados en cola."""
+        return buzon in self._colas
@@ -0,0 +1,79 @@
+"""
+Resúmenes (hashes) de archivos en streaming.
+
+Los archivos se leen por bloques de tamaño fijo en un buffer reutilizado, así
+que la memoria usada no depende del tamaño del archivo, y todos los algoritmos
+pedidos se calculan en una sola pasada.
+"""
+
+import hashlib
+
+# 1 MiB: suficiente para amortizar las llamadas al sistema sin ocupar memoria
+TAMANO_BLOQUE = 1024 * 1024
+
+
+def _hashers(algoritmos):
+    """Crea un objeto hashlib por algoritmo (ValueError si alguno no existe)."""
+    if isinstance(algoritmos, str):
+        algoritmos = (algoritmos,)
+    try:
+        return {nombre: hashlib.new(nombre) for nombre in algoritmos}
+    except ValueError:
+        raise ValueError(f"Algoritmo de hash no soportado: {algoritmos}") from None
+
+
+def hash_archivo(ruta: str, algoritmos=('sha256',), tamano_bloque: int = TAMANO_BLOQUE) -> dict:
+    """Calcula uno o varios resúmenes de un archivo leyéndolo una sola vez.
+
+    Args:
+        ruta: Archivo a resumir
+        algoritmos: Nombres de hashlib ('sha256', 'sha512', 'blake2b'...)
+        tamano_bloque: Bytes leídos por iteración
+
+    Returns:
+        dict {algoritmo: hexdigest}
+    """
+    hashers = _hashers(algoritmos)
+    buffer = bytearray(tamano_bloque)
+    vista = memoryview(buffer)
+    with open(ruta, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            bloque = vista[:n]
+            for h in hashers.values():
+                h.update(bloque)
+    return {nombre: h.hexdigest() for nombre, h in hashers.items()}
+
+
+def guardar_con_hash(origen, ruta: str, algoritmos=('sha256',), tamano_bloque: int = TAMANO_BLOQUE) -> dict:
+    """Copia un stream a disco calculando sus resúmenes mientras se escribe.
+
+    Evita releer el archivo después de guardarlo (p. ej. una subida de Flask:
+    ``guardar_con_hash(file_storage.stream, ruta)``).
+
+    Args:
+        origen: Objeto tipo archivo abierto en binario
+        ruta: Archivo de destino (se sobrescribe)
+        algoritmos: Nombres de hashlib
+        tamano_bloque: Bytes copiados por iteración
+
+    Returns:
+        dict {algoritmo: hexdigest, 'size': bytes escritos}
+    """
+    hashers = _hashers(algoritmos)
+    total = 0
+    with open(ruta, 'wb') as destino:
+        while True:
+            bloque = origen.read(tamano_bloque)
+            if not bloque:
+                break
+            destino.write(bloque)
+            for h in hashers.values():
+                h.update(bloque)
+            total += len(bloque)
+    resultado = {nombre: h.hexdigest() for nombre, h in hashers.items()}
+    resultado['size'] = total
+    return resultado
+
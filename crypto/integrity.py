@@ -0,0 +1,98 @@
+"""
+Verificación de integridad de mensajes del chat.
+Calcula una única etiqueta por mensaje según el modo configurado y la compara
+en tiempo constante.
+"""
+
+import hashlib
+import hmac
+
+# Modos soportados:
+#  - legacy:      SHA-256 + MD5 en hexadecimal ("sha256|md5"), formato original
+#  - sha256:      un solo SHA-256 (sin clave)
+#  - hmac-sha256: HMAC-SHA256 con clave derivada de la contraseña del servidor
+#  - blake2b:     BLAKE2b-256 con clave (solo clientes Python; no existe en WebCrypto)
+MODOS_INTEGRIDAD = ('legacy', 'sha256', 'hmac-sha256', 'blake2b')
+
+# Modos con clave: un mensaje sin etiqueta no se puede aceptar
+MODOS_CON_CLAVE = ('hmac-sha256', 'blake2b')
+
+# Prefijo de dominio para derivar la clave de integridad de la contraseña
+_CONTEXTO_CLAVE = b'chat-integridad|'
+
+
+def derivar_clave_integridad(secreto: str) -> bytes:
+    """Deriva la clave de 32 bytes usada por los modos con clave.
+    
+    El cliente web replica esta derivación: SHA-256("chat-integridad|" + secreto).
+    """
+    return hashlib.sha256(_CONTEXTO_CLAVE + secreto.encode('utf-8')).digest()
+
+
+class IntegrityVerifier:
+    """Calcula y verifica la etiqueta de integridad de los mensajes."""
+    
+    def __init__(self, modo: str = 'hmac-sha256', secreto: str | None = None):
+        """Inicializa el verificador.
+        
+        Args:
+            modo: Uno de MODOS_INTEGRIDAD
+            secreto: Secreto compartido (contraseña del servidor) para los modos con clave
+            
+        Raises:
+            ValueError: Si el modo no existe o falta el secreto
+        """
+        if modo not in MODOS_INTEGRIDAD:
+            raise ValueError(f"Modo de integridad desconocido: {modo}")
+        if modo in MODOS_CON_CLAVE and not secreto:
+            raise ValueError(f"El modo {modo} requiere un secreto compartido")
+        
+        self.modo = modo
+        self._clave = derivar_clave_integridad(secreto) if secreto else b''
+    
+    @property
+    def requiere_etiqueta(self) -> bool:
+        """True si el modo tiene clave y todo mensaje debe traer etiqueta."""
+        return self.modo in MODOS_CON_CLAVE
+    
+    @property
+    def longitud_etiqueta(self) -> int:
+        """Longitud en caracteres de la etiqueta que produce este modo."""
+        return 64 + 1 + 32 if self.modo == 'legacy' else 64
+    
+    def calcular(self, mensaje: str) -> str:
+        """Calcula la etiqueta de integridad de un mensaje en claro.
+        
+        Args:
+            mensaje: Texto del mensaje
+            
+        Returns:
+            Etiqueta en hexadecimal (en modo legacy, "sha256|md5")
+        """
+        datos = mensaje.encode('utf-8')
+        
+        if self.modo == 'hmac-sha256':
+            return hmac.new(self._clave, datos, hashlib.sha256).hexdigest()
+        if self.modo == 'blake2b':
+            return hashlib.blake2b(datos, key=self._clave, digest_size=32).hexdigest()
+        if self.modo == 'sha256':
+            return hashlib.sha256(datos).hexdigest()
+        
+        return f"{hashlib.sha256(datos).hexdigest()}|{hashlib.md5(datos).hexdigest()}"
+    
+    def verificar(self, mensaje: str, etiqueta: str | None) -> bool:
+        """Comprueba en tiempo constante que la etiqueta corresponde al mensaje.
+        
+        Args:
+            mensaje: Texto descifrado
+            etiqueta: Etiqueta recibida del cliente (None si no envió ninguna)
+            
+        Returns:
+            True si la etiqueta es válida; sin etiqueta, solo en los modos sin
+            clave (clientes antiguos que no la calculan)
+        """
+        if etiqueta is None:
+            return not self.requiere_etiqueta
+        if len(etiqueta) != self.longitud_etiqueta or not etiqueta.isascii():
+            return False
+        return hmac.compare_digest(self.calcular(mensaje), etiqueta.lower())
@@ -6,9 +6,102 @@ Implementa generación de claves, cifrado y descifrado usando RSA.
 import os
 import base64
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Sequence
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+
+
+logger = logging.getLogger(__name__)
+
+# Relleno OAEP compartido por todas las operaciones (el objeto es inmutable)
+_OAEP = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
+
+# Por debajo de este número de elementos no compensa repartir en hilos
+_MIN_ELEMENTOS_PARALELO = 8
+
+_executores_lote: dict[int, ThreadPoolExecutor] = {}
+_executores_lock = threading.Lock()
+
+
+def max_bytes_mensaje(clave_publica: RSAPublicKey) -> int:
+    """Bytes de texto en claro que caben en un bloque RSA-OAEP (SHA-256) de esa clave."""
+    return clave_publica.key_size // 8 - 2 * hashes.SHA256.digest_size - 2
+
+
+def fragmentar_mensaje(mensaje: str, max_bytes: int) -> list[str]:
+    """Divide un mensaje en trozos de como máximo `max_bytes` bytes UTF-8.
+    
+    Los cortes respetan los caracteres (nunca parten una secuencia UTF-8).
+    
+    Raises:
+        ValueError: Si `max_bytes` es menor que 4 (no cabría cualquier carácter)
+    """
+    if max_bytes < 4:
+        raise ValueError(f"max_bytes debe ser al menos 4 (un carácter UTF-8), no {max_bytes}")
+    datos = mensaje.encode('utf-8')
+    if len(datos) <= max_bytes:
+        return [mensaje]
+    trozos = []
+    inicio = 0
+    while inicio < len(datos):
+        fin = min(inicio + max_bytes, len(datos))
+        # Retroceder hasta el inicio de un carácter (los bytes 10xxxxxx continúan uno)
+        while fin < len(datos) and fin > inicio and datos[fin] & 0xC0 == 0x80:
+            fin -= 1
+        trozos.append(datos[inicio:fin].decode('utf-8'))
+        inicio = fin
+    return trozos
+
+
+class ResultadoLote(NamedTuple):
+    """Resultado de un elemento dentro de una operación por lotes."""
+    valor: str | None
+    error: Exception | None
+
+    @property
+    def ok(self) -> bool:
+        """Indica si el elemento se procesó sin errores."""
+        return self.error is None
+
+
+def _obtener_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Devuelve (creándolo si hace falta) el pool compartido de ese tamaño."""
+    with _executores_lock:
+        executor = _executores_lote.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix="RSABatchThread"
+            )
+            _executores_lote[max_workers] = executor
+        return executor
+
+
+def _procesar_lote(funcion: Callable, elementos: Sequence, max_workers: int) -> list[ResultadoLote]:
+    """Aplica `funcion` a cada elemento conservando el orden.
+
+    Los errores se capturan por elemento para que un fallo no aborte el lote.
+    OpenSSL libera el GIL durante las operaciones RSA, por lo que el pool de
+    hilos aprovecha varios núcleos.
+    """
+    def ejecutar(elemento) -> ResultadoLote:
+        try:
+            return ResultadoLote(funcion(elemento), None)
+        except Exception as e:
+            return ResultadoLote(None, e)
+
+    if max_workers <= 1 or len(elementos) < _MIN_ELEMENTOS_PARALELO:
+        return [ejecutar(elemento) for elemento in elementos]
+
+    return list(_obtener_executor(max_workers).map(ejecutar, elementos))
 
 
 class RSACrypto:
@@ -49,11 +142,11 @@ class RSACrypto:
                 format=serialization.PublicFormat.SubjectPublicKeyInfo
             )
             
-            logging.info(f"✅ Par de claves RSA generado (tamaño: {key_size} bits)")
+            logger.info("✅ Par de claves RSA generado (tamaño: %s bits)", key_size)
             return private_pem, public_pem
             
         except Exception as e:
-            logging.error(f"❌ Error generando claves RSA: {e}")
+            logger.error("❌ Error generando claves RSA: %s", e)
             raise
     
     def cargar_clave_privada(self, private_key_pem: bytes) -> None:
@@ -68,9 +161,9 @@ class RSACrypto:
                 password=None,
                 backend=self.backend
             )
-            logging.debug("✅ Clave privada RSA cargada")
+            logger.debug("✅ Clave privada RSA cargada")
         except Exception as e:
-            logging.error(f"❌ Error cargando clave privada: {e}")
+            logger.error("❌ Error cargando clave privada: %s", e)
             raise
     
     def cargar_clave_publica(self, public_key_pem: bytes) -> None:
@@ -84,9 +177,9 @@ class RSACrypto:
                 public_key_pem,
                 backend=self.backend
             )
-            logging.debug("✅ Clave pública RSA cargada")
+            logger.debug("✅ Clave pública RSA cargada")
         except Exception as e:
-            logging.error(f"❌ Error cargando clave pública: {e}")
+            logger.error("❌ Error cargando clave pública: %s", e)
             raise
     
     def cifrar(self, mensaje: str) -> str:
@@ -104,22 +197,15 @@ class RSACrypto:
         try:
             mensaje_bytes = mensaje.encode('utf-8')
             
-            mensaje_cifrado = self.public_key.encrypt(
-                mensaje_bytes,
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
+            mensaje_cifrado = self.public_key.encrypt(mensaje_bytes, _OAEP)
             
             mensaje_base64 = base64.b64encode(mensaje_cifrado).decode('utf-8')
             
-            logging.debug(f"✅ Mensaje cifrado con RSA (tamaño: {len(mensaje_bytes)} bytes)")
+            logger.debug("✅ Mensaje cifrado con RSA (tamaño: %s bytes)", len(mensaje_bytes))
             return mensaje_base64
             
         except Exception as e:
-            logging.error(f"❌ Error cifrando mensaje: {e}")
+            logger.error("❌ Error cifrando mensaje: %s", e)
             raise
     
     def descifrar(self, mensaje_cifrado: str) -> str:
@@ -137,23 +223,94 @@ class RSACrypto:
         try:
             mensaje_bytes = base64.b64decode(mensaje_cifrado.encode('utf-8'))
             
-            mensaje_descifrado = self.private_key.decrypt(
-                mensaje_bytes,
-                padding.OAEP(
-                    mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
+            mensaje_descifrado = self.private_key.decrypt(mensaje_bytes, _OAEP)
             
             mensaje = mensaje_descifrado.decode('utf-8')
-            logging.debug(f"✅ Mensaje descifrado con RSA (tamaño: {len(mensaje)} bytes)")
+            logger.debug("✅ Mensaje descifrado con RSA (tamaño: %s bytes)", len(mensaje))
             return mensaje
             
         except Exception as e:
-            logging.error(f"❌ Error descifrando mensaje: {e}")
+            logger.error("❌ Error descifrando mensaje: %s", e)
             raise
     
+    def cifrar_para_muchos(
+        self,
+        mensaje: str,
+        claves_publicas: Sequence[bytes | RSAPublicKey],
+        max_workers: int = 1
+    ) -> list[ResultadoLote]:
+        """Cifra un mismo mensaje para varios destinatarios.
+        
+        Args:
+            mensaje: Mensaje a cifrar
+            claves_publicas: Claves de los destinatarios (PEM u objetos ya cargados)
+            max_workers: Hilos a usar; 1 procesa el lote de forma secuencial
+            
+        Returns:
+            Lista de ResultadoLote en el mismo orden que `claves_publicas`,
+            con el mensaje cifrado en base64 o el error de ese destinatario
+        """
+        mensaje_bytes = mensaje.encode('utf-8')
+        
+        def cifrar_uno(clave: bytes | RSAPublicKey) -> str:
+            if not isinstance(clave, RSAPublicKey):
+                clave = serialization.load_pem_public_key(clave, backend=self.backend)
+            return base64.b64encode(clave.encrypt(mensaje_bytes, _OAEP)).decode('utf-8')
+        
+        resultados = _procesar_lote(cifrar_uno, claves_publicas, max_workers)
+        logger.debug("✅ Lote cifrado con RSA (%d destinatarios)", len(resultados))
+        return resultados
+    
+    def cifrar_lote(
+        self,
+        mensajes: Sequence[str],
+        clave_publica: bytes | RSAPublicKey,
+        max_workers: int = 1
+    ) -> list[ResultadoLote]:
+        """Cifra varios mensajes para un mismo destinatario.
+        
+        Args:
+            mensajes: Mensajes a cifrar
+            clave_publica: Clave del destinatario (PEM u objeto ya cargado)
+            max_workers: Hilos a usar; 1 procesa el lote de forma secuencial
+            
+        Returns:
+            Lista de ResultadoLote en el mismo orden que `mensajes`
+        """
+        if not isinstance(clave_publica, RSAPublicKey):
+            clave_publica = serialization.load_pem_public_key(clave_publica, backend=self.backend)
+        
+        def cifrar_uno(mensaje: str) -> str:
+            return base64.b64encode(clave_publica.encrypt(mensaje.encode('utf-8'), _OAEP)).decode('utf-8')
+        
+        resultados = _procesar_lote(cifrar_uno, mensajes, max_workers)
+        logger.debug("✅ Lote cifrado con RSA (%d mensajes)", len(resultados))
+        return resultados
+    
+    def descifrar_lote(self, mensajes_cifrados: Sequence[str], max_workers: int = 1) -> list[ResultadoLote]:
+        """Descifra varios mensajes con la clave privada.
+        
+        Args:
+            mensajes_cifrados: Mensajes cifrados en base64
+            max_workers: Hilos a usar; 1 procesa el lote de forma secuencial
+            
+        Returns:
+            Lista de ResultadoLote en el mismo orden que `mensajes_cifrados`,
+            con el texto descifrado o el error de ese elemento
+        """
+        if not self.private_key:
+            raise ValueError("No hay clave privada cargada")
+        
+        private_key = self.private_key
+        
+        def descifrar_uno(mensaje_cifrado: str) -> str:
+            mensaje_bytes = base64.b64decode(mensaje_cifrado.encode('utf-8'))
+            return private_key.decrypt(mensaje_bytes, _OAEP).decode('utf-8')
+        
+        resultados = _procesar_lote(descifrar_uno, mensajes_cifrados, max_workers)
+        logger.debug("✅ Lote descifrado con RSA (%d mensajes)", len(resultados))
+        return resultados
+    
     def guardar_claves(self, private_path: str, public_path: str) -> None:
         """Guarda las claves en archivos.
         
@@ -178,10 +335,10 @@ class RSACrypto:
                     format=serialization.PublicFormat.SubjectPublicKeyInfo
                 ))
             
-            logging.info(f"✅ Claves guardadas en {private_path} y {public_path}")
+            logger.info("✅ Claves guardadas en %s y %s", private_path, public_path)
             
         except Exception as e:
-            logging.error(f"❌ Error guardando claves: {e}")
+            logger.error("❌ Error guardando claves: %s", e)
             raise
     
     def cargar_claves_desde_archivo(self, private_path: str, public_path: str) -> None:
@@ -200,10 +357,10 @@ class RSACrypto:
                 public_pem = f.read()
                 self.cargar_clave_publica(public_pem)
             
-            logging.info(f"✅ Claves cargadas desde {private_path} y {public_path}")
+            logger.info("✅ Claves cargadas desde %s y %s", private_path, public_path)
             
         except Exception as e:
-            logging.error(f"❌ Error cargando claves desde archivos: {e}")
+            logger.error("❌ Error cargando claves desde archivos: %s", e)
             raise
 
 
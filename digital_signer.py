@@ -1,8 +1,17 @@
 from ironpdf import *
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 import hashlib
+import hmac
+import queue
+import shutil
 import tempfile
+import threading
+import weakref
 import os
 
+from crypto.digests import hash_archivo
+
 # Configurar licencia
 License.LicenseKey = (
     "IRONSUITE.20213TN098.UTEZ.EDU.MX.14475-"
@@ -11,25 +20,241 @@ License.LicenseKey = (
     "QJIF47.TRIAL.EXPIRES.19.DEC.2025"
 )
 
+# Nombre mostrado en el PDF de cada algoritmo de hash
+DIGEST_LABELS = {
+    "sha256": "SHA-256",
+    "sha384": "SHA-384",
+    "sha512": "SHA-512",
+    "sha3_256": "SHA3-256",
+    "blake2b": "BLAKE2b",
+}
+
 # Establecer carpeta temporal adecuada
 #Installation.TempFolderPath = os.path.join("dependencies", "ironpdf_temp")
 
 
+class RendererPool:
+    """
+    Pool de ChromePdfRenderer reutilizables.
+
+    Crear un renderer arranca Chrome (el coste dominante en documentos
+    pequeños); el pool los crea bajo demanda hasta ``size`` y los devuelve
+    a la cola al terminar, así que las siguientes conversiones los
+    encuentran ya calientes.
+    """
+
+    def __init__(self, size: int = 2):
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def renderer(self):
+        """
+        Presta un renderer; espera si ya hay ``size`` en uso.
+        """
+        try:
+            renderer = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    renderer = ChromePdfRenderer()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                renderer = self._idle.get()
+        try:
+            yield renderer
+        finally:
+            self._idle.put(renderer)
+
+    def warm(self):
+        """
+        Crea todos los renderers y hace una conversión de prueba con cada uno.
+        """
+        with ExitStack() as stack:
+            renderers = [stack.enter_context(self.renderer()) for _ in range(self.size)]
+            for renderer in renderers:
+                renderer.RenderHtmlAsPdf("<p></p>")
+
+
+class _CachedSignature:
+    """Entrada de SignatureCache: la firma, su lock y la copia privada del PFX."""
+
+    __slots__ = ("signature", "lock", "path")
+
+    def __init__(self, signature, path):
+        self.signature = signature
+        self.lock = threading.Lock()
+        self.path = path
+
+
+class SignatureCache:
+    """
+    Caché LRU de identidades de firma (PdfSignature) ya cargadas.
+
+    La clave es el SHA-256 del contenido del PFX más un HMAC de la
+    contraseña con una clave aleatoria del proceso: el mismo certificado con
+    otra contraseña no reutiliza la entrada, y la contraseña no queda
+    guardada ni en claro ni como hash reproducible.
+
+    Una PdfSignature no es segura entre hilos: ``borrow`` la presta en
+    exclusiva. Cada entrada se crea desde una copia del PFX propia de la
+    caché (0600), así que no depende del archivo temporal subido.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+        self._directory = None
+
+    def get(self, pfx_path: str, pfx_password: str):
+        """
+        Carga (o encuentra en caché) la identidad del PFX.
+
+        Sirve para validar la contraseña; para firmar, usar ``borrow``.
+
+        Raises:
+            Exception: La de IronPDF si el PFX o la contraseña no son válidos
+        """
+        if self.max_entries <= 0:
+            return PdfSignature(pfx_path, pfx_password)
+        return self._entry(pfx_path, pfx_password).signature
+
+    @contextmanager
+    def borrow(self, pfx_path: str, pfx_password: str):
+        """
+        Presta la PdfSignature del PFX sin que otro hilo la use a la vez.
+        """
+        if self.max_entries <= 0:
+            yield PdfSignature(pfx_path, pfx_password)
+            return
+        while True:
+            entry = self._entry(pfx_path, pfx_password)
+            with entry.lock:
+                # Expulsada entre _entry y el lock: su PFX ya no existe
+                if os.path.exists(entry.path):
+                    yield entry.signature
+                    return
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._discard(entry)
+
+    def _entry(self, pfx_path: str, pfx_password: str) -> _CachedSignature:
+        with open(pfx_path, "rb") as f:
+            pfx_data = f.read()
+
+        key = (
+            hashlib.sha256(pfx_data).hexdigest(),
+            hmac.new(self._secret, pfx_password.encode("utf-8"), hashlib.sha256).hexdigest()
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="pdf-identities-")
+                weakref.finalize(self, shutil.rmtree, self._directory, ignore_errors=True)
+
+        fd, path = tempfile.mkstemp(suffix=".pfx", dir=self._directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pfx_data)
+        try:
+            entry = _CachedSignature(PdfSignature(path, pfx_password), path)
+        except Exception:
+            os.remove(path)
+            raise
+
+        evicted = []
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None:
+                # Otro hilo la cargó a la vez: se usa la suya
+                evicted.append(entry)
+                entry = current
+            else:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            self._discard(old)
+        return entry
+
+    @staticmethod
+    def _discard(entry: _CachedSignature):
+        """Borra la copia del PFX cuando nadie está firmando con la entrada."""
+        with entry.lock:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
 class DigitalSigner:
 
+    def __init__(self, renderer_pool_size: int = 2, signature_cache_size: int = 8, warm: bool = False):
+        """
+        Args:
+            renderer_pool_size: Renderers de Chrome reutilizados por sign_txt/sign_zip
+            signature_cache_size: Identidades PFX cargadas que se conservan (0 = sin caché)
+            warm: Arrancar los renderers en segundo plano al crear el firmador
+        """
+        self.renderers = RendererPool(renderer_pool_size)
+        self.signatures = SignatureCache(signature_cache_size)
+        if warm:
+            threading.Thread(target=self._warm, name="PdfRendererWarmup", daemon=True).start()
+
+    def _warm(self):
+        try:
+            self.renderers.warm()
+        except Exception as e:
+            print(f"⚠️  No se pudieron precalentar los renderers PDF: {e}")
+
     def sign_pdf(self, input_pdf: str, output_pdf: str, pfx_path: str, pfx_password: str):
         """
         Firma un archivo PDF usando IronPDF.
         """
         pdf = PdfDocument.FromFile(input_pdf)
 
-        signature = PdfSignature(
-            pfx_path,
-            pfx_password
-        )
+        self.sign_document(pdf, output_pdf, pfx_path, pfx_password)
 
-        pdf.Sign(signature)
-        pdf.SaveAs(output_pdf)
+
+    def sign_document(self, pdf, output_pdf: str, pfx_path: str, pfx_password: str):
+        """
+        Firma un PdfDocument ya cargado o renderizado y lo guarda.
+        """
+        # SaveAs aplica la firma: ambos con la identidad prestada en exclusiva
+        with self.signatures.borrow(pfx_path, pfx_password) as signature:
+            pdf.Sign(signature)
+            pdf.SaveAs(output_pdf)
+
+
+    def sign_file(self, input_path: str, output_pdf: str, pfx_path: str, pfx_password: str):
+        """
+        Firma un PDF, TXT o ZIP según su extensión.
+        """
+        handler = {
+            ".pdf": self.sign_pdf,
+            ".txt": self.sign_txt,
+            ".zip": self.sign_zip,
+        }.get(os.path.splitext(input_path)[1].lower())
+        if handler is None:
+            raise ValueError(f"Tipo de archivo no soportado: {os.path.basename(input_path)}")
+        handler(input_path, output_pdf, pfx_path, pfx_password)
 
 
     def sign_txt(self, txt_path: str, output_pdf: str, pfx_path: str, pfx_password: str):
@@ -39,44 +264,35 @@ class DigitalSigner:
         with open(txt_path, "r", encoding="utf-8") as f:
             text = f.read()
 
-        renderer = ChromePdfRenderer()
-        pdf = renderer.RenderHtmlAsPdf(f"<pre>{text}</pre>")
-
-        # Crear archivo temporal seguro
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_pdf = tmp.name
-
-        pdf.SaveAs(temp_pdf)
-
-        self.sign_pdf(temp_pdf, output_pdf, pfx_path, pfx_password)
+        with self.renderers.renderer() as renderer:
+            pdf = renderer.RenderHtmlAsPdf(f"<pre>{text}</pre>")
 
-        os.remove(temp_pdf)
+        # Se firma el documento renderizado, sin pasar por un PDF temporal
+        self.sign_document(pdf, output_pdf, pfx_path, pfx_password)
 
 
-    def sign_zip(self, zip_path: str, output_pdf: str, pfx_path: str, pfx_password: str):
+    def sign_zip(self, zip_path: str, output_pdf: str, pfx_path: str, pfx_password: str,
+                 algorithms=("sha256",)):
         """
         Genera un PDF que contiene el hash del ZIP, y lo firma.
-        """
-        with open(zip_path, "rb") as f:
-            data = f.read()
 
-        sha256_hash = hashlib.sha256(data).hexdigest()
+        El ZIP se resume por bloques (memoria constante, sirve para archivos
+        de varios GB) y todos los ``algorithms`` se calculan en la misma pasada.
+        """
+        digests = hash_archivo(zip_path, algorithms)
+        size = os.path.getsize(zip_path)
 
+        rows = "".join(
+            f"<p><b>Hash {DIGEST_LABELS.get(name, name.upper())}:</b></p><pre>{value}</pre>"
+            for name, value in digests.items()
+        )
         html = f"""
         <h1>Firma Digital del Archivo ZIP</h1>
         <p><b>Archivo:</b> {os.path.basename(zip_path)}</p>
-        <p><b>Hash SHA-256:</b></p>
-        <pre>{sha256_hash}</pre>
-        """
-
-        renderer = ChromePdfRenderer()
-        pdf = renderer.RenderHtmlAsPdf(html)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            temp_pdf = tmp.name
-
-        pdf.SaveAs(temp_pdf)
+        <p><b>Tamaño:</b> {size} bytes</p>
+        {rows}"""
 
-        self.sign_pdf(temp_pdf, output_pdf, pfx_path, pfx_password)
+        with self.renderers.renderer() as renderer:
+            pdf = renderer.RenderHtmlAsPdf(html)
 
-        os.remove(temp_pdf)
+        self.sign_document(pdf, output_pdf, pfx_path, pfx_password)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark del índice de búsqueda (core/search_index.py).
+
+Crea un índice temporal con N mensajes sintéticos repartidos en varias salas
+y mide la latencia de consultas típicas de /search: una palabra, dos palabras,
+un prefijo corto y una palabra rara, siempre filtradas por sala. La última
+fila busca una palabra común en una sala con muy pocos mensajes (el peor caso
+del filtro por sala).
+
+Ejemplo:
+    python scripts/bench_search.py --messages 1000000 --rooms 50 --repeat 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.search_index import SearchIndex
+
+PALABRAS = (
+    'hola adiós gracias mañana reunión proyecto servidor cliente mensaje sala '
+    'cifrado clave firma documento archivo error prueba despliegue versión código '
+    'revisión parche rama commit usuario contraseña token sesión caché índice búsqueda'
+).split()
+
+CONSULTAS = {
+    'una palabra': 'servidor',
+    'dos palabras': 'servidor cifrado',
+    'prefijo': 'se*',
+    'palabra rara': 'zanahoria',
+}
+
+
+def poblar(indice: SearchIndex, mensajes: int, salas: int, semilla: int) -> None:
+    """Añade `mensajes` mensajes sintéticos y espera a que estén escritos."""
+    azar = random.Random(semilla)
+    ahora = time.time()
+    for offset in range(mensajes):
+        palabras = azar.choices(PALABRAS, k=azar.randint(3, 12))
+        if azar.random() < 0.0001:
+            palabras.append('zanahoria')
+        sala = 'pequena' if offset % 10000 == 0 else f'sala{offset % salas}'
+        indice.agregar(offset, ahora + offset, sala, f'user{azar.randrange(1000)}', ' '.join(palabras))
+    indice.cerrar()
+
+
+def medir(indice: SearchIndex, consulta: str, salas: list[str], repeticiones: int, limite: int) -> list[float]:
+    """Latencias (ms) de `repeticiones` búsquedas repartidas entre `salas`."""
+    latencias = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        indice.buscar(consulta, sala=salas[i % len(salas)], limite=limite)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark del índice de búsqueda FTS5')
+    parser.add_argument('--messages', type=int, default=1000000, help='Mensajes a indexar')
+    parser.add_argument('--rooms', type=int, default=50, help='Salas entre las que se reparten')
+    parser.add_argument('--repeat', type=int, default=200, help='Búsquedas por consulta')
+    parser.add_argument('--limit', type=int, default=20, help='Resultados por búsqueda')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-search-') as directorio:
+        ruta = Path(directorio) / 'search.db'
+        inicio = time.perf_counter()
+        poblar(SearchIndex(ruta, tamano_lote=10000), args.messages, args.rooms, args.seed)
+        print(f"Indexados {args.messages} mensajes en {args.rooms} salas en "
+              f"{time.perf_counter() - inicio:.1f} s ({ruta.stat().st_size / 1e6:.0f} MB)")
+
+        indice = SearchIndex(ruta, solo_lectura=True)
+        print(f"{'CONSULTA':<14} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+        salas = [f'sala{n}' for n in range(args.rooms)]
+        casos = [(nombre, consulta, salas) for nombre, consulta in CONSULTAS.items()]
+        casos.append(('sala pequeña', CONSULTAS['una palabra'], ['pequena']))
+        for nombre, consulta, salas_caso in casos:
+            latencias = sorted(medir(indice, consulta, salas_caso, args.repeat, args.limit))
+            p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+            print(f"{nombre:<14} {statistics.median(latencias):>8.2f} {p99:>8.2f} {latencias[-1]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark del servidor web: peticiones por segundo y latencias de
+`/`, `/chat` y `/api/chat/token`.
+
+Inicia sesión con /login/credentials para obtener la cookie de sesión y
+lanza N hilos concurrentes contra cada endpoint durante un tiempo fijo.
+
+Ejemplo (comparar desarrollo y producción):
+    python web_server.py                    # o: python web_server.py --production
+    python scripts/bench_web.py --url http://localhost:5000 --duration 10 --concurrency 16
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import requests
+except ImportError:
+    print("❌ Error: El módulo 'requests' es requerido.")
+    print("   Instala las dependencias: pip install -r requirements.txt")
+    sys.exit(1)
+
+ENDPOINTS = ('/', '/chat', '/api/chat/token')
+
+
+def iniciar_sesion(url: str, email: str) -> dict:
+    """Autentica por credenciales y devuelve las cookies de sesión."""
+    respuesta = requests.post(f'{url}/login/credentials',
+                              json={'email': email, 'password': 'benchmark'}, timeout=10)
+    respuesta.raise_for_status()
+    return respuesta.cookies.get_dict()
+
+
+def medir(url: str, ruta: str, cookies: dict, duracion: float, concurrencia: int) -> dict:
+    """Lanza peticiones GET contra `ruta` durante `duracion` segundos."""
+    latencias: list[float] = []
+    errores = 0
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def trabajador() -> None:
+        nonlocal errores
+        sesion = requests.Session()
+        sesion.cookies.update(cookies)
+        propias = []
+        fallos = 0
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                r = sesion.get(f'{url}{ruta}', allow_redirects=False, timeout=30)
+                if r.status_code >= 400:
+                    fallos += 1
+            except requests.RequestException:
+                fallos += 1
+            propias.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(propias)
+            errores += fallos
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        for _ in range(concurrencia):
+            pool.submit(trabajador)
+
+    latencias.sort()
+    total = len(latencias)
+
+    def percentil(p: float) -> float:
+        return latencias[min(total - 1, int(total * p))] * 1000 if total else 0.0
+
+    return {
+        'ruta': ruta,
+        'peticiones': total,
+        'rps': total / duracion,
+        'p50': percentil(0.50),
+        'p99': percentil(0.99),
+        'errores': errores,
+    }
+
+
+def main():
+    """Función principal del benchmark."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Benchmark de peticiones/s del servidor web')
+    parser.add_argument('--url', default='http://localhost:5000', help='URL base (default: http://localhost:5000)')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos por endpoint (default: 10)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes concurrentes (default: 8)')
+    parser.add_argument('--email', default='bench@example.com', help='Usuario para la sesión')
+    args = parser.parse_args()
+    
+    url = args.url.rstrip('/')
+    try:
+        cookies = iniciar_sesion(url, args.email)
+    except requests.RequestException as e:
+        print(f"❌ No se pudo iniciar sesión en {url}: {e}")
+        sys.exit(1)
+    
+    print(f"\n📊 Benchmark de {url} ({args.concurrency} clientes, {args.duration:g} s por endpoint)\n")
+    print(f"{'ENDPOINT':<18} {'PETICIONES':>10} {'REQ/S':>10} {'p50 ms':>8} {'p99 ms':>8} {'ERRORES':>8}")
+    for ruta in ENDPOINTS:
+        r = medir(url, ruta, cookies, args.duration, args.concurrency)
+        print(f"{r['ruta']:<18} {r['peticiones']:>10} {r['rps']:>10.1f} "
+              f"{r['p50']:>8.1f} {r['p99']:>8.1f} {r['errores']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Compila los archivos estáticos del servidor web (CSS y JS de auth/static).
+
+Para cada archivo:
+  1. Lo minifica con rcssmin/rjsmin (si no están instalados se copia tal cual).
+  2. Le añade al nombre un hash de su contenido: chat-client.3f2a9c1b7d4e.js
+  3. Escribe versiones precomprimidas .gz y, si está instalado `brotli`, .br
+
+El resultado va a auth/static/dist/ junto con manifest.json, que el servidor
+web usa para que url_for('static', ...) apunte a la versión con hash y para
+servirla con Cache-Control immutable.
+
+Ejemplo:
+    python scripts/build_static.py            # antes de arrancar en producción
+    python scripts/build_static.py --clean    # borrar compilaciones anteriores
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATIC_DIR = BASE_DIR / 'auth' / 'static'
+DIST_NAME = 'dist'
+EXTENSIONES = ('.css', '.js')
+
+
+def minificar(ruta: Path, texto: str) -> str:
+    """Minifica un CSS o JS; sin rcssmin/rjsmin lo devuelve sin cambios."""
+    if ruta.suffix == '.css':
+        return rcssmin.cssmin(texto) if rcssmin is not None else texto
+    return rjsmin.jsmin(texto) if rjsmin is not None else texto
+
+
+def comprimir(ruta: Path, datos: bytes) -> list[Path]:
+    """Escribe las versiones .gz (y .br si hay brotli) junto a `ruta`."""
+    generados = []
+    gz = ruta.with_name(ruta.name + '.gz')
+    # mtime=0: mismo contenido, mismos bytes (compilaciones reproducibles)
+    gz.write_bytes(gzip.compress(datos, compresslevel=9, mtime=0))
+    generados.append(gz)
+    if brotli is not None:
+        br = ruta.with_name(ruta.name + '.br')
+        br.write_bytes(brotli.compress(datos, quality=11))
+        generados.append(br)
+    return generados
+
+
+def compilar(static_dir: Path = STATIC_DIR, limpiar: bool = False) -> dict:
+    """Compila todos los CSS/JS de `static_dir` y escribe el manifiesto.
+
+    Returns:
+        dict {ruta original: ruta con hash} (relativas a `static_dir`)
+    """
+    dist = static_dir / DIST_NAME
+    if limpiar and dist.exists():
+        shutil.rmtree(dist)
+    dist.mkdir(parents=True, exist_ok=True)
+
+    manifiesto = {}
+    print(f"{'ARCHIVO':<28} {'ORIGINAL':>9} {'MINIF.':>9} {'GZIP':>9} {'BROTLI':>9}")
+    for origen in sorted(static_dir.rglob('*')):
+        if not origen.is_file() or origen.suffix not in EXTENSIONES:
+            continue
+        relativa = origen.relative_to(static_dir)
+        if relativa.parts[0] == DIST_NAME:
+            continue
+
+        texto = origen.read_text(encoding='utf-8')
+        datos = minificar(origen, texto).encode('utf-8')
+        huella = hashlib.sha256(datos).hexdigest()[:12]
+
+        destino_rel = relativa.with_name(f"{relativa.stem}.{huella}{relativa.suffix}")
+        destino = dist / destino_rel
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(datos)
+        comprimidos = {p.suffix: p.stat().st_size for p in comprimir(destino, datos)}
+        manifiesto[relativa.as_posix()] = destino_rel.as_posix()
+
+        print(f"{relativa.as_posix():<28} {origen.stat().st_size:>9} {len(datos):>9} "
+              f"{comprimidos.get('.gz', 0):>9} {comprimidos.get('.br', '-'):>9}")
+
+    # Escritura atómica: un worker nunca lee un manifiesto a medias
+    ruta_manifiesto = dist / 'manifest.json'
+    temporal = ruta_manifiesto.with_suffix('.json.tmp')
+    temporal.write_text(json.dumps(manifiesto, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+    os.replace(temporal, ruta_manifiesto)
+    return manifiesto
+
+
+def main():
+    """Función principal del compilador de estáticos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Minifica, añade hash y precomprime los CSS/JS del servidor web')
+    parser.add_argument('--static-dir', default=str(STATIC_DIR), help='Carpeta de estáticos (default: auth/static)')
+    parser.add_argument('--clean', action='store_true', help='Borrar dist/ antes de compilar')
+    args = parser.parse_args()
+
+    static_dir = Path(args.static_dir)
+    if not static_dir.is_dir():
+        print(f"❌ No existe la carpeta {static_dir}")
+        sys.exit(1)
+
+    manifiesto = compilar(static_dir, limpiar=args.clean)
+    if rcssmin is None or rjsmin is None:
+        print("\n⚠️  'rcssmin'/'rjsmin' no están instalados: se copiaron CSS/JS sin minificar (pip install rcssmin rjsmin)")
+    if brotli is None:
+        print("\n⚠️  'brotli' no está instalado: solo se generaron versiones .gz (pip install brotli)")
+    print(f"\n✓ {len(manifiesto)} archivos en {static_dir / DIST_NAME} (manifest.json)")
+
+
+if __name__ == "__main__":
+    main()
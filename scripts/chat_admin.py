@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cliente del socket de administración del servidor de chat.
+
+Ejemplos:
+    python scripts/chat_admin.py sessions
+    python scripts/chat_admin.py kick ana spam
+    python scripts/chat_admin.py loglevel crypto DEBUG
+    python scripts/chat_admin.py threads
+    python scripts/chat_admin.py profile 30 speedscope
+"""
+
+import json
+import os
+import socket
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+
+def enviar_comando(ruta: str, comando: str, timeout: float = 30.0) -> dict:
+    """Envía un comando al socket de administración y devuelve la respuesta JSON."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+        conexion.settimeout(timeout)
+        conexion.connect(ruta)
+        conexion.sendall(comando.encode('utf-8') + b'\n')
+        with conexion.makefile('rb') as canal:
+            return json.loads(canal.readline())
+
+
+def mostrar_sesiones(sesiones: list[dict]) -> None:
+    """Imprime las sesiones como tabla."""
+    if not sesiones:
+        print("(sin clientes conectados)")
+        return
+    print(f"{'NICK':<16} {'SALA':<12} {'DIRECCIÓN':<22} {'RX msg':>7} {'TX msg':>7} "
+          f"{'RX bytes':>10} {'TX bytes':>10} {'RETENIDO':>8} {'ÚLTIMA ACTIVIDAD':>17}")
+    for s in sesiones:
+        actividad = datetime.fromtimestamp(s['ultima_actividad']).strftime('%H:%M:%S')
+        print(f"{str(s['nickname']):<16} {str(s['sala']):<12} {s['address']:<22} "
+              f"{s['mensajes_recibidos']:>7} {s['mensajes_enviados']:>7} "
+              f"{s['bytes_recibidos']:>10} {s['bytes_enviados']:>10} {s['retenidos_bytes']:>8} {actividad:>17}")
+
+
+def mostrar_hilos(hilos: dict[str, list[str]]) -> None:
+    """Imprime la pila de cada hilo."""
+    for nombre, pila in hilos.items():
+        print(f"\n🧵 {nombre}")
+        print(''.join(pila).rstrip())
+
+
+def main():
+    """Función principal del cliente de administración."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Administración del servidor de chat en marcha')
+    parser.add_argument('comando', nargs='+', help='sessions | stats | kick <nick> [motivo] | '
+                                                   'loglevel [logger] <nivel> | threads | stacks | '
+                                                   'profile [segundos] [formato] | help')
+    parser.add_argument('--socket', default=Config.ADMIN_SOCKET,
+                        help=f'Socket de administración (default: {Config.ADMIN_SOCKET})')
+    parser.add_argument('--json', action='store_true', help='Mostrar la respuesta JSON sin formato')
+    
+    args = parser.parse_args()
+    
+    try:
+        respuesta = enviar_comando(args.socket, ' '.join(args.comando))
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"❌ No hay ningún servidor escuchando en {args.socket}")
+        sys.exit(1)
+    
+    if not respuesta.get('ok'):
+        print(f"❌ {respuesta.get('error')}")
+        sys.exit(1)
+    
+    resultado = respuesta['resultado']
+    nombre = args.comando[0].lower()
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    elif nombre == 'sessions':
+        mostrar_sesiones(resultado)
+    elif nombre == 'threads':
+        mostrar_hilos(resultado)
+    elif isinstance(resultado, str):
+        print(f"✅ {resultado}")
+    else:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
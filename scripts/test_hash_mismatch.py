@@ -1,24 +1,25 @@
 """
-Prueba rápida para validar la comprobación SHA-256 en el servidor.
+Prueba rápida para validar la comprobación de integridad en el servidor.
 Genera un par RSA temporal, cifra un mensaje, y prueba dos payloads:
- - payload válido (hash correcto) -> debe ser aceptado
- - payload manipulado (hash cambiado) -> debe ser descartado
+ - payload válido (etiqueta correcta) -> debe ser aceptado
+ - payload manipulado (etiqueta cambiada) -> debe ser descartado
 
 Esta prueba simula únicamente la lógica de verificación del servidor
-sin abrir sockets.
+sin abrir sockets. Usa el modo configurado en CHAT_INTEGRITY_MODE.
 """
 import json
-import hashlib
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from crypto.rsa_crypto import RSACrypto
+from crypto.integrity import IntegrityVerifier
+from config import Config
 
 
-def simulate_server_processing(server_rsa: RSACrypto, payload_json: str) -> bool:
+def simulate_server_processing(server_rsa: RSACrypto, verifier: IntegrityVerifier, payload_json: str) -> bool:
     """Simula el procesamiento del payload en el servidor.
-    Devuelve True si el mensaje es aceptado (hash coincide), False si se descarta.
+    Devuelve True si el mensaje es aceptado (etiqueta válida), False si se descarta.
     """
     try:
         parsed = json.loads(payload_json)
@@ -26,12 +27,12 @@ def simulate_server_processing(server_rsa: RSACrypto, payload_json: str) -> bool
         print(f"[SIM] Payload no es JSON: {e}")
         return False
 
-    if not (isinstance(parsed, dict) and 'cipher' in parsed and 'hash' in parsed):
+    if not (isinstance(parsed, dict) and 'cipher' in parsed and 'tag' in parsed):
         print("[SIM] Formato JSON inválido")
         return False
 
     cipher = parsed['cipher']
-    recv_hash = parsed['hash']
+    recv_tag = parsed['tag']
 
     try:
         mensaje_desc = server_rsa.descifrar(cipher)
@@ -39,14 +40,13 @@ def simulate_server_processing(server_rsa: RSACrypto, payload_json: str) -> bool
         print(f"[SIM] No se pudo descifrar el cipher: {e}")
         return False
 
-    calc_hash = hashlib.sha256(mensaje_desc.encode('utf-8')).hexdigest()
-    if calc_hash != recv_hash:
-        print("[SIM] Hash inválido: mensaje descartado")
-        print(f"[SIM] hash recibido: {recv_hash}")
-        print(f"[SIM] hash calculado: {calc_hash}")
+    if not verifier.verificar(mensaje_desc, recv_tag):
+        print("[SIM] Etiqueta inválida: mensaje descartado")
+        print(f"[SIM] etiqueta recibida: {recv_tag}")
+        print(f"[SIM] etiqueta calculada: {verifier.calcular(mensaje_desc)}")
         return False
 
-    print("[SIM] Hash válido: mensaje aceptado")
+    print(f"[SIM] Etiqueta válida ({verifier.modo}): mensaje aceptado")
     print(f"[SIM] Mensaje descifrado: {mensaje_desc}")
     return True
 
@@ -58,20 +58,22 @@ if __name__ == '__main__':
     client_rsa = RSACrypto()
     client_rsa.cargar_clave_publica(public_pem)
 
+    verifier = IntegrityVerifier(Config.INTEGRITY_MODE, Config.SERVER_PASSWORD)
+
     mensaje = "Este es un mensaje de prueba para verificar hashes"
 
     cipher = client_rsa.cifrar(mensaje)
 
-    correct_hash = hashlib.sha256(mensaje.encode('utf-8')).hexdigest()
-    payload_good = json.dumps({'cipher': cipher, 'hash': correct_hash})
+    correct_tag = verifier.calcular(mensaje)
+    payload_good = json.dumps({'cipher': cipher, 'tag': correct_tag})
 
-    print('\n--- Prueba 1: payload con hash correcto ---')
-    accepted = simulate_server_processing(server_rsa, payload_good)
+    print('\n--- Prueba 1: payload con etiqueta correcta ---')
+    accepted = simulate_server_processing(server_rsa, verifier, payload_good)
     print(f"Resultado: {'ACEPTADO' if accepted else 'DESCARTADO'}\n")
 
-    bad_hash = correct_hash[:-1] + ( '0' if correct_hash[-1] != '0' else '1')
-    payload_bad = json.dumps({'cipher': cipher, 'hash': bad_hash})
+    bad_tag = correct_tag[:-1] + ('0' if correct_tag[-1] != '0' else '1')
+    payload_bad = json.dumps({'cipher': cipher, 'tag': bad_tag})
 
-    print('--- Prueba 2: payload con hash MANIPULADO ---')
-    accepted2 = simulate_server_processing(server_rsa, payload_bad)
+    print('--- Prueba 2: payload con etiqueta MANIPULADA ---')
+    accepted2 = simulate_server_processing(server_rsa, verifier, payload_bad)
     print(f"Resultado: {'ACEPTADO' if accepted2 else 'DESCARTADO'}\n")
@@ -6,11 +6,12 @@ Mantiene múltiples clientes usando ThreadPoolExecutor y manejo seguro de recurs
 import socket
 import ssl
 import threading
-import traceback
 import logging
 import multiprocessing
 import os
-import json
+import random
+import select
+import signal
 import sys
 import time
 from concurrent.futures import ThreadPoolExecutor
@@ -18,9 +19,22 @@ from pathlib import Path
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from crypto.rsa_crypto import RSACrypto
+from crypto.rsa_crypto import RSACrypto, fragmentar_mensaje, max_bytes_mensaje
+from crypto.integrity import IntegrityVerifier
+from core.protocol import MessageParser, ProtocolError, parsear_saludo, respuesta_protocolo
+from core.rate_limit import RateLimiter, TokenBucket
+from core.registry import ClientRegistry
+from core.session import ClientSession
+from core.rooms import RoomManager, es_nombre_sala_valido
 from cryptography.hazmat.primitives import serialization
 from config import Config
+from core.logging_setup import configurar_logging, establecer_nivel
+from core.message_log import MessageLog
+from core.spool import Ausencia, OfflineSpool
+from core.search_index import SearchIndex
+from core.handoff import HandoffError, recibir_reenvios, reenviar, servir_relevo, solicitar_relevo
+from core.admin import AdminServer, instantanea_pilas, volcar_hilos
+from core.profiler import iniciar_perfil
 
 try:
     from colorama import init as colorama_init
@@ -37,11 +51,7 @@ try:
 except RuntimeError:
     pass
 
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format=Config.LOG_FORMAT,
-    datefmt=Config.LOG_DATE_FORMAT
-)
+logger = logging.getLogger("server")
 
 
 class ChatServer:
@@ -53,9 +63,18 @@ class ChatServer:
         port: int | None = None, 
         password: str | None = None, 
         max_clients: int | None = None,
-        enable_ssl: bool | None = None
+        enable_ssl: bool | None = None,
+        socket_escucha: socket.socket | None = None,
+        canal_relevo: socket.socket | None = None
     ) -> None:
-        """Inicializa el servidor de chat."""
+        """Inicializa el servidor de chat.
+        
+        Args:
+            socket_escucha: Socket ya en escucha heredado de otro proceso
+                (reinicio con relevo); si es None se crea uno nuevo
+            canal_relevo: Canal por el que el proceso anterior reenvía los
+                mensajes que le llegan mientras sus clientes reconectan
+        """
         self.host = host or Config.DEFAULT_HOST
         self.port = port or Config.DEFAULT_PORT
         self.password = password or Config.SERVER_PASSWORD
@@ -65,19 +84,21 @@ class ChatServer:
         
         self.rsa_crypto = RSACrypto()
         self.inicializar_claves_rsa()
-
-        # Crear socket base
-        base_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        base_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.integridad = IntegrityVerifier(Config.INTEGRITY_MODE, self.password)
 
         try:
             import resource
             resource.setrlimit(resource.RLIMIT_NOFILE, (self.max_clients, self.max_clients))
         except Exception as e:
-            logging.warning(f"No se pudo ajustar el límite de archivos: {e}")
+            logger.warning("No se pudo ajustar el límite de archivos: %s", e)
 
-        base_server.bind((self.host, self.port))
-        base_server.listen(self.max_clients)
+        if socket_escucha is not None:
+            base_server = socket_escucha
+        else:
+            base_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            base_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            base_server.bind((self.host, self.port))
+            base_server.listen(self.max_clients)
         self.port = base_server.getsockname()[1]
 
         # Configurar SSL/TLS si está habilitado
@@ -90,32 +111,93 @@ class ChatServer:
 
         self.local_ip = self._descubrir_ip_local()
 
-        self.clients: dict[socket.socket, tuple[str, bytes]] = {}
+        self.registro = ClientRegistry(self.max_clients)
+        self.salas = RoomManager(Config.DEFAULT_ROOM, Config.MAX_ROOMS)
+        self.historial = MessageLog(
+            Config.HISTORY_DIR,
+            max_bytes_segmento=Config.HISTORY_SEGMENT_BYTES,
+            max_segundos_segmento=Config.HISTORY_SEGMENT_SECONDS,
+            max_segmentos=Config.HISTORY_MAX_SEGMENTS,
+            fsync=Config.HISTORY_FSYNC
+        ) if Config.HISTORY_ENABLED else None
+        self.spool = self._crear_spool(self.historial)
+        # El índice usa los offsets del historial, así que depende de él
+        self.buscador = SearchIndex(
+            Config.SEARCH_DB,
+            tamano_lote=Config.SEARCH_BATCH_SIZE,
+            intervalo_escritura=Config.SEARCH_FLUSH_INTERVAL
+        ) if Config.SEARCH_ENABLED and self.historial is not None else None
+        if self.buscador is not None:
+            threading.Thread(target=self._reindexar_historial, name="SearchReindex", daemon=True).start()
         self.thread_pool = ThreadPoolExecutor(
             max_workers=self.max_clients, 
             thread_name_prefix="ChatClientThread"
         )
-        self.global_lock = threading.Lock()
+        # Pool aparte para la puesta al día: no compite con los hilos de clientes
+        self.pool_historial = ThreadPoolExecutor(
+            max_workers=Config.HISTORY_REPLAY_WORKERS,
+            thread_name_prefix="ChatCatchupThread"
+        )
+
+        # Reinicio con relevo: el bucle de aceptación sondea `aceptando`
+        self.aceptando = True
+        self.relevado = False
+        self._fin_aceptacion = threading.Event()
+        self._socket_entregado = threading.Event()
+        self.canal_relevo = canal_relevo
+        # Las escrituras en historial, índice y buzones se hacen con este lock:
+        # al ceder el almacenamiento se sustituyen por el reenvío al proceso
+        # nuevo sin que ningún hilo escriba en un archivo ya cerrado
+        self._lock_almacen = threading.Lock()
+        self._reenvio: socket.socket | None = None
+        self._reenvio_cola: list[dict] | None = None
+        self.admin = AdminServer(Config.ADMIN_SOCKET, self._comandos_admin()) if Config.ADMIN_SOCKET else None
 
-        logging.info(f"🌐 Servidor de chat iniciado en {self.host}:{self.port}")
+        # Límites anti-abuso: el descifrado RSA es la operación cara a proteger
+        self.slots_sin_autenticar = threading.BoundedSemaphore(Config.MAX_UNAUTHENTICATED)
+        self.limitador_conexiones = RateLimiter(Config.RATE_CONNECTIONS_PER_IP, Config.RATE_CONNECTIONS_BURST)
+        self.limitador_descifrado = RateLimiter(Config.RATE_DECRYPTS_PER_IP, Config.RATE_DECRYPTS_BURST)
+
+        logger.info("🌐 Servidor de chat iniciado en %s:%s", self.host, self.port)
         if self.host == '0.0.0.0':
-            logging.info(f"🔗 Conéctate desde otros dispositivos: {self.local_ip}:{self.port}")
-        logging.info(f"🔐 Contraseña del servidor: {'*' * len(self.password)}")
-        logging.info(f"🔒 Cifrado RSA habilitado ({Config.RSA_KEY_SIZE} bits)")
+            logger.info("🔗 Conéctate desde otros dispositivos: %s:%s", self.local_ip, self.port)
+        logger.info("🔐 Contraseña del servidor: %s", '*' * len(self.password))
+        logger.info("🔒 Cifrado RSA habilitado (%s bits)", Config.RSA_KEY_SIZE)
+        logger.info("🧾 Integridad de mensajes: %s", self.integridad.modo)
         if self.enable_ssl:
-            logging.info(f"🔐 SSL/TLS habilitado (TLS 1.2+)")
+            logger.info("🔐 SSL/TLS habilitado (TLS 1.2+)")
         else:
-            logging.warning(f"⚠️  SSL/TLS deshabilitado")
+            logger.warning("⚠️  SSL/TLS deshabilitado")
+
+    @staticmethod
+    def _crear_spool(historial: MessageLog | None) -> OfflineSpool | None:
+        """Buzones offline, o None si están deshabilitados.
+        
+        Lo que se perdió en la sala mientras tanto se lee del historial, así que
+        sin historial los buzones no se abren: el usuario volvería creyendo que
+        no se dijo nada.
+        """
+        if not Config.SPOOL_ENABLED:
+            return None
+        if historial is None:
+            logger.warning("⚠️  Buzones offline deshabilitados: requieren CHAT_HISTORY_ENABLED")
+            return None
+        return OfflineSpool(
+            Config.SPOOL_DIR,
+            max_mensajes=Config.SPOOL_MAX_MESSAGES,
+            max_bytes=Config.SPOOL_MAX_BYTES,
+            ttl=Config.SPOOL_TTL
+        )
 
     def _configurar_ssl(self) -> ssl.SSLContext:
         """Configura el contexto SSL/TLS para el servidor."""
         try:
             if not Config.SSL_CERT_PATH.exists():
-                logging.error(f"❌ Certificado SSL no encontrado: {Config.SSL_CERT_PATH}")
+                logger.error("❌ Certificado SSL no encontrado: %s", Config.SSL_CERT_PATH)
                 raise FileNotFoundError(f"Certificado SSL no encontrado: {Config.SSL_CERT_PATH}")
             
             if not Config.SSL_KEY_PATH.exists():
-                logging.error(f"❌ Clave privada SSL no encontrada: {Config.SSL_KEY_PATH}")
+                logger.error("❌ Clave privada SSL no encontrada: %s", Config.SSL_KEY_PATH)
                 raise FileNotFoundError(f"Clave privada SSL no encontrada: {Config.SSL_KEY_PATH}")
             
             context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
@@ -138,7 +220,7 @@ class ChatServer:
             return context
             
         except Exception as e:
-            logging.error(f"❌ Error configurando SSL: {e}")
+            logger.error("❌ Error configurando SSL: %s", e)
             raise
 
     def _descubrir_ip_local(self) -> str:
@@ -164,202 +246,855 @@ class ChatServer:
         try:
             if os.path.exists(private_key_path) and os.path.exists(public_key_path):
                 self.rsa_crypto.cargar_claves_desde_archivo(private_key_path, public_key_path)
-                logging.info(f"✅ Claves RSA cargadas desde {public_key_path}")
+                logger.info("✅ Claves RSA cargadas desde %s", public_key_path)
             else:
                 self.rsa_crypto.generar_par_claves(key_size=Config.RSA_KEY_SIZE)
                 self.rsa_crypto.guardar_claves(private_key_path, public_key_path)
-                logging.info(f"✅ Nuevas claves RSA generadas")
+                logger.info("✅ Nuevas claves RSA generadas")
         except Exception as e:
-            logging.error(f"❌ Error inicializando claves RSA: {e}")
+            logger.error("❌ Error inicializando claves RSA: %s", e)
             raise
 
-    def broadcast(self, message: str, sender: socket.socket | None = None) -> None:
-        """Envía un mensaje cifrado a todos los clientes excepto al remitente."""
+    def broadcast(self, message: str, sender: socket.socket | None = None, sala: str | None = None) -> None:
+        """Envía un mensaje cifrado a los miembros de `sala` (o a todos si es None),
+        excepto al remitente."""
         try:
-            with self.global_lock:
-                clients_copy = dict(self.clients)
-            
-            for client, (nickname, public_key_pem) in clients_copy.items():
-                if client is sender:
-                    continue
-                try:
-                    client_rsa = RSACrypto()
-                    client_rsa.cargar_clave_publica(public_key_pem)
-                    mensaje_cifrado = client_rsa.cifrar(message)
-                    client.send(f'{mensaje_cifrado}\n'.encode('utf-8'))
-                except Exception as e:
-                    logging.error(f"❌ Error enviando a {nickname}: {e}")
-                    self.desconectar_cliente(client)
+            # Las instantáneas son inmutables: se recorren sin lock ni copia
+            miembros = self.salas.miembros(sala) if sala is not None else self.registro.snapshot
+            self._enviar_cifrado([c for c in miembros if c.socket is not sender], message)
         except Exception as e:
-            logging.error(f"❌ Error en broadcast: {e}")
+            logger.error("❌ Error en broadcast: %s", e)
+
+    def enviar_a(self, sesion: ClientSession, message: str) -> None:
+        """Envía un mensaje cifrado a una sola sesión."""
+        self._enviar_cifrado([sesion], message)
+
+    def _enviar_cifrado(self, destinos: list[ClientSession], message: str) -> None:
+        """Cifra `message` para cada destino en un lote y lo envía."""
+        if not destinos:
+            return
+        
+        resultados = self.rsa_crypto.cifrar_para_muchos(
+            message,
+            [destino.clave_publica for destino in destinos],
+            max_workers=Config.CRYPTO_BATCH_WORKERS
+        )
+        
+        for destino, resultado in zip(destinos, resultados):
+            try:
+                if not resultado.ok:
+                    raise resultado.error
+                destino.enviar(f'{resultado.valor}\n'.encode('utf-8'))
+            except Exception as e:
+                logger.error("❌ Error enviando a %s: %s", destino.nickname, e)
+                self.desconectar_cliente(destino.socket)
+
+    def cambiar_sala(self, sesion: ClientSession, sala: str) -> None:
+        """Mueve la sesión a otra sala y avisa a ambas salas."""
+        try:
+            anterior = self.salas.unir(sesion, sala)
+        except ValueError as e:
+            self.enviar_a(sesion, f'⚠️ {e}')
+            return
+        if anterior == sala:
+            self.enviar_a(sesion, f'📢 Ya estás en #{sala}')
+            return
+        if anterior is not None:
+            self.broadcast(f'📢 {sesion.nickname} salió de #{anterior}', sala=anterior)
+        self.enviar_a(sesion, f'📢 Ahora estás en #{sala}')
+        self.programar_puesta_al_dia(sesion)
+        self.broadcast(f'📢 {sesion.nickname} se unió a #{sala}', sender=sesion.socket, sala=sala)
+
+    def procesar_comando(self, sesion: ClientSession, texto: str) -> None:
+        """Ejecuta un comando de chat (/join, /leave, /rooms, /msg, /history, /search, /help)."""
+        comando, _, argumento = texto.partition(' ')
+        argumento = argumento.strip()
+
+        if comando == '/join' and argumento:
+            self.cambiar_sala(sesion, argumento.lstrip('#'))
+        elif comando == '/leave':
+            self.cambiar_sala(sesion, self.salas.sala_por_defecto)
+        elif comando == '/rooms':
+            salas = ', '.join(f'#{nombre} ({total})' for nombre, total in self.salas.listar())
+            self.enviar_a(sesion, f'📋 Salas: {salas or "ninguna"}')
+        elif comando == '/msg' and ' ' in argumento:
+            destino_nick, texto_privado = argumento.split(' ', 1)
+            destino = self.registro.buscar(destino_nick)
+            mensaje_privado = f'✉️ {sesion.nickname} (privado): {texto_privado}'
+            if destino is not None:
+                self.enviar_a(destino, mensaje_privado)
+                return
+            with self._lock_almacen:
+                reenviado = self._reenviar({'tipo': 'privado', 'destino': destino_nick, 'texto': mensaje_privado})
+                buzon = self.spool.buzon_de(destino_nick) if self.spool is not None else None
+                if buzon is not None:
+                    self.spool.encolar(buzon, mensaje_privado)
+            if reenviado:
+                self.enviar_a(sesion, f'📨 Mensaje para {destino_nick} reenviado al servidor nuevo')
+            elif buzon is not None:
+                self.enviar_a(sesion, f'📥 {destino_nick} no está conectado; se le entregará al volver')
+            else:
+                self.enviar_a(sesion, f'⚠️ {destino_nick} no está conectado')
+        elif comando == '/search' and argumento:
+            self.enviar_busqueda(sesion, argumento)
+        elif comando == '/history' and (not argumento or argumento.isdigit()):
+            self.enviar_historial(sesion, min(int(argumento or 20), 200))
+        else:
+            self.enviar_a(sesion, '📋 Comandos: /join <sala>, /leave, /rooms, /msg <nick> <texto>, /history [n], /search <texto>')
+
+    def _cifrar_lote_para(self, sesion: ClientSession, mensajes: list[str]) -> list[bytes]:
+        """Cifra varios mensajes para una sesión y devuelve sus líneas.
+        
+        Los mensajes que no caben en un bloque RSA se dividen en varios, y si
+        alguno aun así no se puede cifrar se añade un aviso en lugar de
+        omitirlo sin más.
+        """
+        max_bytes = max_bytes_mensaje(sesion.clave_publica)
+        trozos = [trozo for mensaje in mensajes for trozo in fragmentar_mensaje(mensaje, max_bytes)]
+        resultados = self.rsa_crypto.cifrar_lote(
+            trozos, sesion.clave_publica, max_workers=Config.CRYPTO_BATCH_WORKERS
+        )
+        lineas = [f'{resultado.valor}\n'.encode('utf-8') for resultado in resultados if resultado.ok]
+        fallidos = len(resultados) - len(lineas)
+        if fallidos:
+            logger.warning("⚠️  %d mensajes no se pudieron cifrar para %s", fallidos, sesion.nickname)
+            aviso = self.rsa_crypto.cifrar_lote(
+                [f'⚠️ {fallidos} mensajes no se pudieron enviar'], sesion.clave_publica
+            )[0]
+            if aviso.ok:
+                lineas.append(f'{aviso.valor}\n'.encode('utf-8'))
+        return lineas
+
+    def enviar_lote_a(self, sesion: ClientSession, mensajes: list[str]) -> None:
+        """Cifra varios mensajes para una sesión y los envía en una sola escritura.
+        
+        Los clientes de protocolo 1 no delimitan mensajes, así que reciben un
+        envío por mensaje.
+        """
+        if not mensajes:
+            return
+        lineas = self._cifrar_lote_para(sesion, mensajes)
+        try:
+            if sesion.version_protocolo >= 2:
+                sesion.enviar(b''.join(lineas), len(lineas))
+            else:
+                for linea in lineas:
+                    sesion.enviar(linea)
+        except Exception as e:
+            logger.error("❌ Error enviando a %s: %s", sesion.nickname, e)
+            self.desconectar_cliente(sesion.socket)
+
+    def _mensajes_historial(
+        self,
+        sala: str,
+        cantidad: int,
+        minutos: float = 0,
+        hasta_offset: int | None = None
+    ) -> list[str]:
+        """Líneas del historial reciente de `sala` (vacía si no hay mensajes).
+        
+        Args:
+            sala: Sala cuyo historial se lee
+            cantidad: Máximo de mensajes (0 = sin límite, requiere `minutos`)
+            minutos: Si es > 0, solo mensajes de los últimos `minutos`
+            hasta_offset: Offset del log en el momento de entrar a la sala; los
+                mensajes posteriores ya le llegan por la difusión en vivo
+        """
+        # Referencia local: en un relevo el atributo pasa a None en otro hilo
+        historial = self.historial
+        if historial is None:
+            return []
+        if minutos > 0:
+            desde = historial.offset_desde_tiempo(time.time() - minutos * 60)
+            registros = historial.leer(desde, sala=sala, hasta_offset=hasta_offset)
+            if cantidad > 0:
+                registros = registros[-cantidad:]
+        else:
+            registros = historial.ultimos(cantidad, sala=sala, hasta_offset=hasta_offset)
+        if not registros:
+            return []
+        mensajes = [f'📜 Últimos {len(registros)} mensajes de #{sala}:']
+        for registro in registros:
+            hora = time.strftime('%H:%M', time.localtime(registro.timestamp))
+            mensajes.append(f'📜 [{hora}] {registro.nickname}: {registro.texto}')
+        return mensajes
+
+    def _mensajes_ausencia(self, ausencia: Ausencia, hasta_offset: int | None) -> list[str]:
+        """Privados del buzón y mensajes de su última sala desde que se fue, en orden."""
+        perdidos = list(ausencia.privados)
+        historial = self.historial
+        if ausencia.sala is not None and ausencia.offset is not None and historial is not None:
+            limite = time.time() - Config.SPOOL_TTL
+            for registro in historial.ultimos(Config.SPOOL_MAX_MESSAGES, sala=ausencia.sala,
+                                              hasta_offset=hasta_offset):
+                if registro.offset >= ausencia.offset and registro.timestamp >= limite:
+                    perdidos.append((
+                        registro.timestamp,
+                        f'#{registro.sala} 👤 {registro.nickname}: {registro.texto}'
+                    ))
+        if not perdidos:
+            return []
+        perdidos.sort(key=lambda p: p[0])
+        return ([f'📥 Mensajes recibidos mientras estabas desconectado ({len(perdidos)}):']
+                + [texto for _, texto in perdidos])
+
+    def enviar_historial(self, sesion: ClientSession, cantidad: int) -> None:
+        """Envía a la sesión los últimos `cantidad` mensajes de su sala (/history)."""
+        if self.historial is None:
+            self.enviar_a(sesion, '⚠️ El historial está deshabilitado')
+            return
+        mensajes = self._mensajes_historial(sesion.sala, cantidad)
+        if not mensajes:
+            self.enviar_a(sesion, f'📜 Sin historial en #{sesion.sala}')
+            return
+        self.enviar_lote_a(sesion, mensajes)
+
+    def enviar_busqueda(self, sesion: ClientSession, argumento: str) -> None:
+        """Busca en el historial de la sala actual.
+        
+        Solo en la sala en la que está la sesión: como cualquiera con la
+        contraseña puede conectarse, buscar en otra sala sin estar en ella
+        expondría su historial.
+        """
+        buscador = self.buscador
+        if buscador is None:
+            self.enviar_a(sesion, '⚠️ La búsqueda está deshabilitada')
+            return
+        sala = sesion.sala
+        if argumento.startswith('#'):
+            otra, _, argumento = argumento[1:].partition(' ')
+            if otra != sala:
+                self.enviar_a(sesion, f'⚠️ Solo puedes buscar en tu sala actual (#{sala}); usa /join #{otra}')
+                return
+        resultados = buscador.buscar(argumento, sala=sala, limite=Config.SEARCH_MAX_RESULTS)
+        if not resultados:
+            self.enviar_a(sesion, f'🔎 Sin resultados en #{sala}')
+            return
+        mensajes = [f'🔎 {len(resultados)} resultados en #{sala}:']
+        for resultado in reversed(resultados):
+            fecha = time.strftime('%d/%m %H:%M', time.localtime(resultado.timestamp))
+            mensajes.append(f'🔎 [{fecha}] {resultado.nickname}: {resultado.texto}')
+        self.enviar_lote_a(sesion, mensajes)
+
+    def _reindexar_historial(self) -> None:
+        """Indexa los mensajes del historial que aún no están en el índice."""
+        historial, buscador = self.historial, self.buscador
+        if historial is None or buscador is None:
+            return
+        desde = max(buscador.ultimo_offset + 1, historial.primer_offset)
+        hasta = historial.siguiente_offset
+        total = 0
+        while desde < hasta:
+            registros = historial.leer(desde, limite=10000, hasta_offset=hasta)
+            if not registros:
+                break
+            for registro in registros:
+                buscador.agregar(*registro)
+            total += len(registros)
+            desde = registros[-1].offset + 1
+        if total:
+            logger.info("🔎 %d mensajes del historial añadidos al índice de búsqueda", total)
+
+    def programar_puesta_al_dia(self, sesion: ClientSession, ausencia: Ausencia | None = None) -> None:
+        """Encola la puesta al día de una sesión que acaba de entrar en una sala.
+        
+        Si vuelve de una `ausencia` se entregan los privados de su buzón y lo
+        que se dijo en su última sala desde que se fue (leído del historial);
+        si no hay nada de eso, se envía el historial reciente de la sala.
+        Mientras se prepara, la difusión en vivo hacia la sesión queda retenida
+        para que nunca llegue antes que el historial.
+        """
+        sala = sesion.sala
+        historial = self.historial
+        hasta_offset = historial.siguiente_offset if historial is not None else None
+        repetir = historial is not None and bool(Config.HISTORY_REPLAY_COUNT or Config.HISTORY_REPLAY_MINUTES)
+        if ausencia is None and not repetir:
+            return
+
+        def preparar() -> list[str]:
+            mensajes = self._mensajes_ausencia(ausencia, hasta_offset) if ausencia is not None else []
+            if not mensajes and repetir:
+                mensajes = self._mensajes_historial(
+                    sala, Config.HISTORY_REPLAY_COUNT, Config.HISTORY_REPLAY_MINUTES, hasta_offset
+                )
+            return mensajes
+
+        sesion.retener()
+        try:
+            futuro = self.pool_historial.submit(self._puesta_al_dia, sesion, preparar)
+        except RuntimeError:
+            # Pool cerrado (apagado o relevo): no dejar la sesión retenida
+            sesion.liberar([])
+            return
+        futuro.add_done_callback(self._registrar_error_puesta_al_dia)
+
+    @staticmethod
+    def _registrar_error_puesta_al_dia(futuro) -> None:
+        if not futuro.cancelled() and futuro.exception() is not None:
+            logger.error("❌ Error en la puesta al día: %s", futuro.exception())
+
+    def _puesta_al_dia(self, sesion: ClientSession, preparar) -> None:
+        """Prepara y cifra la puesta al día y la envía por delante de lo retenido."""
+        lineas: list[bytes] = []
+        try:
+            mensajes = preparar()
+            if mensajes:
+                lineas = self._cifrar_lote_para(sesion, mensajes)
+        finally:
+            try:
+                sesion.liberar(lineas)
+            except OSError as e:
+                logger.error("❌ Error enviando a %s: %s", sesion.nickname, e)
+                self.desconectar_cliente(sesion.socket)
+
+    def _abrir_buzon(self, sesion: ClientSession, cifrado: str | None, parser: MessageParser,
+                     ip: str) -> str | None:
+        """Asocia a la sesión el buzón del token que envía cifrado en el saludo.
+        
+        El cliente envía `inbox=<token cifrado>`, o `inbox=<"new" cifrado>` si aún
+        no tiene. Si el token no es válido se genera uno nuevo.
+        
+        Returns:
+            El token nuevo que hay que entregar al cliente, o None
+        """
+        if self.spool is None or not cifrado or not parser.es_cifrado_valido(cifrado):
+            return None
+        if not self.limitador_descifrado.permitir(ip):
+            return None
+        try:
+            token = self.rsa_crypto.descifrar(cifrado)
+        except Exception:
+            logger.warning("⚠️  Token de buzón ilegible de %s", sesion.nickname)
+            return None
+        token_nuevo = None
+        if not OfflineSpool.es_token_valido(token):
+            token = token_nuevo = OfflineSpool.nuevo_token()
+        sesion.buzon = OfflineSpool.buzon(token)
+        return token_nuevo
+
+    def _enviar_token_buzon(self, sesion: ClientSession, token: str) -> None:
+        """Entrega al cliente (cifrado con su clave) el token de su buzón nuevo."""
+        resultado = self.rsa_crypto.cifrar_para_muchos(token, [sesion.clave_publica])[0]
+        if resultado.ok:
+            sesion.enviar(f'INBOX {resultado.valor}\n'.encode('utf-8'), retenible=False)
+        else:
+            logger.error("❌ No se pudo cifrar el token de buzón de %s: %s", sesion.nickname, resultado.error)
+            sesion.buzon = None
+
+    def _recibir_handshake(self, client: socket.socket, limite: float) -> str:
+        """Lee una respuesta del handshake respetando el plazo global `limite`."""
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise TimeoutError("Tiempo de handshake agotado")
+        client.settimeout(restante)
+        return client.recv(self.buffer_size).decode('utf-8').strip()
 
     def manejar_cliente(self, client: socket.socket, address: tuple[str, int]) -> None:
-        """Gestiona la sesión de un cliente."""
+        """Gestiona la sesión de un cliente.
+        
+        Se invoca con un hueco de `slots_sin_autenticar` ya reservado, que se
+        libera al autenticarse o al terminar la conexión.
+        """
         nickname: str | None = None
+        ip = address[0]
+        autenticado = False
+        limite = time.monotonic() + Config.HANDSHAKE_TIMEOUT
         try:
+            # 0. Handshake TLS (fuera del hilo de aceptación y con plazo)
+            if self.enable_ssl and self.ssl_context:
+                client.settimeout(Config.HANDSHAKE_TIMEOUT)
+                try:
+                    client = self.ssl_context.wrap_socket(client, server_side=True)
+                    logger.debug("🔐 Conexión SSL con %s", address)
+                except (ssl.SSLError, OSError) as e:
+                    logger.warning("⚠️  Error SSL con %s: %s", address, e)
+                    client.close()
+                    return
+            
+            sesion = ClientSession(client, address)
+            
             # 1. Notificar que estamos listos para intercambiar claves
             client.send(b'PUBLIC_KEY_READY\n')
             
             # 2. Solicitar clave pública del cliente
             client.send(b'CLIENT_PUBLIC_KEY\n')
             
-            # 3. Recibir clave pública del cliente (PEM completo en Base64)
-            client_public_key_b64 = client.recv(self.buffer_size).decode('utf-8').strip()
+            # 3. Recibir clave pública del cliente (PEM completo en Base64),
+            #    precedida del saludo HELLO en clientes con protocolo 2+
+            linea_saludo = self._recibir_handshake(client, limite)
+            try:
+                saludo = parsear_saludo(linea_saludo)
+                parser = MessageParser(saludo.formato, self.rsa_crypto.private_key.key_size, self.integridad)
+            except ProtocolError as e:
+                logger.warning("⚠️  Protocolo rechazado para %s: %s", address, e)
+                client.send(b'AUTH_FAILED\n')
+                client.close()
+                return
             
             # Decodificar: el cliente envía el PEM completo (con headers) en Base64
             import base64
             try:
-                client_public_key_pem = base64.b64decode(client_public_key_b64)
-                logging.debug(f"✅ Clave pública recibida ({len(client_public_key_pem)} bytes)")
-                logging.debug(f"📄 PEM: {client_public_key_pem[:50]}...")
+                client_public_key_pem = base64.b64decode(saludo.clave_publica_b64)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("✅ Clave pública recibida (%s bytes)", len(client_public_key_pem))
+                    logger.debug("📄 PEM: %s...", client_public_key_pem[:50])
+                sesion.clave_publica = serialization.load_pem_public_key(client_public_key_pem)
             except Exception as e:
-                logging.error(f"❌ Error decodificando clave pública Base64: {e}")
+                logger.error("❌ Error decodificando clave pública del cliente: %s", e)
                 client.send(b'AUTH_FAILED\n')
                 client.close()
                 return
             
+            sesion.version_protocolo = saludo.version
+            if saludo.version >= 2:
+                client.send(respuesta_protocolo(saludo, self.integridad))
+            
             # 4. Solicitar nickname
             client.send(b'NICK\n')
-            nickname_cifrado = client.recv(self.buffer_size).decode('utf-8').strip()
-            nickname = self.rsa_crypto.descifrar(nickname_cifrado)
-            logging.debug(f"✅ Nickname descifrado: {nickname}")
+            nickname_cifrado = self._recibir_handshake(client, limite)
+            if not parser.es_cifrado_valido(nickname_cifrado) or not self.limitador_descifrado.permitir(ip):
+                client.send(b'AUTH_FAILED\n')
+                client.close()
+                return
+            nickname = sesion.nickname = self.rsa_crypto.descifrar(nickname_cifrado)
+            logger.debug("✅ Nickname descifrado: %s", nickname)
 
             # 5. Solicitar contraseña
             client.send(b'PASSWORD\n')
-            password_cifrado = client.recv(self.buffer_size).decode('utf-8').strip()
+            password_cifrado = self._recibir_handshake(client, limite)
+            if not parser.es_cifrado_valido(password_cifrado) or not self.limitador_descifrado.permitir(ip):
+                client.send(b'AUTH_FAILED\n')
+                logger.warning("⚠️  Autenticación fallida para %s", nickname)
+                client.close()
+                return
             recv_password = self.rsa_crypto.descifrar(password_cifrado)
 
             # 6. Verificar contraseña
             if recv_password != self.password:
                 client.send(b'AUTH_FAILED\n')
-                logging.warning(f"⚠️  Autenticación fallida para {nickname}")
+                logger.warning("⚠️  Autenticación fallida para %s", nickname)
                 client.close()
                 return
 
-            # 7. Verificar capacidad del servidor
-            with self.global_lock:
-                if len(self.clients) >= self.max_clients:
-                    client.send(b'SERVIDOR_LLENO\n')
-                    client.close()
-                    return
-                self.clients[client] = (nickname, client_public_key_pem)
+            # 7. Abrir el buzón de correo offline si el cliente lo pide en el saludo
+            token_nuevo = self._abrir_buzon(sesion, saludo.opciones.get('inbox'), parser, ip)
+
+            # 8. Verificar capacidad del servidor
+            if not self.registro.registrar(sesion):
+                client.send(b'SERVIDOR_LLENO\n')
+                client.close()
+                return
 
-            # 8. Confirmar autenticación exitosa
+            # 9. Confirmar autenticación exitosa
+            autenticado = True
+            sesion.autenticado_en = time.time()
+            self.slots_sin_autenticar.release()
+            client.settimeout(None)
             client.send(b'AUTH_SUCCESS\n')
-            logging.info(f"👤 {nickname} se conectó desde {address}")
-            self.broadcast(f'📢 {nickname} se unió al chat!', sender=None)
+            if token_nuevo is not None:
+                self._enviar_token_buzon(sesion, token_nuevo)
+            logger.info("👤 %s se conectó desde %s", nickname, address)
+            sala_inicial = saludo.opciones.get('room', self.salas.sala_por_defecto)
+            if not es_nombre_sala_valido(sala_inicial):
+                sala_inicial = self.salas.sala_por_defecto
+            try:
+                self.salas.unir(sesion, sala_inicial)
+            except ValueError as e:
+                # Con el límite de salas alcanzado, entrar en la sala por defecto
+                # en lugar de cortar una conexión ya autenticada
+                self.enviar_a(sesion, f'⚠️ {e}; entrando en #{self.salas.sala_por_defecto}')
+                sala_inicial = self.salas.sala_por_defecto
+                self.salas.unir(sesion, sala_inicial)
+            self.enviar_a(sesion, f'📢 Ahora estás en #{sala_inicial}')
+            ausencia = None
+            if sesion.buzon is not None:
+                with self._lock_almacen:
+                    if self.spool is not None:
+                        ausencia = self.spool.reclamar(nickname, sesion.buzon)
+                if ausencia is None:
+                    sesion.buzon = None
+                    self.enviar_a(sesion, f'⚠️ {nickname} pertenece a otro buzón: '
+                                          'no se te guardarán mensajes al desconectarte')
+            self.programar_puesta_al_dia(sesion, ausencia)
+            self.broadcast(f'📢 {nickname} se unió al chat!', sender=client, sala=sala_inicial)
 
-            # 9. Loop principal de mensajes
+            # 10. Loop principal de mensajes
+            #    Protocolo 2+: una línea por mensaje; las ráfagas se descifran por lotes.
+            #    Protocolo 1: cada lectura es un mensaje (los clientes antiguos no delimitan).
+            pendiente = ''
+            cubo_mensajes = TokenBucket(Config.RATE_MESSAGES_PER_CLIENT, Config.RATE_MESSAGES_BURST)
             while True:
                 data = client.recv(self.buffer_size)
                 if not data:
                     break
 
-                raw = data.decode('utf-8').strip()
-                mensaje_descifrado = None
-                
-                # Intentar parsear formato: cipher|hash|md5
-                if '|' in raw:
-                    parts = raw.split('|')
-                    if len(parts) == 3:
-                        cipher, recv_hash, recv_md5 = parts
-                        
-                        try:
-                            mensaje_descifrado = self.rsa_crypto.descifrar(cipher)
-                            
-                            # Verificar integridad
-                            import hashlib
-                            calc_hash = hashlib.sha256(mensaje_descifrado.encode('utf-8')).hexdigest()
-                            calc_md5 = hashlib.md5(mensaje_descifrado.encode('utf-8')).hexdigest()
-                            
-                            if recv_hash != calc_hash or recv_md5 != calc_md5:
-                                logging.warning(f"⚠️  Hash inválido de {nickname}")
-                                continue
-                            
-                            logging.debug(f"✅ Mensaje verificado (MD5: {recv_md5[:8]}...)")
-                            
-                        except Exception as e:
-                            logging.warning(f"❌ Error descifrando de {nickname}: {e}")
-                            continue
-                    else:
-                        # Formato incorrecto, intentar descifrar directamente
-                        try:
-                            mensaje_descifrado = self.rsa_crypto.descifrar(raw)
-                        except Exception as e:
-                            logging.warning(f"❌ No se pudo descifrar de {nickname}: {e}")
-                            continue
+                if saludo.version >= 2:
+                    pendiente += data.decode('utf-8')
+                    *lineas, pendiente = pendiente.split('\n')
+                    if len(pendiente) > self.buffer_size:
+                        logger.warning("⚠️  Línea demasiado larga de %s", nickname)
+                        break
                 else:
-                    # Sin pipes, intentar descifrar directamente (retrocompatibilidad)
-                    try:
-                        # Intentar JSON (formato antiguo)
-                        parsed = json.loads(raw)
-                        if isinstance(parsed, dict) and 'cipher' in parsed:
-                            cipher = parsed['cipher']
-                            mensaje_descifrado = self.rsa_crypto.descifrar(cipher)
+                    lineas = [data.decode('utf-8')]
+
+                entradas = []
+                for linea in lineas:
+                    linea = linea.strip()
+                    if not linea:
+                        continue
+                    entrada = parser.parsear(linea)
+                    if entrada is None:
+                        logger.warning("⚠️  Mensaje con formato inválido de %s", nickname)
+                        continue
+                    if not cubo_mensajes.consumir() or not self.limitador_descifrado.permitir(ip):
+                        logger.warning("⚠️  Límite de mensajes excedido por %s", nickname)
+                        continue
+                    entradas.append(entrada)
+
+                sesion.registrar_recepcion(len(data), len(entradas))
+                if not entradas:
+                    continue
+
+                resultados = self.rsa_crypto.descifrar_lote(
+                    [cipher for cipher, _ in entradas],
+                    max_workers=Config.CRYPTO_BATCH_WORKERS
+                )
+
+                for (_, etiqueta), resultado in zip(entradas, resultados):
+                    if not resultado.ok:
+                        logger.warning("❌ No se pudo descifrar de %s: %s", nickname, resultado.error)
+                        continue
+
+                    mensaje_descifrado = resultado.valor
+                    # Sin etiqueta solo se acepta en los modos sin clave
+                    if not self.integridad.verificar(mensaje_descifrado, etiqueta):
+                        if etiqueta is None:
+                            logger.warning("⚠️  Mensaje sin etiqueta de integridad de %s", nickname)
                         else:
-                            mensaje_descifrado = self.rsa_crypto.descifrar(raw)
-                    except json.JSONDecodeError:
-                        try:
-                            mensaje_descifrado = self.rsa_crypto.descifrar(raw)
-                        except Exception as e:
-                            logging.warning(f"❌ No se pudo descifrar de {nickname}: {e}")
-                            continue
-
-                if mensaje_descifrado:
-                    logging.info(f"💬 {nickname}: {mensaje_descifrado}")
-                    self.broadcast(f'👤 {nickname}: {mensaje_descifrado}', sender=client)
+                            logger.warning("⚠️  Etiqueta de integridad inválida de %s", nickname)
+                        continue
+                    if etiqueta is not None and logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("✅ Mensaje verificado (%s: %s...)", self.integridad.modo, etiqueta[:8])
+
+                    if mensaje_descifrado.startswith('/'):
+                        self.procesar_comando(sesion, mensaje_descifrado)
+                    elif mensaje_descifrado:
+                        logger.debug("💬 %s en #%s: %s", nickname, sesion.sala, mensaje_descifrado)
+                        self.guardar_mensaje(sesion.sala, nickname, mensaje_descifrado, time.time())
+                        self.broadcast(f'👤 {nickname}: {mensaje_descifrado}', sender=client, sala=sesion.sala)
 
         except Exception as e:
-            logging.error(f"❌ Error con {nickname or 'Cliente desconocido'}: {e}")
-            logging.debug(traceback.format_exc())
+            logger.error("❌ Error con %s: %s", nickname or 'Cliente desconocido', e)
+            logger.debug("Traza del error", exc_info=True)
         finally:
+            if not autenticado:
+                self.slots_sin_autenticar.release()
             self.desconectar_cliente(client)
+            try:
+                client.close()
+            except Exception:
+                pass
 
     def desconectar_cliente(self, client: socket.socket) -> None:
         """Desconecta un cliente y notifica al resto."""
-        with self.global_lock:
-            if client in self.clients:
-                nickname, _ = self.clients.pop(client)
-                try:
-                    client.close()
-                except Exception:
-                    pass
-                logging.info(f"🚪 {nickname} se desconectó")
-                self.broadcast(f'📢 {nickname} abandonó el chat', sender=None)
+        sesion = self.registro.eliminar(client)
+        if sesion is None:
+            return
+        try:
+            client.close()
+        except Exception:
+            pass
+        sala = self.salas.salir(sesion)
+        logger.info("🚪 %s se desconectó", sesion.nickname)
+        if sesion.buzon is not None:
+            # Solo la posición en el historial: lo perdido se lee de él al volver
+            with self._lock_almacen:
+                if self.spool is not None:
+                    offset = self.historial.siguiente_offset if self.historial is not None else None
+                    self.spool.marcar_desconectado(sesion.buzon, sala, offset)
+        # Fuera de cualquier lock: el aviso no serializa otras altas/bajas
+        if sala is not None and not self.relevado:
+            self.broadcast(f'📢 {sesion.nickname} abandonó el chat', sala=sala)
 
     def iniciar(self) -> None:
         """Inicia el bucle de aceptación de conexiones."""
         try:
             display_host = self.local_ip if self.host == '0.0.0.0' else self.host
             protocol = "TLS" if self.enable_ssl else "TCP"
-            logging.info(f"✅ Esperando conexiones {protocol} en {display_host}:{self.port}")
+            logger.info("✅ Esperando conexiones %s en %s:%s", protocol, display_host, self.port)
+            if self.admin is not None and hasattr(socket, 'AF_UNIX'):
+                self.admin.iniciar()
+            if Config.HANDOFF_SOCKET and hasattr(socket, 'send_fds'):
+                servir_relevo(Config.HANDOFF_SOCKET, self._ceder_socket, self._abrir_reenvio)
+            if self.canal_relevo is not None:
+                threading.Thread(target=self._recibir_relevo, name="HandoffForward", daemon=True).start()
             
-            while True:
+            # select con timeout en lugar de accept bloqueante (o un socket no
+            # bloqueante, cuyo modo se compartiría con el proceso que lo herede)
+            while self.aceptando:
+                listos, _, _ = select.select([self.server], [], [], 0.5)
+                if not listos or not self.aceptando:
+                    continue
                 client, address = self.server.accept()
                 
-                # Envolver con SSL si está habilitado
-                if self.enable_ssl and self.ssl_context:
-                    try:
-                        client = self.ssl_context.wrap_socket(client, server_side=True)
-                        logging.debug(f"🔐 Conexión SSL con {address}")
-                    except ssl.SSLError as e:
-                        logging.warning(f"⚠️  Error SSL con {address}: {e}")
-                        try:
-                            client.close()
-                        except:
-                            pass
-                        continue
+                # Rechazar antes de gastar CPU: tasa de conexiones por IP y
+                # conexiones simultáneas sin autenticar
+                if not self.limitador_conexiones.permitir(address[0]):
+                    logger.warning("⚠️  Demasiadas conexiones desde %s", address[0])
+                    client.close()
+                    continue
+                if not self.slots_sin_autenticar.acquire(blocking=False):
+                    logger.warning("⚠️  Límite de conexiones sin autenticar alcanzado; rechazando %s", address)
+                    client.close()
+                    continue
                 
                 self.thread_pool.submit(self.manejar_cliente, client, address)
+            
+            self._fin_aceptacion.set()
+            if self.relevado:
+                self._drenar()
         except KeyboardInterrupt:
-            logging.info("🛑 Servidor detenido")
+            logger.info("🛑 Servidor detenido")
         finally:
+            self._fin_aceptacion.set()
+            if self.admin is not None:
+                self.admin.cerrar()
             self.thread_pool.shutdown(wait=True)
+            self.pool_historial.shutdown(wait=False, cancel_futures=True)
             self.server.close()
+            with self._lock_almacen:
+                historial, buscador = self.historial, self.buscador
+                self.historial = self.buscador = self.spool = None
+            if buscador is not None:
+                buscador.cerrar()
+            if historial is not None:
+                historial.cerrar()
+
+
+    def _comandos_admin(self) -> dict:
+        """Comandos del socket de administración.
+        
+        Solo leen instantáneas inmutables del registro y las salas, así que no
+        toman locks del camino de los mensajes.
+        """
+        def sesiones(args: list[str]) -> list[dict]:
+            return [sesion.como_dict() for sesion in self.registro.snapshot]
+
+        def estado(args: list[str]) -> dict:
+            historial = self.historial
+            snapshot = self.registro.snapshot
+            retenido = [sesion.retenido() for sesion in snapshot]
+            return {
+                'pid': os.getpid(),
+                'clientes': len(self.registro),
+                'capacidad': self.max_clients,
+                'salas': dict(self.salas.listar()),
+                'hilos': threading.active_count(),
+                # Cada puesta al día retiene su sesión desde que se encola hasta que se envía
+                'puesta_al_dia_pendiente': sum(1 for sesion in snapshot if sesion.retenciones > 0),
+                'retenidos_mensajes': sum(mensajes for mensajes, _ in retenido),
+                'retenidos_bytes': sum(num_bytes for _, num_bytes in retenido),
+                'historial_offset': historial.siguiente_offset if historial is not None else None,
+            }
+
+        def expulsar(args: list[str]) -> str:
+            if not args:
+                raise ValueError('Uso: kick <nick> [motivo]')
+            sesion = self.registro.buscar(args[0])
+            if sesion is None:
+                raise LookupError(f'{args[0]} no está conectado')
+            motivo = ' '.join(args[1:]) or 'sin motivo'
+            # Un cliente atascado no puede bloquear el hilo de administración:
+            # el aviso es de mejor esfuerzo y el cierre corta cualquier envío en curso
+            aviso = self.rsa_crypto.cifrar_para_muchos(
+                f'⛔ Expulsado por el administrador: {motivo}', [sesion.clave_publica]
+            )[0]
+            if aviso.ok:
+                sesion.enviar_sin_bloquear(f'{aviso.valor}\n'.encode('utf-8'))
+            logger.warning("⛔ %s expulsado por el administrador (%s)", sesion.nickname, motivo)
+            try:
+                sesion.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.desconectar_cliente(sesion.socket)
+            return f'{sesion.nickname} expulsado'
+
+        def nivel_log(args: list[str]) -> str:
+            if len(args) == 1:
+                args = ['root', args[0]]
+            if len(args) != 2:
+                raise ValueError('Uso: loglevel [logger] <nivel>')
+            establecer_nivel(args[0], args[1])
+            return f'{args[0]} -> {args[1].upper()}'
+
+        def perfil(args: list[str]) -> str:
+            duracion = float(args[0]) if args else Config.PROFILE_SECONDS
+            formato = args[1] if len(args) > 1 else Config.PROFILE_FORMAT
+            try:
+                self.perfilar(duracion, formato)
+            except RuntimeError as e:
+                raise ValueError(str(e)) from e
+            return f'Perfil de {duracion:g} s en curso; se guardará en {Config.PROFILE_DIR}'
+
+        return {
+            'sessions': sesiones,
+            'stats': estado,
+            'kick': expulsar,
+            'loglevel': nivel_log,
+            'threads': lambda args: volcar_hilos(),
+            'stacks': lambda args: instantanea_pilas(),
+            'profile': perfil,
+        }
+
+    def perfilar(self, duracion: float | None = None, formato: str | None = None) -> None:
+        """Lanza una ventana de muestreo de todos los hilos del servidor.
+        
+        Raises:
+            RuntimeError: Si ya hay un perfil en curso
+        """
+        iniciar_perfil(
+            duracion or Config.PROFILE_SECONDS,
+            Config.PROFILE_DIR,
+            'server',
+            formato or Config.PROFILE_FORMAT,
+            Config.PROFILE_INTERVAL_MS / 1000
+        )
+
+    def _ceder_socket(self) -> socket.socket:
+        """Deja de aceptar conexiones y cede el socket de escucha y el almacenamiento.
+        
+        Desde aquí los mensajes de los clientes que aún no han reconectado se
+        reenvían al proceso nuevo (ver guardar_mensaje) en lugar de guardarse.
+        """
+        self.relevado = True
+        self.aceptando = False
+        if not self._fin_aceptacion.wait(timeout=5):
+            raise HandoffError("El bucle de aceptación no se detuvo")
+        # El proceso nuevo abre el historial, el índice y los buzones al recibir
+        # el socket; lo que llegue hasta tener el canal se acumula en la cola
+        with self._lock_almacen:
+            historial, buscador = self.historial, self.buscador
+            self.historial = self.buscador = self.spool = None
+            self._reenvio_cola = []
+        if buscador is not None:
+            buscador.cerrar()
+        if historial is not None:
+            historial.cerrar()
+        return self.server
+
+    def _abrir_reenvio(self, canal: socket.socket) -> None:
+        """Empieza a reenviar por `canal` (conexión de control del relevo)."""
+        canal.settimeout(5)
+        with self._lock_almacen:
+            self._reenvio = canal
+            cola, self._reenvio_cola = self._reenvio_cola or [], None
+            for registro in cola:
+                self._reenviar(registro)
+        self._socket_entregado.set()
+
+    def _reenviar(self, registro: dict) -> bool:
+        """Pasa `registro` al proceso nuevo si el almacenamiento ya se cedió.
+        
+        Requiere tener `_lock_almacen`. Devuelve False fuera de un relevo.
+        """
+        if self._reenvio_cola is not None:
+            self._reenvio_cola.append(registro)
+            return True
+        if self._reenvio is None:
+            return False
+        try:
+            reenviar(self._reenvio, registro)
+        except OSError as e:
+            logger.error("❌ Canal de reenvío al proceso nuevo cerrado: %s", e)
+            self._reenvio.close()
+            self._reenvio = None
+            return False
+        return True
+
+    def guardar_mensaje(self, sala: str, nickname: str, texto: str, timestamp: float) -> None:
+        """Guarda un mensaje de sala en el historial y el índice de búsqueda.
+        
+        Tras ceder el almacenamiento en un relevo, lo reenvía al proceso nuevo.
+        """
+        with self._lock_almacen:
+            if self.historial is not None:
+                offset = self.historial.anexar(sala, nickname, texto, timestamp)
+                if self.buscador is not None:
+                    self.buscador.agregar(offset, timestamp, sala, nickname, texto)
+            else:
+                self._reenviar({'tipo': 'sala', 'sala': sala, 'nick': nickname, 'texto': texto, 'ts': timestamp})
+
+    def _recibir_relevo(self) -> None:
+        """Guarda y difunde lo que reenvía el proceso anterior mientras se vacía."""
+        total = 0
+        with self.canal_relevo:
+            for registro in recibir_reenvios(self.canal_relevo):
+                try:
+                    if registro.get('tipo') == 'sala':
+                        sala, nickname, texto = registro['sala'], registro['nick'], registro['texto']
+                        self.guardar_mensaje(sala, nickname, texto, float(registro['ts']))
+                        self.broadcast(f'👤 {nickname}: {texto}', sala=sala)
+                    elif registro.get('tipo') == 'privado':
+                        self._entregar_privado_reenviado(registro['destino'], registro['texto'])
+                    else:
+                        continue
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.warning("⚠️  Registro de reenvío inválido: %s", e)
+                    continue
+                total += 1
+        self.canal_relevo = None
+        logger.info("🔁 Proceso anterior vaciado; %d mensajes reenviados", total)
+
+    def _entregar_privado_reenviado(self, destino_nick: str, mensaje_privado: str) -> None:
+        """Entrega un /msg reenviado por el proceso anterior (o lo guarda en su buzón)."""
+        destino = self.registro.buscar(destino_nick)
+        if destino is not None:
+            self.enviar_a(destino, mensaje_privado)
+            return
+        with self._lock_almacen:
+            buzon = self.spool.buzon_de(destino_nick) if self.spool is not None else None
+            if buzon is not None:
+                self.spool.encolar(buzon, mensaje_privado)
+                return
+        logger.info("📭 Mensaje privado reenviado para %s descartado: no está conectado", destino_nick)
+
+    def _drenar(self) -> None:
+        """Vacía los envíos pendientes y pide a los clientes que reconecten.
+        
+        Cada cliente recibe `RECONNECT <ms>` con una espera aleatoria para que
+        no vuelvan todos a la vez al nuevo proceso.
+        """
+        # Las conexiones nuevas esperan en la cola del kernel hasta que el otro
+        # proceso tenga el socket
+        self._socket_entregado.wait(timeout=5)
+        sesiones = self.registro.snapshot
+        logger.info("🔁 Relevo completado; avisando a %d clientes para que reconecten", len(sesiones))
+        for sesion in sesiones:
+            espera_ms = random.randint(0, Config.HANDOFF_JITTER_MS)
+            try:
+                sesion.enviar(f'RECONNECT {espera_ms}\n'.encode('utf-8'), num_mensajes=0, retenible=False)
+            except OSError:
+                pass
+        
+        limite = time.monotonic() + Config.HANDOFF_DRAIN_TIMEOUT
+        while len(self.registro) and time.monotonic() < limite:
+            time.sleep(0.1)
+        for sesion in self.registro.snapshot:
+            try:
+                sesion.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        # Cerrar el canal indica al proceso nuevo que ya no llegará nada más
+        with self._lock_almacen:
+            if self._reenvio is not None:
+                self._reenvio.close()
+                self._reenvio = None
 
 
 def main() -> None:
     """Punto de entrada para iniciar el servidor de chat."""
+    configurar_logging()
+    
     if '--show-config' in sys.argv:
         Config.display_config()
         return
@@ -372,6 +1107,8 @@ def main() -> None:
     parser.add_argument('--max-clients', type=int, help=f'Máximo de clientes (default: {Config.MAX_CLIENTS})')
     parser.add_argument('--enable-ssl', action='store_true', help='Habilitar SSL/TLS')
     parser.add_argument('--disable-ssl', action='store_true', help='Deshabilitar SSL/TLS')
+    parser.add_argument('--takeover', action='store_true',
+                        help='Reinicio sin cortes: heredar el socket del servidor en marcha')
     
     args = parser.parse_args()
     
@@ -381,13 +1118,33 @@ def main() -> None:
     elif args.disable_ssl:
         enable_ssl = False
     
+    socket_escucha = canal_relevo = None
+    if args.takeover:
+        try:
+            socket_escucha, canal_relevo = solicitar_relevo(Config.HANDOFF_SOCKET)
+        except HandoffError as e:
+            logger.error("❌ %s", e)
+            sys.exit(1)
+        logger.info("🔁 Socket de escucha heredado del proceso anterior")
+    
     server = ChatServer(
         host=args.host,
         port=args.port,
         password=args.password,
         max_clients=args.max_clients,
-        enable_ssl=enable_ssl
+        enable_ssl=enable_ssl,
+        socket_escucha=socket_escucha,
+        canal_relevo=canal_relevo
     )
+    
+    if hasattr(signal, 'SIGUSR2'):
+        def perfilar_por_senal(signum, frame) -> None:
+            try:
+                server.perfilar()
+            except RuntimeError as e:
+                logger.warning("⚠️  %s", e)
+        signal.signal(signal.SIGUSR2, perfilar_por_senal)
+    
     server.iniciar()
 
 
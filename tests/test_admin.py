@@ -0,0 +1,169 @@
+"""Pruebas de core/admin.py y de los comandos de administración del servidor."""
+import json
+import socket
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from core.admin import AdminServer
+from core.registry import ClientRegistry
+from core.rooms import RoomManager
+from core.session import ClientSession
+from crypto.rsa_crypto import RSACrypto
+from server.server import ChatServer
+
+
+def test_ejecutar():
+    admin = AdminServer('/no-usado', {
+        'eco': lambda args: args,
+        'falla': lambda args: {}['x'],
+        'rompe': lambda args: 1 / 0,
+    })
+    assert admin.ejecutar('ECO a b') == {'ok': True, 'resultado': ['a', 'b']}
+    assert admin.ejecutar('help')['resultado'] == ['eco', 'falla', 'help', 'rompe']
+    assert admin.ejecutar('  ') == {'ok': False, 'error': 'Comando vacío'}
+    assert admin.ejecutar('nada') == {'ok': False, 'error': 'Comando desconocido: nada'}
+    assert admin.ejecutar('falla') == {'ok': False, 'error': "'x'"}
+    assert admin.ejecutar('rompe')['error'].startswith('ZeroDivisionError')
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="requiere sockets Unix")
+def test_socket_unix(tmp_path):
+    admin = AdminServer(tmp_path / 'admin.sock', {'eco': lambda args: ' '.join(args)})
+    admin.iniciar()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conexion:
+            conexion.settimeout(5)
+            conexion.connect(str(tmp_path / 'admin.sock'))
+            with conexion.makefile('rwb') as canal:
+                canal.write(b'eco hola\n' + b'x' * 5000 + b'\n')
+                canal.flush()
+                assert json.loads(canal.readline()) == {'ok': True, 'resultado': 'hola'}
+                assert json.loads(canal.readline())['error'] == 'Comando demasiado largo'
+    finally:
+        admin.cerrar()
+
+
+class Servidor:
+    """ChatServer con solo lo que usan los comandos de administración."""
+
+    def __init__(self):
+        self.servidor = ChatServer.__new__(ChatServer)
+        self.servidor.__dict__.update(
+            registro=ClientRegistry(10), salas=RoomManager('general'), max_clients=10,
+            historial=None, spool=None, relevado=False, rsa_crypto=RSACrypto(),
+            _lock_almacen=threading.Lock(),
+        )
+        self.comandos = self.servidor._comandos_admin()
+        self.sockets = []
+
+    def conectar(self, nickname):
+        local, remoto = socket.socketpair()
+        self.sockets += [local, remoto]
+        clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        sesion = ClientSession(local, ('127.0.0.1', len(self.sockets)))
+        sesion.nickname = nickname
+        sesion.clave_publica = clave.public_key()
+        self.servidor.registro.registrar(sesion)
+        self.servidor.salas.unir(sesion, 'general')
+        return sesion, remoto, clave
+
+    def cerrar(self):
+        for sock in self.sockets:
+            sock.close()
+
+
+@pytest.fixture
+def servidor():
+    servidor = Servidor()
+    yield servidor
+    servidor.cerrar()
+
+
+def test_sesiones_y_estado(servidor):
+    ana, _, _ = servidor.conectar('ana')
+    servidor.conectar('luis')
+    ana.retener()
+    ana.enviar(b'vivo1\n')
+    ana.enviar(b'vivo2\n')
+
+    sesiones = {s['nickname']: s for s in servidor.comandos['sessions']([])}
+    assert sesiones['ana']['puesta_al_dia'] and not sesiones['luis']['puesta_al_dia']
+    assert (sesiones['ana']['retenidos_mensajes'], sesiones['ana']['retenidos_bytes']) == (2, 12)
+
+    estado = servidor.comandos['stats']([])
+    assert estado['clientes'] == 2 and estado['salas'] == {'general': 2}
+    assert estado['puesta_al_dia_pendiente'] == 1
+    assert (estado['retenidos_mensajes'], estado['retenidos_bytes']) == (2, 12)
+
+    ana.liberar([])
+    estado = servidor.comandos['stats']([])
+    assert (estado['puesta_al_dia_pendiente'], estado['retenidos_bytes']) == (0, 0)
+
+
+def test_expulsar(servidor):
+    ana, remoto, clave = servidor.conectar('ana')
+    assert servidor.comandos['kick'](['ana', 'spam', 'repetido']) == 'ana expulsado'
+    assert servidor.servidor.registro.buscar('ana') is None
+
+    remoto.settimeout(5)
+    aviso = remoto.makefile('rb').readline()
+    descifrador = RSACrypto()
+    descifrador.private_key = clave
+    assert descifrador.descifrar(aviso.decode().strip()) == '⛔ Expulsado por el administrador: spam repetido'
+
+    with pytest.raises(LookupError):
+        servidor.comandos['kick'](['ana'])
+    with pytest.raises(ValueError):
+        servidor.comandos['kick']([])
+
+
+def test_expulsar_no_espera_a_un_cliente_atascado(servidor):
+    ana, remoto, _ = servidor.conectar('ana')
+    # Otro hilo está bloqueado en sendall(): el cliente no lee y el buffer está lleno
+    ana.socket.setblocking(False)
+    try:
+        while True:
+            ana.socket.send(b'x' * 65536)
+    except BlockingIOError:
+        pass
+    ana.socket.setblocking(True)
+    errores = []
+
+    def enviar():
+        try:
+            ana.enviar(b'y' * 65536)
+        except OSError as e:
+            errores.append(e)
+
+    atascado = threading.Thread(target=enviar, daemon=True)
+    atascado.start()
+    time.sleep(0.1)
+    assert ana.lock_envio.locked()
+
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(servidor.comandos['kick'](['ana'])), daemon=True)
+    hilo.start()
+    hilo.join(timeout=5)
+    assert resultado == ['ana expulsado']
+    # El cierre también desbloquea el envío atascado
+    atascado.join(timeout=5)
+    assert not atascado.is_alive() and errores
+
+
+def test_nivel_log(servidor, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr('server.server.establecer_nivel', lambda *args: llamadas.append(args))
+    assert servidor.comandos['loglevel'](['debug']) == 'root -> DEBUG'
+    assert servidor.comandos['loglevel'](['core.spool', 'warning']) == 'core.spool -> WARNING'
+    assert llamadas == [('root', 'debug'), ('core.spool', 'warning')]
+    with pytest.raises(ValueError):
+        servidor.comandos['loglevel']([])
+
+
+def test_pilas(servidor):
+    actual = f'{threading.current_thread().name} ({threading.get_ident()})'
+    assert 'test_pilas' in ''.join(servidor.comandos['threads']([])[actual])
+    assert sum(servidor.comandos['stacks']([]).values()) >= 1
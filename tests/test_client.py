@@ -0,0 +1,45 @@
+"""Pruebas de client/client.py: negociación del modo de integridad."""
+from client.client import ChatClient
+from crypto.integrity import IntegrityVerifier
+
+
+class SocketFalso:
+    """Entrega las líneas indicadas y luego cierra la conexión."""
+
+    def __init__(self, *lineas):
+        self.datos = [linea.encode('utf-8') for linea in lineas]
+        self.cerrado = False
+
+    def recv(self, _):
+        return self.datos.pop(0) if self.datos else b''
+
+    def close(self):
+        self.cerrado = True
+
+
+def _cliente(modo_local, password, *lineas):
+    cliente = ChatClient.__new__(ChatClient)
+    cliente.server_password = password
+    cliente.integridad = IntegrityVerifier(modo_local, password or None)
+    cliente.client = SocketFalso(*lineas)
+    cliente.buffer_size = 4096
+    cliente.running = True
+    return cliente
+
+
+def test_usa_el_modo_del_servidor():
+    cliente = _cliente('legacy', 'secreto', 'PROTOCOL 2 json hmac-sha256\n')
+    cliente.recibir()
+    assert cliente.integridad.modo == 'hmac-sha256'
+
+    # El servidor, con su propio modo, acepta lo que firma el cliente
+    servidor = IntegrityVerifier('hmac-sha256', 'secreto')
+    assert servidor.verificar('hola', cliente.integridad.calcular('hola'))
+
+
+def test_modo_con_clave_sin_password(capsys):
+    cliente = _cliente('sha256', '', 'PROTOCOL 2 json hmac-sha256\n', 'NICK\n')
+    cliente.recibir()
+    assert not cliente.running and cliente.client.cerrado
+    assert cliente.integridad.modo == 'sha256'
+    assert 'necesita la contraseña del servidor' in capsys.readouterr().out
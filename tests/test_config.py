@@ -0,0 +1,23 @@
+"""Pruebas de config.py."""
+import os
+import threading
+
+from config import Config
+
+
+def test_clave_secreta_compartida(tmp_path, monkeypatch):
+    path = tmp_path / 'secret_key'
+    monkeypatch.setattr(Config, 'OAUTH_SECRET_KEY', None)
+    monkeypatch.setattr(Config, 'SECRET_KEY_FILE', path)
+
+    claves = []
+    hilos = [threading.Thread(target=lambda: claves.append(Config.get_secret_key())) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(set(claves)) == 1 and len(claves[0]) == 64
+    assert path.read_text() == claves[0]
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.listdir(tmp_path) == ['secret_key']
@@ -0,0 +1,62 @@
+"""Pruebas de crypto/digests.py."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from crypto.digests import guardar_con_hash, hash_archivo
+
+
+class Trozos(io.RawIOBase):
+    """Stream que entrega como mucho ``maximo`` bytes por lectura (como una subida)."""
+
+    def __init__(self, datos, maximo):
+        self.datos = io.BytesIO(datos)
+        self.maximo = maximo
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        return self.datos.read(self.maximo if n < 0 else min(n, self.maximo))
+
+
+def test_hash_archivo(tmp_path):
+    datos = os.urandom(10_000)
+    ruta = tmp_path / 'datos.bin'
+    ruta.write_bytes(datos)
+
+    assert hash_archivo(ruta) == {'sha256': hashlib.sha256(datos).hexdigest()}
+    # Bloques que no dividen el tamaño: el último se lee parcial
+    assert hash_archivo(ruta, ('sha256', 'blake2b'), tamano_bloque=3000) == {
+        'sha256': hashlib.sha256(datos).hexdigest(),
+        'blake2b': hashlib.blake2b(datos).hexdigest(),
+    }
+    assert hash_archivo(ruta, 'md5', tamano_bloque=1) == {'md5': hashlib.md5(datos).hexdigest()}
+
+    vacio = tmp_path / 'vacio.bin'
+    vacio.write_bytes(b'')
+    assert hash_archivo(vacio) == {'sha256': hashlib.sha256(b'').hexdigest()}
+    with pytest.raises(ValueError):
+        hash_archivo(ruta, ('sha256', 'no-existe'))
+
+
+def test_guardar_con_hash(tmp_path):
+    datos = os.urandom(10_000)
+    destino = tmp_path / 'subida.pdf'
+    destino.write_bytes(b'contenido anterior mucho mas largo' * 1000)
+
+    resultado = guardar_con_hash(Trozos(datos, 700), destino, ('sha256', 'sha512'), tamano_bloque=4096)
+    assert resultado == {
+        'sha256': hashlib.sha256(datos).hexdigest(),
+        'sha512': hashlib.sha512(datos).hexdigest(),
+        'size': len(datos),
+    }
+    assert destino.read_bytes() == datos
+    # Lo escrito y lo resumido coinciden con una lectura posterior
+    assert hash_archivo(destino)['sha256'] == resultado['sha256']
+
+    with pytest.raises(ValueError):
+        guardar_con_hash(io.BytesIO(datos), tmp_path / 'otro.pdf', 'no-existe')
+    assert not (tmp_path / 'otro.pdf').exists()
@@ -0,0 +1,39 @@
+"""Pruebas de core/handoff.py."""
+import queue
+import socket
+
+import pytest
+
+from core.handoff import recibir_reenvios, reenviar, servir_relevo, solicitar_relevo
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'send_fds'), reason="requiere SCM_RIGHTS")
+
+
+def test_reenvios_por_lineas():
+    origen, destino = socket.socketpair()
+    reenviar(origen, {'tipo': 'sala', 'texto': 'hola ñ'})
+    origen.sendall(b'no es json\n{"tipo": "privado"')
+    origen.sendall(b', "texto": "x"}\n')
+    origen.close()
+    assert list(recibir_reenvios(destino)) == [
+        {'tipo': 'sala', 'texto': 'hola ñ'},
+        {'tipo': 'privado', 'texto': 'x'},
+    ]
+
+
+def test_relevo_entrega_socket_y_canal(tmp_path):
+    ruta = tmp_path / 'relevo.sock'
+    escucha = socket.create_server(('127.0.0.1', 0))
+    canales: queue.Queue = queue.Queue()
+    servir_relevo(ruta, lambda: escucha, canales.put)
+
+    heredado, canal = solicitar_relevo(ruta, timeout=5)
+    assert heredado.getsockname() == escucha.getsockname()
+
+    anterior = canales.get(timeout=5)
+    reenviar(anterior, {'tipo': 'sala', 'texto': 'durante el relevo'})
+    anterior.close()
+    assert [r['texto'] for r in recibir_reenvios(canal)] == ['durante el relevo']
+    heredado.close()
+    escucha.close()
+    canal.close()
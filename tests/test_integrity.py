@@ -0,0 +1,34 @@
+"""Pruebas de crypto/integrity.py."""
+import pytest
+
+from crypto.integrity import IntegrityVerifier
+
+
+@pytest.mark.parametrize('modo', ['hmac-sha256', 'blake2b'])
+def test_modo_con_clave_rechaza_mensaje_sin_etiqueta(modo):
+    verificador = IntegrityVerifier(modo, 'secreto')
+    assert verificador.requiere_etiqueta
+    assert not verificador.verificar('hola', None)
+
+
+@pytest.mark.parametrize('modo', ['sha256', 'legacy'])
+def test_modo_sin_clave_acepta_mensaje_sin_etiqueta(modo):
+    verificador = IntegrityVerifier(modo)
+    assert not verificador.requiere_etiqueta
+    assert verificador.verificar('hola', None)
+
+
+@pytest.mark.parametrize('modo', ['hmac-sha256', 'blake2b', 'sha256', 'legacy'])
+def test_etiqueta_valida_e_invalida(modo):
+    verificador = IntegrityVerifier(modo, 'secreto')
+    etiqueta = verificador.calcular('hola')
+    assert verificador.verificar('hola', etiqueta)
+    assert verificador.verificar('hola', etiqueta.upper())
+    assert not verificador.verificar('adiós', etiqueta)
+    assert not verificador.verificar('hola', etiqueta[:-1])
+
+
+def test_etiqueta_depende_del_secreto():
+    a = IntegrityVerifier('hmac-sha256', 'uno')
+    b = IntegrityVerifier('hmac-sha256', 'dos')
+    assert not b.verificar('hola', a.calcular('hola'))
@@ -0,0 +1,83 @@
+"""Pruebas de core/logging_setup.py."""
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+from config import Config
+from core import logging_setup
+from core.logging_setup import _parsear_niveles, configurar_logging, detener_logging, establecer_nivel
+
+
+@pytest.fixture
+def raiz(monkeypatch):
+    """Restaura los handlers y niveles que cambia configurar_logging."""
+    raiz = logging.getLogger()
+    handlers, nivel = raiz.handlers[:], raiz.level
+    niveles = {nombre: logging.getLogger(nombre).level for nombre in ('chat.a', 'chat.b')}
+    monkeypatch.setattr(Config, 'LOG_FORMAT', '%(threadName)s|%(message)s')
+    yield raiz
+    detener_logging()
+    raiz.handlers[:] = handlers
+    raiz.setLevel(nivel)
+    for nombre, valor in niveles.items():
+        logging.getLogger(nombre).setLevel(valor)
+
+
+class Lento:
+    """Argumento de log que tarda en formatearse y recuerda en qué hilo se hizo."""
+
+    def __init__(self):
+        self.hilos = []
+
+    def __str__(self):
+        self.hilos.append(threading.current_thread().name)
+        return 'lento'
+
+
+def test_parsear_niveles():
+    assert _parsear_niveles('crypto=warning, server = DEBUG,,basura,x=NOPE,=INFO') == {
+        'crypto': logging.WARNING, 'server': logging.DEBUG,
+    }
+
+
+def test_escritura_en_el_hilo_del_listener(raiz, monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'LOG_ASYNC', True)
+    configurar_logging('info', 'chat.a=WARNING')
+    assert isinstance(raiz.handlers[0], logging.handlers.QueueHandler)
+    oyente = logging_setup._listener
+    # Idempotente: una segunda llamada no crea otro listener ni otro handler
+    configurar_logging('info', 'chat.b=ERROR')
+    assert logging_setup._listener is oyente and len(raiz.handlers) == 1
+    assert logging.getLogger('chat.b').level == logging.ERROR
+
+    argumento = Lento()
+    logging.getLogger('chat.a').info('silenciado %s', argumento)
+    logging.getLogger('chat.a').warning('aviso %s', argumento)
+    detener_logging()
+
+    salida = capsys.readouterr().err
+    assert 'silenciado' not in salida
+    # El mensaje se formatea en el hilo escritor, no en el que emite el log
+    assert argumento.hilos and threading.current_thread().name not in argumento.hilos
+    assert f'{threading.current_thread().name}|aviso lento' in salida
+    assert logging_setup._listener is None
+
+
+def test_modo_sincrono(raiz, monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'LOG_ASYNC', False)
+    configurar_logging('debug', '')
+    assert logging_setup._listener is None
+    assert type(raiz.handlers[0]) is logging.StreamHandler
+    logging.getLogger('chat.a').debug('directo')
+    assert 'directo' in capsys.readouterr().err
+
+
+def test_establecer_nivel(raiz):
+    establecer_nivel('chat.a', 'error')
+    assert logging.getLogger('chat.a').level == logging.ERROR
+    establecer_nivel('root', 'WARNING')
+    assert raiz.level == logging.WARNING
+    with pytest.raises(ValueError):
+        establecer_nivel('chat.a', 'ruidoso')
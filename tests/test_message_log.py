@@ -0,0 +1,96 @@
+"""Pruebas de core/message_log.py."""
+import mmap
+import threading
+import time
+
+from core.message_log import MessageLog
+
+
+def _llenar(log, n, salas=('a', 'b', 'c')):
+    for i in range(n):
+        log.anexar(salas[i % len(salas)], 'nick', f'm{i}', timestamp=1000.0 + i)
+
+
+def test_lectura_por_sala_y_ultimos(tmp_path):
+    log = MessageLog(tmp_path, max_bytes_segmento=200)
+    _llenar(log, 30)
+    assert len(log._segmentos) > 1
+
+    registros = log.leer(0, sala='b')
+    assert [r.texto for r in registros] == [f'm{i}' for i in range(1, 30, 3)]
+    assert all(r.sala == 'b' for r in registros)
+    assert [r.texto for r in log.ultimos(4, sala='c')] == ['m20', 'm23', 'm26', 'm29']
+    assert [r.texto for r in log.ultimos(2)] == ['m28', 'm29']
+    assert [r.texto for r in log.leer(10, limite=2, sala='a')] == ['m12', 'm15']
+    assert log.ultimos(5, sala='c', hasta_offset=6) == log.leer(0, sala='c', hasta_offset=6)
+    assert log.leer(0, sala='inexistente') == []
+    log.cerrar()
+
+
+def test_indice_de_salas_persistido_y_reconstruido(tmp_path):
+    log = MessageLog(tmp_path, max_bytes_segmento=200)
+    _llenar(log, 20)
+    esperado = log.leer(0, sala='a')
+    log.cerrar()
+
+    # Reabrir: el índice se carga del disco
+    log = MessageLog(tmp_path, max_bytes_segmento=200)
+    assert log.leer(0, sala='a') == esperado
+    log.cerrar()
+
+    # Sin archivos .sal (historial anterior): se reconstruyen desde el log
+    for ruta in tmp_path.glob('*.sal'):
+        ruta.unlink()
+    log = MessageLog(tmp_path, max_bytes_segmento=200)
+    assert log.leer(0, sala='a') == esperado
+    log.anexar('a', 'nick', 'nuevo')
+    assert log.ultimos(1, sala='a')[0].texto == 'nuevo'
+    log.cerrar()
+
+
+def test_segmento_borrado_durante_la_lectura(tmp_path):
+    log = MessageLog(tmp_path, max_bytes_segmento=200, max_segmentos=2)
+    _llenar(log, 10)
+    segmentos, longitudes = log._instantanea(None)
+    viejo = segmentos[0]
+    lector = log._leer_segmento(viejo, viejo.indices(longitudes[0], 0, None), activo=False)
+    primero = next(lector)
+    assert primero.offset == viejo.base
+
+    # La rotación cierra el mmap y borra el segmento: fin de datos, sin excepción
+    _llenar(log, 40)
+    assert viejo.base < log.primer_offset
+    assert list(lector) == []
+    assert list(log._leer_segmento(viejo, range(1), activo=True)) == []
+    log.cerrar()
+
+
+def test_un_solo_mmap_con_lectores_concurrentes(tmp_path, monkeypatch):
+    log = MessageLog(tmp_path, max_bytes_segmento=200)
+    _llenar(log, 10)
+    sellado = log._instantanea(None)[0][0]
+    creados = []
+    original = mmap.mmap
+
+    def mmap_lento(*args, **kwargs):
+        time.sleep(0.05)
+        mapa = original(*args, **kwargs)
+        creados.append(mapa)
+        return mapa
+
+    monkeypatch.setattr(mmap, 'mmap', mmap_lento)
+    barrera = threading.Barrier(8)
+    mapas = []
+
+    def lector():
+        barrera.wait()
+        mapas.append(sellado.mapear())
+
+    hilos = [threading.Thread(target=lector) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(creados) == 1
+    assert all(mapa is creados[0] for mapa in mapas)
+    log.cerrar()
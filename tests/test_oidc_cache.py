@@ -0,0 +1,104 @@
+"""Pruebas de auth/models/oidc_cache.py con la configuración de Google de auth/fixtures."""
+import json
+import os
+import time
+
+from auth.models.oidc_cache import OIDCMetadataCache
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'auth', 'fixtures', 'google_openid_configuration.json')
+
+
+class Client:
+    """Lo que usa la caché de un cliente de Authlib."""
+
+    def __init__(self):
+        self.server_metadata = {}
+
+
+def _metadata(jwks_kid):
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata['jwks'] = {'keys': [{'kid': jwks_kid}]}
+    return metadata
+
+
+def _escribir(path, fetched_at, metadata):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'fetched_at': fetched_at, 'metadata': metadata}, f)
+    os.replace(tmp, path)
+
+
+def test_fixture(tmp_path):
+    cache = OIDCMetadataCache('http://no-usado', tmp_path / 'oidc.json', fixture=FIXTURE)
+    client = Client()
+    assert cache.prefill(client)
+    assert client.server_metadata['issuer'] == 'https://accounts.google.com'
+    assert '_loaded_at' in client.server_metadata
+
+
+def test_recarga_lo_renovado_por_otro_worker(tmp_path):
+    path = tmp_path / 'oidc.json'
+    ahora = time.time()
+    _escribir(path, ahora - 100, _metadata('vieja'))
+
+    cache = OIDCMetadataCache('http://no-usado', path)
+    client = Client()
+    assert cache.prefill(client)
+    assert client.server_metadata['jwks']['keys'][0]['kid'] == 'vieja'
+    assert not cache.sync(client)
+
+    # Otro worker descargó una copia nueva en el archivo compartido
+    _escribir(path, ahora, _metadata('nueva'))
+    assert cache.sync(client)
+    assert client.server_metadata['jwks']['keys'][0]['kid'] == 'nueva'
+    assert client.server_metadata['token_endpoint'] == 'https://oauth2.googleapis.com/token'
+
+    # Una copia más antigua en el archivo no reemplaza la que ya se tiene
+    _escribir(path, ahora - 50, _metadata('vieja'))
+    assert not cache.sync(client)
+    assert client.server_metadata['jwks']['keys'][0]['kid'] == 'nueva'
+
+
+def test_hilo_de_fondo_aplica_copia_ajena(tmp_path):
+    path = tmp_path / 'oidc.json'
+    ahora = time.time()
+    _escribir(path, ahora - 100, _metadata('vieja'))
+    cache = OIDCMetadataCache('http://no-usado', path, ttl=3600)
+    client = Client()
+    cache.prefill(client)
+
+    cache.start_background_refresh(client, interval=0.05)
+    try:
+        _escribir(path, ahora, _metadata('nueva'))
+        fin = time.monotonic() + 5
+        while client.server_metadata['jwks']['keys'][0]['kid'] != 'nueva' and time.monotonic() < fin:
+            time.sleep(0.02)
+        assert client.server_metadata['jwks']['keys'][0]['kid'] == 'nueva'
+    finally:
+        cache.stop()
+
+
+def test_hilo_en_el_worker_tras_el_fork(tmp_path):
+    path = tmp_path / 'oidc.json'
+    _escribir(path, time.time(), _metadata('vieja'))
+    cache = OIDCMetadataCache('http://no-usado', path, ttl=3600)
+    client = Client()
+    cache.prefill(client)
+    cache.start_background_refresh(client, interval=60)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                # El hilo del padre no existe aquí: after_fork() lo arranca de nuevo
+                heredado = cache._thread
+                cache.start_background_refresh(client, interval=60)
+                ok = cache._thread is not heredado and cache._thread.is_alive()
+            finally:
+                os._exit(0 if ok else 1)
+        _, estado = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(estado) == 0
+    finally:
+        cache.stop()
@@ -0,0 +1,89 @@
+"""Pruebas de core/profiler.py."""
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from core import profiler
+from core.profiler import (
+    a_collapsed, a_speedscope, guardar_perfil, iniciar_perfil, muestrear_hilos, muestrear_tareas
+)
+
+
+def ocupado(parar):
+    while not parar.is_set():
+        time.sleep(0.001)
+
+
+def test_muestrear_hilos():
+    parar = threading.Event()
+    hilo = threading.Thread(target=ocupado, args=(parar,), name='Trabajo-3')
+    hilo.start()
+    try:
+        muestras = muestrear_hilos(0.2, 0.01)
+    finally:
+        parar.set()
+        hilo.join()
+
+    pilas = [pila for pila in muestras if pila[0][0] == '[Trabajo]']
+    assert pilas and all(pila[-1][0] == 'ocupado' for pila in pilas)
+    # El hilo que muestrea no se incluye a sí mismo
+    assert not any(marco[0] == 'test_muestrear_hilos' for pila in muestras for marco in pila)
+
+
+def test_muestrear_tareas():
+    async def dormida():
+        await asyncio.sleep(10)
+
+    async def principal():
+        tarea = asyncio.create_task(dormida(), name='dormida')
+        try:
+            return await muestrear_tareas(0.1, 0.01)
+        finally:
+            tarea.cancel()
+
+    muestras = asyncio.run(principal())
+    assert [pila[0][0] for pila in muestras] == ['[task] dormida']
+    assert next(iter(muestras))[1][0] == 'dormida'
+
+
+def test_formatos(tmp_path):
+    raiz = ('[Hilo]', '', 0)
+    a, b = ('a', '/src/x.py', 10), ('b', '/src/y.py', 20)
+    muestras = Counter({(raiz, a, b): 3, (raiz, a): 1})
+
+    assert a_collapsed(muestras) == '[Hilo];a (x.py:10);b (y.py:20) 3\n[Hilo];a (x.py:10) 1\n'
+
+    perfil = a_speedscope(muestras, 'server', 0.01)
+    assert perfil['shared']['frames'] == [
+        {'name': '[Hilo]'}, {'name': 'a', 'file': '/src/x.py', 'line': 10}, {'name': 'b', 'file': '/src/y.py', 'line': 20},
+    ]
+    datos = perfil['profiles'][0]
+    assert datos['samples'] == [[0, 1, 2], [0, 1]]
+    assert datos['weights'] == [0.03, 0.01] and datos['endValue'] == pytest.approx(0.04)
+
+    ruta = guardar_perfil(muestras, tmp_path / 'perfiles', 'server', 'speedscope', 0.01)
+    assert ruta.name.endswith('.speedscope.json') and json.loads(ruta.read_text()) == perfil
+    ruta = guardar_perfil(muestras, tmp_path / 'perfiles', 'server', 'collapsed')
+    assert ruta.read_text() == a_collapsed(muestras)
+    with pytest.raises(ValueError):
+        guardar_perfil(muestras, tmp_path, 'server', 'pprof')
+
+
+def test_un_perfil_a_la_vez(tmp_path):
+    extra = Counter({(('[task] extra', '', 0),): 5})
+    iniciar_perfil(0.2, tmp_path, 'server', 'collapsed', extra=lambda: extra)
+    with pytest.raises(RuntimeError):
+        iniciar_perfil(0.2, tmp_path, 'server')
+    with pytest.raises(ValueError):
+        iniciar_perfil(0.2, tmp_path, 'server', 'pprof')
+
+    fin = time.monotonic() + 5
+    while profiler._perfil_activo.locked() and time.monotonic() < fin:
+        time.sleep(0.02)
+    assert not profiler._perfil_activo.locked()
+    [ruta] = tmp_path.glob('server-*.collapsed.txt')
+    assert '[task] extra 5\n' in ruta.read_text()
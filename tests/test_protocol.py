@@ -0,0 +1,51 @@
+"""Pruebas de core/protocol.py."""
+import base64
+import json
+
+import pytest
+
+from core.protocol import MessageParser, ProtocolError, parsear_saludo
+from crypto.integrity import IntegrityVerifier
+
+BITS = 2048
+# Bloque RSA de 2048 bits en Base64 (la forma es lo único que valida el parser)
+CIFRADO = base64.b64encode(bytes(256)).decode('ascii')
+
+
+def _parser(formato, modo):
+    return MessageParser(formato, BITS, IntegrityVerifier(modo, 'secreto'))
+
+
+@pytest.mark.parametrize('modo', ['hmac-sha256', 'blake2b'])
+def test_v1_sin_etiqueta_rechazado_en_modo_con_clave(modo):
+    parser = _parser('auto', modo)
+    assert parser.parsear(CIFRADO) is None
+    assert parser.parsear(json.dumps({'cipher': CIFRADO})) is None
+
+
+def test_v1_sin_etiqueta_aceptado_en_modo_sin_clave():
+    parser = _parser('auto', 'sha256')
+    assert parser.parsear(CIFRADO) == (CIFRADO, None)
+    assert parser.parsear(json.dumps({'cipher': CIFRADO})) == (CIFRADO, None)
+
+
+@pytest.mark.parametrize('formato', ['auto', 'pipe'])
+def test_pipe_con_etiqueta(formato):
+    parser = _parser(formato, 'hmac-sha256')
+    etiqueta = 'a' * 64
+    assert parser.parsear(f'{CIFRADO}|{etiqueta}') == (CIFRADO, etiqueta)
+    assert parser.parsear(f'{CIFRADO}|{etiqueta[:-1]}') is None
+
+
+def test_json_requiere_etiqueta():
+    parser = _parser('json', 'sha256')
+    assert parser.parsear(json.dumps({'cipher': CIFRADO})) is None
+    assert parser.parsear(json.dumps({'cipher': CIFRADO, 'tag': 'b' * 64})) == (CIFRADO, 'b' * 64)
+
+
+def test_saludo():
+    assert parsear_saludo('CLAVEB64').version == 1
+    saludo = parsear_saludo('HELLO 2 json CLAVE room=dev')
+    assert (saludo.version, saludo.formato, saludo.opciones) == (2, 'json', {'room': 'dev'})
+    with pytest.raises(ProtocolError):
+        parsear_saludo('HELLO 9 json CLAVE')
@@ -0,0 +1,85 @@
+"""Pruebas de core/rate_limit.py y del plazo global del handshake."""
+import socket
+import time
+import types
+
+import pytest
+
+from core import rate_limit
+from core.rate_limit import RateLimiter, TokenBucket
+from server.server import ChatServer
+
+
+class Reloj:
+    """Sustituye a time.monotonic dentro de core.rate_limit."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(rate_limit, 'time', reloj)
+    return reloj
+
+
+def test_rafaga_y_reposicion(reloj):
+    cubo = TokenBucket(tasa=2, capacidad=3)
+    assert [cubo.consumir() for _ in range(4)] == [True, True, True, False]
+
+    reloj.ahora += 0.5          # +1 token
+    assert cubo.consumir()
+    assert not cubo.consumir()
+
+    reloj.ahora += 60           # nunca más que la capacidad
+    assert [cubo.consumir() for _ in range(4)] == [True, True, True, False]
+    assert not cubo.consumir(0.5)
+    reloj.ahora += 0.25
+    assert cubo.consumir(0.5)
+
+
+def test_claves_independientes(reloj):
+    limitador = RateLimiter(tasa=1, capacidad=1)
+    assert limitador.permitir('1.1.1.1')
+    assert not limitador.permitir('1.1.1.1')
+    assert limitador.permitir('2.2.2.2')
+    reloj.ahora += 1
+    assert limitador.permitir('1.1.1.1')
+
+
+def test_expulsion_lru_de_claves(reloj):
+    limitador = RateLimiter(tasa=0.001, capacidad=1, max_claves=2)
+    assert limitador.permitir('a')
+    assert limitador.permitir('b')
+    assert not limitador.permitir('a')      # 'a' pasa a ser la más reciente
+    assert limitador.permitir('c')          # expulsa a 'b', la menos usada
+    assert list(limitador._buckets) == ['a', 'c']
+    assert not limitador.permitir('a')      # 'a' conserva su bucket vacío
+    assert limitador.permitir('b')          # 'b' vuelve con un bucket lleno
+
+
+def test_plazo_global_del_handshake():
+    servidor = types.SimpleNamespace(buffer_size=4096)
+    local, remoto = socket.socketpair()
+    try:
+        remoto.sendall(b'HELLO v=2\n')
+        assert ChatServer._recibir_handshake(servidor, local, time.monotonic() + 5) == 'HELLO v=2'
+
+        # Plazo ya vencido: ni siquiera se lee
+        remoto.sendall(b'NICK\n')
+        with pytest.raises(TimeoutError):
+            ChatServer._recibir_handshake(servidor, local, time.monotonic() - 1)
+
+        # Cada lectura espera solo lo que queda del plazo, no un timeout completo
+        local.recv(64)
+        inicio = time.monotonic()
+        with pytest.raises(TimeoutError):
+            ChatServer._recibir_handshake(servidor, local, inicio + 0.3)
+        assert time.monotonic() - inicio < 2
+    finally:
+        local.close()
+        remoto.close()
@@ -0,0 +1,42 @@
+"""Pruebas de core/rooms.py y core/registry.py."""
+import pytest
+
+from core.registry import ClientRegistry
+from core.rooms import RoomManager
+from core.session import ClientSession
+
+
+def _sesion(nickname, puerto):
+    sesion = ClientSession(object(), ('127.0.0.1', puerto))
+    sesion.nickname = nickname
+    return sesion
+
+
+def test_limite_de_salas_no_bloquea_la_sala_por_defecto():
+    salas = RoomManager('general', max_salas=1)
+    salas.unir(_sesion('ana', 1), 'dev')
+    with pytest.raises(ValueError):
+        salas.unir(_sesion('luis', 2), 'ops')
+    sesion = _sesion('eva', 3)
+    salas.unir(sesion, 'general')
+    assert sesion.sala == 'general'
+
+
+def test_nicknames_repetidos():
+    registro = ClientRegistry(10)
+    antigua, nueva = _sesion('ana', 1), _sesion('ana', 2)
+    assert registro.registrar(antigua) and registro.registrar(nueva)
+    assert registro.buscar('ana') is nueva
+
+    # Al irse la más reciente, los mensajes directos llegan a la otra
+    registro.eliminar(nueva.socket)
+    assert registro.buscar('ana') is antigua
+    registro.eliminar(antigua.socket)
+    assert registro.buscar('ana') is None
+    assert len(registro) == 0
+
+
+def test_registro_lleno():
+    registro = ClientRegistry(1)
+    assert registro.registrar(_sesion('ana', 1))
+    assert not registro.registrar(_sesion('luis', 2))
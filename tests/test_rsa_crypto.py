@@ -0,0 +1,31 @@
+"""Pruebas de crypto/rsa_crypto.py."""
+import pytest
+
+from crypto.rsa_crypto import RSACrypto, fragmentar_mensaje, max_bytes_mensaje
+
+
+def test_fragmentar_respeta_caracteres():
+    mensaje = '📜 [12:00] ana: ' + 'ñandú ' * 60
+    trozos = fragmentar_mensaje(mensaje, 190)
+    assert len(trozos) > 1
+    assert ''.join(trozos) == mensaje
+    assert all(len(t.encode('utf-8')) <= 190 for t in trozos)
+    assert fragmentar_mensaje('corto', 190) == ['corto']
+
+
+def test_fragmentar_limite_minimo():
+    assert fragmentar_mensaje('📜📜', 4) == ['📜', '📜']
+    with pytest.raises(ValueError):
+        fragmentar_mensaje('📜📜', 3)
+
+
+def test_mensaje_largo_cifrado_por_trozos():
+    rsa = RSACrypto()
+    rsa.generar_par_claves(key_size=2048)
+    limite = max_bytes_mensaje(rsa.public_key)
+    assert limite == 190
+
+    mensaje = 'x' * 500
+    resultados = rsa.cifrar_lote(fragmentar_mensaje(mensaje, limite), rsa.public_key)
+    assert all(r.ok for r in resultados)
+    assert ''.join(rsa.descifrar(r.valor) for r in resultados) == mensaje
@@ -0,0 +1,49 @@
+"""Pruebas de core/search_index.py."""
+import sqlite3
+
+from core.search_index import SearchIndex, construir_consulta
+
+
+def _indice(ruta, filas):
+    indice = SearchIndex(ruta)
+    for fila in filas:
+        indice.agregar(*fila)
+    indice.cerrar()
+    return indice
+
+
+def test_construir_consulta():
+    assert construir_consulta('hola mu*') == '"hola" "mu"*'
+    assert construir_consulta('a* "x') == '"a" "x"'
+    assert construir_consulta('***') is None
+
+
+def test_filtro_por_sala_exacto(tmp_path):
+    indice = _indice(tmp_path / 's.db', [
+        (0, 1.0, 'mi-sala', 'ana', 'hola'),
+        (1, 2.0, 'mi_sala', 'bea', 'hola'),
+        (2, 3.0, 'general', 'ana', 'hola general'),
+    ])
+    assert [r.offset for r in indice.buscar('hola', sala='mi_sala')] == [1]
+    assert [r.offset for r in indice.buscar('hola')] == [2, 1, 0]
+
+
+def test_las_palabras_no_coinciden_con_la_sala(tmp_path):
+    indice = _indice(tmp_path / 's.db', [
+        (0, 1.0, 'general', 'ana', 'hola'),
+        (1, 2.0, 'otra', 'ana', 'general'),
+    ])
+    assert [r.offset for r in indice.buscar('general')] == [1]
+
+
+def test_esquema_antiguo_se_recrea(tmp_path):
+    ruta = tmp_path / 's.db'
+    conexion = sqlite3.connect(ruta)
+    conexion.execute('CREATE VIRTUAL TABLE mensajes USING fts5(texto, nick UNINDEXED, sala UNINDEXED, ts UNINDEXED)')
+    conexion.execute("INSERT INTO mensajes(rowid, texto, nick, sala, ts) VALUES (5, 'hola', 'ana', 'general', 1)")
+    conexion.commit()
+    conexion.close()
+
+    indice = _indice(ruta, [(0, 1.0, 'general', 'ana', 'hola')])
+    assert indice.ultimo_offset == 0
+    assert [r.offset for r in indice.buscar('hola', sala='general')] == [0]
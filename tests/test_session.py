@@ -0,0 +1,59 @@
+"""Pruebas de core/session.py."""
+from core.session import ClientSession
+
+
+class SocketFalso:
+    def __init__(self):
+        self.envios = []
+
+    def sendall(self, datos):
+        self.envios.append(bytes(datos))
+
+
+def _sesion(version=2):
+    sesion = ClientSession(SocketFalso(), ('127.0.0.1', 1))
+    sesion.version_protocolo = version
+    return sesion
+
+
+def test_envio_directo():
+    sesion = _sesion()
+    sesion.enviar(b'a\n')
+    assert sesion.socket.envios == [b'a\n']
+    assert sesion.mensajes_enviados == 1
+
+
+def test_historial_por_delante_de_lo_retenido():
+    sesion = _sesion()
+    sesion.retener()
+    sesion.enviar(b'vivo1\n')
+    sesion.enviar(b'vivo2\n')
+    sesion.enviar(b'RECONNECT 0\n', num_mensajes=0, retenible=False)
+    assert sesion.socket.envios == [b'RECONNECT 0\n']
+
+    sesion.liberar([b'h1\n', b'h2\n'])
+    assert sesion.socket.envios[1:] == [b'h1\nh2\nvivo1\nvivo2\n']
+    assert sesion.mensajes_enviados == 4
+
+    # Sin retención, los envíos vuelven a salir directamente
+    sesion.enviar(b'vivo3\n')
+    assert sesion.socket.envios[-1] == b'vivo3\n'
+
+
+def test_retenciones_anidadas():
+    sesion = _sesion()
+    sesion.retener()
+    sesion.retener()
+    sesion.enviar(b'vivo\n')
+    sesion.liberar([b'h1\n'])
+    assert sesion.socket.envios == []
+    sesion.liberar([b'h2\n'])
+    assert sesion.socket.envios == [b'h1\nh2\nvivo\n']
+
+
+def test_protocolo_1_un_envio_por_mensaje():
+    sesion = _sesion(version=1)
+    sesion.retener()
+    sesion.enviar(b'vivo\n')
+    sesion.liberar([b'h1\n'])
+    assert sesion.socket.envios == [b'h1\n', b'vivo\n']
@@ -0,0 +1,126 @@
+"""Pruebas de auth/models/session_store.py y de la caché de usuarios de OAuthModel
+con dos 'workers' sobre el mismo backend."""
+import os
+
+from flask import Flask, jsonify
+
+from auth.models.oauth_model import OAuthModel
+from auth.models.session_store import SQLiteSessionBackend, ServerSideSessionInterface
+
+
+class Contador(SQLiteSessionBackend):
+    """Backend que cuenta las lecturas."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.lecturas = 0
+
+    def load(self, sid):
+        self.lecturas += 1
+        return super().load(sid)
+
+
+def _worker(backend):
+    app = Flask(__name__)
+    app.secret_key = 'pruebas'
+    app.session_interface = ServerSideSessionInterface(backend)
+    oauth = OAuthModel()
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        oauth.save_user_session({'email': 'ana@example.com'})
+        return ''
+
+    @app.route('/logout', methods=['POST'])
+    def logout():
+        oauth.logout_user()
+        return ''
+
+    @app.route('/pagina')
+    def pagina():
+        return jsonify(oauth.get_chat_token(fresh=False))
+
+    @app.route('/token')
+    def token():
+        return jsonify(oauth.get_chat_token())
+
+    @app.route('/estatico')
+    def estatico():
+        return 'css'
+
+    return app
+
+
+def test_cierre_en_otro_worker(tmp_path):
+    backend = SQLiteSessionBackend(tmp_path / 's.db')
+    uno, otro = _worker(backend).test_client(), _worker(backend).test_client()
+
+    uno.post('/login')
+    otro.set_cookie('session', uno.get_cookie('session').value)
+    assert otro.get('/pagina').json == 'ana@example.com'
+    assert otro.get('/token').json == 'ana@example.com'
+
+    uno.post('/logout')
+    # Las páginas de solo lectura usan la caché de usuarios unos segundos...
+    assert otro.get('/pagina').json == 'ana@example.com'
+    # ...pero las rutas sensibles leen el backend: el cierre se ve al momento
+    assert otro.get('/token').json is None
+    # Y tras esa lectura la caché de este worker tampoco lo sirve
+    assert otro.get('/pagina').json is None
+
+
+def test_login_y_logout_invalidan_la_cache(tmp_path):
+    backend = SQLiteSessionBackend(tmp_path / 's.db')
+    app = _worker(backend)
+    cliente, robado = app.test_client(), app.test_client()
+
+    cliente.post('/login')
+    anterior = cliente.get_cookie('session').value
+    assert cliente.get('/pagina').json == 'ana@example.com'
+
+    # Un nuevo login cambia el identificador: el anterior deja de valer
+    cliente.post('/login')
+    assert cliente.get_cookie('session').value != anterior
+    robado.set_cookie('session', anterior)
+    assert robado.get('/pagina').json is None
+
+    assert cliente.get('/pagina').json == 'ana@example.com'
+    cliente.post('/logout')
+    assert cliente.get('/pagina').json is None
+
+
+def test_sesion_leida_solo_si_se_usa(tmp_path):
+    backend = Contador(tmp_path / 's.db')
+    cliente = _worker(backend).test_client()
+    cliente.post('/login')
+
+    backend.lecturas = 0
+    assert cliente.get('/estatico').status_code == 200
+    assert backend.lecturas == 0
+
+    cliente.get('/pagina')
+    cliente.get('/pagina')
+    assert backend.lecturas == 1
+    cliente.get('/token')
+    assert backend.lecturas == 2
+
+
+def test_conexion_sqlite_por_proceso(tmp_path):
+    backend = SQLiteSessionBackend(tmp_path / 's.db')
+    # Crear el backend no abre ninguna conexión
+    assert getattr(backend._local, 'conn', None) is None
+    backend.save('a', '{}', 60)
+    conexion = backend._connection()
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            ok = backend._connection() is not conexion and backend.load('a') == '{}'
+            backend.save('b', '{}', 60)
+        finally:
+            os._exit(0 if ok else 1)
+    _, estado = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(estado) == 0
+    assert backend._connection() is conexion
+    assert backend.load('b') == '{}'
@@ -0,0 +1,133 @@
+"""Pruebas de auth/models/sign_jobs.py con un firmador falso."""
+import io
+import shutil
+import time
+
+from auth.models.sign_jobs import (
+    SigningJobQueue, SigningTimeout, DONE, FAILED, CANCELLED, TIMEOUT, FINAL_STATES
+)
+
+
+class FakeSigner:
+    """Copia el PDF; ``SLOW`` tarda mucho y ``BAD`` falla."""
+
+    def sign_pdf(self, input_pdf, output_pdf, pfx_path, password):
+        with open(input_pdf, 'rb') as f:
+            data = f.read()
+        if data.startswith(b'SLOW'):
+            time.sleep(60)
+        if data.startswith(b'BAD'):
+            raise ValueError('pdf corrupto')
+        shutil.copyfile(input_pdf, output_pdf)
+
+    sign_file = sign_pdf
+
+
+class Upload:
+    """Lo mínimo de un FileStorage de werkzeug."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.stream.getvalue())
+
+
+def _cola(tmp_path, **kwargs):
+    return SigningJobQueue(tmp_path / 'jobs', FakeSigner, max_workers=1, memory_dir='', **kwargs)
+
+
+def _enviar(cola, data):
+    return cola.submit('ana@example.com', Upload(data), Upload(b'pfx'), 'pw')['id']
+
+
+def _esperar(cola, job_id, limite=20):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        state = cola.get(job_id)
+        if state['status'] in FINAL_STATES:
+            return state
+        time.sleep(0.1)
+    raise AssertionError(f'el trabajo {job_id} no terminó')
+
+
+def test_firma_y_error(tmp_path):
+    cola = _cola(tmp_path)
+    try:
+        ok = _enviar(cola, b'%PDF hola')
+        assert _esperar(cola, ok)['status'] == DONE
+        with open(cola.result_path(ok), 'rb') as f:
+            assert f.read() == b'%PDF hola'
+
+        fallo = _esperar(cola, _enviar(cola, b'BAD'))
+        assert fallo['status'] == FAILED and 'pdf corrupto' in fallo['error']
+    finally:
+        cola.shutdown()
+
+
+def test_tiempo_agotado_libera_el_hueco(tmp_path):
+    cola = _cola(tmp_path, timeout=2)
+    try:
+        lento = _enviar(cola, b'SLOW')
+        siguiente = _enviar(cola, b'%PDF siguiente')
+        assert _esperar(cola, lento)['status'] == TIMEOUT
+        # Con un solo hueco, el siguiente solo termina si se mató la firma lenta
+        assert _esperar(cola, siguiente)['status'] == DONE
+        assert cola._pending == 0
+    finally:
+        cola.shutdown()
+
+
+def test_cancelar_mata_la_firma(tmp_path):
+    cola = _cola(tmp_path, timeout=60)
+    try:
+        lento = _enviar(cola, b'SLOW')
+        fin = time.monotonic() + 20
+        while cola.get(lento)['status'] != 'running' and time.monotonic() < fin:
+            time.sleep(0.05)
+        assert cola.cancel(lento)['status'] == CANCELLED
+        assert _esperar(cola, _enviar(cola, b'%PDF otro'))['status'] == DONE
+    finally:
+        cola.shutdown()
+
+
+def _lote(tmp_path, *contenidos):
+    documentos = []
+    for i, data in enumerate(contenidos):
+        entrada = tmp_path / f'{i}.pdf'
+        entrada.write_bytes(data)
+        documentos.append((str(entrada), str(tmp_path / f'{i}-firmado.pdf')))
+    return documentos
+
+
+def test_lote_en_los_procesos_de_la_cola(tmp_path):
+    cola = _cola(tmp_path, timeout=2)
+    try:
+        documentos = _lote(tmp_path, b'%PDF uno', b'BAD', b'SLOW', b'%PDF dos')
+        resultados = {entrada: error for entrada, _, error in cola.sign_many(documentos, 'cert.pfx', 'pw')}
+        assert set(resultados) == {entrada for entrada, _ in documentos}
+        assert resultados[documentos[0][0]] is None and resultados[documentos[3][0]] is None
+        assert 'pdf corrupto' in str(resultados[documentos[1][0]])
+        assert isinstance(resultados[documentos[2][0]], SigningTimeout)
+        with open(documentos[3][1], 'rb') as f:
+            assert f.read() == b'%PDF dos'
+        # La firma lenta se mató: el hueco sigue sirviendo a los trabajos sueltos
+        assert _esperar(cola, _enviar(cola, b'%PDF suelto'))['status'] == DONE
+    finally:
+        cola.shutdown()
+
+
+def test_lote_abandonado_mata_las_firmas(tmp_path):
+    cola = _cola(tmp_path, timeout=60)
+    try:
+        documentos = _lote(tmp_path, b'%PDF uno', b'SLOW', b'%PDF nunca')
+        resultados = cola.sign_many(documentos, 'cert.pfx', 'pw')
+        assert next(resultados)[2] is None
+        inicio = time.monotonic()
+        resultados.close()
+        assert time.monotonic() - inicio < 10
+        assert not (tmp_path / '2-firmado.pdf').exists()
+        assert _esperar(cola, _enviar(cola, b'%PDF suelto'))['status'] == DONE
+    finally:
+        cola.shutdown()
@@ -0,0 +1,155 @@
+"""Pruebas de auth/models/signed_cache.py."""
+import datetime
+import io
+import os
+import shutil
+import time
+import types
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import BestAvailableEncryption, pkcs12
+from cryptography.x509.oid import NameOID
+
+from auth.models import signed_cache
+from auth.models.sign_jobs import DONE, FINAL_STATES, SigningJobQueue
+from auth.models.signed_cache import SignedOutputCache, certificate_fingerprint
+
+
+class CopySigner:
+    """Firmador falso: copia el PDF."""
+
+    def sign_pdf(self, input_pdf, output_pdf, pfx_path, password):
+        shutil.copyfile(input_pdf, output_pdf)
+
+
+def _pfx(path, password):
+    """PFX autofirmado; devuelve la huella SHA-256 del certificado."""
+    clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nombre = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'pruebas')])
+    ahora = datetime.datetime.now(datetime.timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(nombre).issuer_name(nombre)
+        .public_key(clave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(ahora).not_valid_after(ahora + datetime.timedelta(days=1))
+        .sign(clave, hashes.SHA256())
+    )
+    path.write_bytes(pkcs12.serialize_key_and_certificates(
+        b'pruebas', clave, certificado, None, BestAvailableEncryption(password.encode())
+    ))
+    return certificado.fingerprint(hashes.SHA256()).hex()
+
+
+def _archivo(path, contenido):
+    path.write_bytes(contenido)
+    return str(path)
+
+
+def test_huella_del_certificado(tmp_path):
+    huella = _pfx(tmp_path / 'c.pfx', 'pw')
+    assert certificate_fingerprint(tmp_path / 'c.pfx', 'pw') == huella
+    with pytest.raises(ValueError):
+        certificate_fingerprint(tmp_path / 'c.pfx', 'otra')
+
+
+def test_clave():
+    clave = SignedOutputCache.key('a' * 64, 'b' * 64, {'kind': 'pdf', 'x': 1})
+    assert clave == SignedOutputCache.key('a' * 64, 'b' * 64, {'x': 1, 'kind': 'pdf'})
+    assert clave != SignedOutputCache.key('a' * 64, 'b' * 64, {'kind': 'file'})
+    assert clave != SignedOutputCache.key('a' * 64, 'c' * 64, {'kind': 'pdf', 'x': 1})
+    assert SignedOutputCache.key('a' * 64, 'b' * 64) == SignedOutputCache.key('a' * 64, 'b' * 64, {})
+
+
+def test_get_y_put_con_enlace_duro(tmp_path):
+    cache = SignedOutputCache(str(tmp_path / 'cache'))
+    fuente = _archivo(tmp_path / 'firmado.pdf', b'%PDF firmado')
+    assert not cache.get('ab' * 32, str(tmp_path / 'nada.pdf'))
+    assert not os.path.exists(tmp_path / 'nada.pdf')
+
+    cache.put('ab' * 32, fuente)
+    assert cache._size == len(b'%PDF firmado')
+    destino = tmp_path / 'salida.pdf'
+    assert cache.get('ab' * 32, str(destino))
+    assert destino.read_bytes() == b'%PDF firmado'
+    # Mismo sistema de archivos: ni put ni get copian los datos
+    assert os.stat(destino).st_ino == os.stat(fuente).st_ino == os.stat(cache._path('ab' * 32)).st_ino
+
+    # Una segunda escritura de la misma clave no cambia nada
+    cache.put('ab' * 32, _archivo(tmp_path / 'otro.pdf', b'otro'))
+    assert cache._size == len(b'%PDF firmado')
+    assert open(cache._path('ab' * 32), 'rb').read() == b'%PDF firmado'
+
+
+def test_copia_si_no_hay_enlace_duro(tmp_path, monkeypatch):
+    def sin_enlace(source, dest):
+        raise OSError(18, 'Invalid cross-device link')
+
+    monkeypatch.setattr(signed_cache.os, 'link', sin_enlace)
+    cache = SignedOutputCache(str(tmp_path / 'cache'))
+    fuente = _archivo(tmp_path / 'firmado.pdf', b'%PDF firmado')
+    cache.put('cd' * 32, fuente)
+    destino = tmp_path / 'salida.pdf'
+    assert cache.get('cd' * 32, str(destino))
+    assert destino.read_bytes() == b'%PDF firmado'
+    assert os.stat(destino).st_ino != os.stat(fuente).st_ino
+
+
+def test_put_fallido_no_rompe(tmp_path, caplog):
+    cache = SignedOutputCache(str(tmp_path / 'cache'))
+    cache.put('ef' * 32, str(tmp_path / 'no-existe.pdf'))
+    assert not os.path.exists(cache._path('ef' * 32))
+    assert cache._size == 0
+    assert 'No se pudo guardar la firma en caché' in caplog.text
+
+
+def test_expulsion_lru(tmp_path):
+    cache = SignedOutputCache(str(tmp_path / 'cache'), max_bytes=250)
+    claves = [f'{i:02d}' * 32 for i in range(3)]
+    for i, clave in enumerate(claves[:2]):
+        cache.put(clave, _archivo(tmp_path / f'{i}.pdf', b'x' * 100))
+        os.utime(cache._path(clave), (1000 + i, 1000 + i))
+    # Leer la más antigua la convierte en la más reciente
+    assert cache.get(claves[0], str(tmp_path / 'leida.pdf'))
+
+    cache.put(claves[2], _archivo(tmp_path / '2.pdf', b'x' * 100))
+    assert os.path.exists(cache._path(claves[0]))
+    assert not os.path.exists(cache._path(claves[1]))
+    assert os.path.exists(cache._path(claves[2]))
+    assert cache._size == 200
+
+    # Otro proceso que abre la misma carpeta parte del tamaño real
+    assert SignedOutputCache(str(tmp_path / 'cache'), max_bytes=250)._size == 200
+
+
+def test_acierto_en_la_cola(tmp_path):
+    _pfx(tmp_path / 'c.pfx', 'pw')
+    pfx = (tmp_path / 'c.pfx').read_bytes()
+    cola = SigningJobQueue(tmp_path / 'jobs', CopySigner, max_workers=1, memory_dir='',
+                           cache=SignedOutputCache(str(tmp_path / 'cache')))
+
+    def firmar(pdf, password='pw'):
+        job = cola.submit('ana@example.com', types.SimpleNamespace(stream=io.BytesIO(pdf)),
+                          types.SimpleNamespace(stream=io.BytesIO(pfx)), password)
+        fin = time.monotonic() + 20
+        while job['status'] not in FINAL_STATES and time.monotonic() < fin:
+            time.sleep(0.05)
+            job = cola.get(job['id'])
+        return job
+
+    try:
+        primero = firmar(b'%PDF hola')
+        assert primero['status'] == DONE and not primero['cached']
+        segundo = firmar(b'%PDF hola')
+        assert segundo['status'] == DONE and segundo['cached']
+        with open(cola.result_path(segundo['id']), 'rb') as f:
+            assert f.read() == b'%PDF hola'
+        # Otro documento u otra contraseña no aciertan
+        assert not firmar(b'%PDF otro')['cached']
+        # Con otra contraseña el PFX no abre: se firma (y falla) en IronPDF, no en la caché
+        assert not firmar(b'%PDF hola', password='mala')['cached']
+    finally:
+        cola.shutdown()
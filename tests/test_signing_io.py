@@ -0,0 +1,71 @@
+"""Pruebas de SigningWorkspace (auth/models/signing_io.py)."""
+import errno
+import io
+import zipfile
+
+from auth.models import signing_io
+from auth.models.signing_io import SigningWorkspace, zip_stream
+
+
+def test_presupuesto_de_memoria(tmp_path):
+    primero = SigningWorkspace(60, memory_dir=str(tmp_path), memory_total=100)
+    segundo = SigningWorkspace(60, memory_dir=str(tmp_path), memory_total=100)
+    assert primero.in_memory and not segundo.in_memory
+    primero.cleanup()
+    segundo.cleanup()
+    assert signing_io._memory_reserved == 0
+    tercero = SigningWorkspace(60, memory_dir=str(tmp_path), memory_total=100)
+    assert tercero.in_memory
+    tercero.cleanup()
+
+
+def test_tmpfs_lleno_pasa_a_disco(tmp_path):
+    workspace = SigningWorkspace(10, memory_dir=str(tmp_path))
+    assert workspace.in_memory
+    workspace.save_stream('cert.pfx', io.BytesIO(b'pfx'))
+    intentos = []
+
+    def copia_sin_espacio(source, path):
+        intentos.append(path)
+        if len(intentos) == 1:
+            with open(path, 'wb') as f:
+                f.write(source.read(2))
+            raise OSError(errno.ENOSPC, 'No space left on device')
+        with open(path, 'wb') as f:
+            f.write(source.read())
+        return 'ok'
+
+    source = io.BytesIO(b'cabecera%PDF')
+    source.read(8)
+    assert workspace.save_stream('input.pdf', source, copia_sin_espacio) == 'ok'
+    assert not workspace.in_memory
+    assert not workspace.path.startswith(str(tmp_path))
+    with open(workspace.file('input.pdf'), 'rb') as f:
+        assert f.read() == b'%PDF'
+    with open(workspace.file('cert.pfx'), 'rb') as f:
+        assert f.read() == b'pfx'
+    assert signing_io._memory_reserved == 0
+    workspace.cleanup()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_zip_en_streaming(tmp_path):
+    grande = tmp_path / 'grande.pdf'
+    grande.write_bytes(bytes(range(256)) * 4096)
+    emitidos = []
+
+    def entradas():
+        yield 'a_firmado.pdf', str(grande)
+        # La primera entrada ya salió antes de pedir la segunda
+        emitidos.append(len(bloques))
+        yield 'errores.txt', b'b.pdf: fallo\n'
+
+    bloques = []
+    for bloque in zip_stream(entradas(), chunk_size=64 * 1024):
+        bloques.append(bloque)
+    assert emitidos[0] > 1 and all(len(b) <= 1024 * 1024 for b in bloques)
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(bloques))) as zf:
+        assert zf.namelist() == ['a_firmado.pdf', 'errores.txt']
+        assert zf.read('a_firmado.pdf') == grande.read_bytes()
+        assert zf.read('errores.txt') == b'b.pdf: fallo\n'
@@ -0,0 +1,99 @@
+"""Pruebas de core/spool.py."""
+import time
+
+from config import Config
+from core.spool import OfflineSpool
+from server.server import ChatServer
+
+
+def _buzon(n=0):
+    return OfflineSpool.buzon(f'token-{n}')
+
+
+def test_token_nuevo_valido():
+    token = OfflineSpool.nuevo_token()
+    assert OfflineSpool.es_token_valido(token)
+    assert not OfflineSpool.es_token_valido('new')
+    assert OfflineSpool.buzon(token) != token
+
+
+def test_privados_y_posicion_al_volver(tmp_path):
+    spool = OfflineSpool(tmp_path)
+    primera = spool.reclamar('ana', _buzon())
+    assert primera.privados == [] and primera.sala is None
+    # Con dos conexiones abiertas, solo cuenta la última en irse
+    assert spool.reclamar('ana', _buzon()) is not None
+    spool.marcar_desconectado(_buzon(), 'otra', 5)
+    spool.marcar_desconectado(_buzon(), 'general', 10)
+    assert spool.buzon_de('ana') == _buzon()
+    spool.encolar(_buzon(), 'hola')
+
+    ausencia = spool.reclamar('ana', _buzon())
+    assert [texto for _, texto in ausencia.privados] == ['hola']
+    assert (ausencia.sala, ausencia.offset) == ('general', 10)
+    assert not spool.tiene_pendientes(_buzon())
+    # Lo pendiente se entrega una sola vez
+    spool.marcar_desconectado(_buzon(), None, None)
+    assert spool.reclamar('ana', _buzon()).privados == []
+
+
+def test_otro_buzon_no_recibe_el_correo(tmp_path):
+    spool = OfflineSpool(tmp_path)
+    spool.reclamar('ana', _buzon(1))
+    spool.marcar_desconectado(_buzon(1), 'general', 0)
+    spool.encolar(_buzon(1), 'secreto')
+
+    assert spool.reclamar('ana', _buzon(2)) is None
+    assert spool.tiene_pendientes(_buzon(1))
+    assert spool.buzon_de('ana') == _buzon(1)
+
+
+def test_estado_persistente(tmp_path):
+    spool = OfflineSpool(tmp_path)
+    spool.reclamar('ana', _buzon())
+    spool.marcar_desconectado(_buzon(), 'dev', 42)
+    spool.encolar(_buzon(), 'hola')
+
+    reabierto = OfflineSpool(tmp_path)
+    assert reabierto.buzon_de('ana') == _buzon()
+    assert reabierto.reclamar('bea', _buzon(9)) is not None
+    assert reabierto.reclamar('ana', _buzon(9)) is None
+    ausencia = reabierto.reclamar('ana', _buzon())
+    assert (ausencia.sala, ausencia.offset) == ('dev', 42)
+    assert [texto for _, texto in ausencia.privados] == ['hola']
+
+
+def test_buzon_caducado_libera_el_nickname(tmp_path):
+    spool = OfflineSpool(tmp_path, ttl=60)
+    spool.reclamar('ana', _buzon(1))
+    spool.marcar_desconectado(_buzon(1), 'general', 0)
+    spool.encolar(_buzon(1), 'viejo', timestamp=time.time() - 120)
+    spool._buzones[_buzon(1)].visto -= 120
+
+    assert spool.buzon_de('ana') is None
+    ausencia = spool.reclamar('ana', _buzon(2))
+    assert ausencia is not None and ausencia.privados == []
+    assert not (tmp_path / f'{_buzon(1)}.estado').exists()
+
+
+def test_limites_de_la_cola(tmp_path):
+    spool = OfflineSpool(tmp_path, max_mensajes=4)
+    spool.reclamar('ana', _buzon())
+    spool.marcar_desconectado(_buzon(), None, None)
+    for i in range(10):
+        spool.encolar(_buzon(), f'm{i}')
+    privados = [texto for _, texto in spool.reclamar('ana', _buzon()).privados]
+    assert len(privados) <= 4
+    assert privados[-1] == 'm9'
+
+
+def test_sin_historial_no_se_abren_buzones(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(Config, 'SPOOL_ENABLED', True)
+    monkeypatch.setattr(Config, 'SPOOL_DIR', tmp_path / 'spool')
+    assert ChatServer._crear_spool(None) is None
+    assert 'CHAT_HISTORY_ENABLED' in caplog.text
+    assert not (tmp_path / 'spool').exists()
+
+    assert isinstance(ChatServer._crear_spool(object()), OfflineSpool)
+    monkeypatch.setattr(Config, 'SPOOL_ENABLED', False)
+    assert ChatServer._crear_spool(object()) is None
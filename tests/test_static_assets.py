@@ -0,0 +1,98 @@
+"""Pruebas de scripts/build_static.py y auth/models/static_assets.py."""
+import gzip
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+from flask import Flask, url_for
+
+from auth.models.static_assets import init_static_assets
+
+_spec = importlib.util.spec_from_file_location(
+    'build_static',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'build_static.py'),
+)
+build_static = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(build_static)
+
+CSS = 'body {\n    color: red;\n}\n'
+JS = 'function hola(nombre) {\n    return "hola " + nombre;\n}\n'
+
+
+def _estaticos(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    (static / 'chat.css').write_text(CSS, encoding='utf-8')
+    (static / 'js' / 'chat.js').write_text(JS, encoding='utf-8')
+    (static / 'logo.png').write_bytes(b'png')
+    return static
+
+
+def test_minificar_sin_dependencias(monkeypatch):
+    monkeypatch.setattr(build_static, 'rcssmin', None)
+    monkeypatch.setattr(build_static, 'rjsmin', None)
+    assert build_static.minificar(Path('a.css'), CSS) == CSS
+    assert build_static.minificar(Path('a.js'), JS) == JS
+
+
+def test_compilar(tmp_path, capsys):
+    static = _estaticos(tmp_path)
+    manifiesto = build_static.compilar(static)
+    dist = static / 'dist'
+
+    assert set(manifiesto) == {'chat.css', 'js/chat.js'}
+    assert json.loads((dist / 'manifest.json').read_text()) == manifiesto
+    css = dist / manifiesto['chat.css']
+    assert manifiesto['js/chat.js'].startswith('js/chat.') and css.name.startswith('chat.')
+    if build_static.rcssmin is not None:
+        assert len(css.read_bytes()) < len(CSS)
+    assert gzip.decompress((dist / (manifiesto['chat.css'] + '.gz')).read_bytes()) == css.read_bytes()
+    assert 'chat.css' in capsys.readouterr().out
+
+    # Mismo contenido: mismos nombres y mismos bytes comprimidos
+    gz = (dist / (manifiesto['chat.css'] + '.gz')).read_bytes()
+    assert build_static.compilar(static, limpiar=True) == manifiesto
+    assert (dist / (manifiesto['chat.css'] + '.gz')).read_bytes() == gz
+
+    # Otro contenido: otro nombre; --clean borra la versión anterior
+    (static / 'chat.css').write_text(CSS + 'p { margin: 0 }\n', encoding='utf-8')
+    nuevo = build_static.compilar(static, limpiar=True)
+    assert nuevo['chat.css'] != manifiesto['chat.css']
+    assert not css.exists()
+
+
+def test_servir_compilados(tmp_path):
+    static = _estaticos(tmp_path)
+    manifiesto = build_static.compilar(static)
+    app = Flask(__name__, static_folder=str(static))
+    assert init_static_assets(app, static / 'dist' / 'manifest.json') is not None
+    cliente = app.test_client()
+
+    with app.test_request_context():
+        url = url_for('static', filename='chat.css')
+        assert url == f"/static/dist/{manifiesto['chat.css']}"
+        assert url_for('static', filename='logo.png') == '/static/logo.png'
+
+    resp = cliente.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip' and resp.mimetype == 'text/css'
+    assert 'immutable' in resp.headers['Cache-Control'] and 'Accept-Encoding' in resp.headers['Vary']
+    assert gzip.decompress(resp.data) == (static / 'dist' / manifiesto['chat.css']).read_bytes()
+
+    resp = cliente.get(url)
+    assert 'Content-Encoding' not in resp.headers
+    assert resp.data == (static / 'dist' / manifiesto['chat.css']).read_bytes()
+    resp.close()
+
+    # Lo que no tiene hash se sirve como siempre
+    resp = cliente.get('/static/logo.png')
+    assert resp.data == b'png' and 'immutable' not in resp.headers.get('Cache-Control', '')
+    resp.close()
+
+
+def test_sin_manifiesto(tmp_path, capsys):
+    app = Flask(__name__, static_folder=str(_estaticos(tmp_path)))
+    assert init_static_assets(app, tmp_path / 'static' / 'dist' / 'manifest.json') is None
+    assert 'Estáticos sin compilar' in capsys.readouterr().out
+    with app.test_request_context():
+        assert url_for('static', filename='chat.css') == '/static/chat.css'
@@ -11,6 +11,7 @@ Este servidor proporciona:
 """
 import os
 import sys
+from datetime import timedelta
 from flask import Flask
 from dotenv import load_dotenv
 
@@ -21,16 +22,23 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from auth.controllers.auth_routes import auth_bp, init_auth_routes
 
 
 def create_web_app():
     """
     Factory function para crear y configurar la aplicación Flask.
     
+    Las rutas se importan aquí y no al cargar el módulo: importarlas crea el
+    firmador (y sus renderers), que sin WEB_SERVER_PRELOAD debe crearse en
+    cada worker y no en el proceso maestro de gunicorn.
+    
     Returns:
         Aplicación Flask configurada
     """
+    from auth.controllers.auth_routes import auth_bp, init_auth_routes
+    from auth.models.session_store import ServerSideSessionInterface, create_session_backend
+    from auth.models.static_assets import init_static_assets
+    
     # Crear aplicación Flask con configuración de templates y static
     app = Flask(
         __name__,
@@ -40,7 +48,8 @@ def create_web_app():
     )
     
     # ===== CONFIGURACIÓN DE LA APLICACIÓN =====
-    app.config['SECRET_KEY'] = Config.OAUTH_SECRET_KEY
+    app.config['SECRET_KEY'] = Config.get_secret_key()
+    app.permanent_session_lifetime = timedelta(seconds=Config.SESSION_LIFETIME)
     app.config['SESSION_COOKIE_NAME'] = 'chat_oauth_session'
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
@@ -51,6 +60,14 @@ def create_web_app():
     app.config['GOOGLE_CLIENT_ID'] = Config.GOOGLE_CLIENT_ID
     app.config['GOOGLE_CLIENT_SECRET'] = Config.GOOGLE_CLIENT_SECRET
     
+    # ===== SESIONES EN EL SERVIDOR =====
+    if Config.SESSION_BACKEND != 'cookie':
+        backend = create_session_backend(
+            Config.SESSION_BACKEND,
+            Config.SESSION_DB if Config.SESSION_BACKEND == 'sqlite' else Config.SESSION_DIR
+        )
+        app.session_interface = ServerSideSessionInterface(backend)
+    
     # ===== VALIDACIÓN DE CREDENCIALES =====
     if not app.config['GOOGLE_CLIENT_ID'] or not app.config['GOOGLE_CLIENT_SECRET']:
         print("\n" + "="*70)
@@ -63,6 +80,9 @@ def create_web_app():
         print("\n   Consulta el archivo README.md para más información.")
         print("="*70 + "\n")
     
+    # ===== ESTÁTICOS COMPILADOS (hash + caché immutable) =====
+    init_static_assets(app, Config.STATIC_MANIFEST)
+    
     # ===== INICIALIZAR RUTAS DE AUTENTICACIÓN =====
     init_auth_routes(app)
     
@@ -72,10 +92,84 @@ def create_web_app():
     return app
 
 
+def run_production(workers=None, threads=None):
+    """
+    Sirve create_web_app() con gunicorn (workers gthread, precarga opcional y apagado ordenado).
+    
+    Sin WEB_SERVER_PRELOAD (por defecto) cada worker crea su propia app, con
+    sus propios hilos y conexiones. Con ella, la app se crea una vez en el
+    proceso maestro y los workers la heredan al hacer fork; el hook post_fork
+    rearranca en cada worker los hilos que no sobreviven al fork.
+    
+    Args:
+        workers: Procesos worker (default: Config.WEB_SERVER_WORKERS)
+        threads: Hilos por worker (default: Config.WEB_SERVER_THREADS)
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ Error: gunicorn es necesario para el modo producción (solo Linux/macOS).")
+        print("   Instala las dependencias: pip install -r requirements.txt")
+        sys.exit(1)
+    
+    class ProductionServer(BaseApplication):
+        """Aplicación gunicorn embebida que crea la app con create_web_app()."""
+        
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            # gunicorn la invoca en el maestro con preload_app y en cada worker sin ella
+            return create_web_app()
+    
+    def post_fork(server, worker):
+        if Config.WEB_SERVER_PRELOAD:
+            from auth.controllers.auth_routes import after_fork
+            after_fork()
+    
+    options = {
+        'bind': f'{Config.WEB_SERVER_HOST}:{Config.WEB_SERVER_PORT}',
+        'workers': workers or Config.WEB_SERVER_WORKERS,
+        'threads': threads or Config.WEB_SERVER_THREADS,
+        'worker_class': 'gthread',
+        # Sin precarga cada worker crea su app y todos comparten la SECRET_KEY
+        # a través de Config.get_secret_key()
+        'preload_app': Config.WEB_SERVER_PRELOAD,
+        'post_fork': post_fork,
+        'timeout': Config.WEB_SERVER_TIMEOUT,
+        'graceful_timeout': Config.WEB_SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': 5,
+        'max_requests': Config.WEB_SERVER_MAX_REQUESTS,
+        'max_requests_jitter': Config.WEB_SERVER_MAX_REQUESTS // 10,
+        'accesslog': '-',
+    }
+    print(f"🚀 Modo producción: {options['workers']} workers × {options['threads']} hilos "
+          f"en {options['bind']} (preload={options['preload_app']})")
+    ProductionServer(options).run()
+
+
 def main():
     """
     Función principal para ejecutar el servidor web.
     """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Servidor web OAuth del chat')
+    parser.add_argument('--production', action='store_true',
+                        help='Servir con gunicorn en lugar del servidor de desarrollo de Flask')
+    parser.add_argument('--workers', type=int, help=f'Workers en producción (default: {Config.WEB_SERVER_WORKERS})')
+    parser.add_argument('--threads', type=int, help=f'Hilos por worker (default: {Config.WEB_SERVER_THREADS})')
+    args = parser.parse_args()
+    
+    if args.production:
+        run_production(args.workers, args.threads)
+        return
+    
     app = create_web_app()
     
     print("\n" + "="*70)
@@ -96,7 +190,7 @@ def main():
     print("      → python websocket_server.py")
     print("="*70 + "\n")
     
-    # Ejecutar la aplicación en modo debug
+    # Ejecutar la aplicación en modo debug (desarrollo; ver --production)
     app.run(
         debug=True,
         host=Config.WEB_SERVER_HOST,
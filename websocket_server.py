@@ -10,16 +10,17 @@ import ssl
 import logging
 import sys
 import os
+import signal
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
+from core.logging_setup import configurar_logging
+from core.profiler import iniciar_perfil, muestrear_tareas
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s: %(message)s'
-)
+logger = logging.getLogger("websocket_server")
 
 
 class WebSocketChatBridge:
@@ -42,27 +43,35 @@ class WebSocketChatBridge:
         context.verify_mode = ssl.CERT_NONE
         return context
     
+    @staticmethod
+    def _sala_solicitada(websocket):
+        """Sala indicada en la URL del WebSocket (ws://host:5002/?room=nombre)."""
+        request = getattr(websocket, 'request', None)
+        path = request.path if request is not None else getattr(websocket, 'path', '')
+        salas = parse_qs(urlsplit(path).query).get('room')
+        return salas[0] if salas else None
+    
     async def connect_to_chat_server(self):
         """Establece conexión TCP/SSL con el servidor de chat."""
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(10)
             sock.connect((self.chat_host, self.chat_port))
-            logging.info(f"✅ Conectado a {self.chat_host}:{self.chat_port}")
+            logger.info("✅ Conectado a %s:%s", self.chat_host, self.chat_port)
             
             if self.enable_ssl:
                 ssl_context = self._create_ssl_context()
                 sock = ssl_context.wrap_socket(sock, server_hostname=self.chat_host)
-                logging.info("🔐 Conexión SSL establecida con el servidor de chat")
-                logging.info(f"🔐 Versión SSL: {sock.version()}")
-                logging.info(f"🔐 Cifrado: {sock.cipher()}")
+                logger.info("🔐 Conexión SSL establecida con el servidor de chat")
+                logger.info("🔐 Versión SSL: %s", sock.version())
+                logger.info("🔐 Cifrado: %s", sock.cipher())
             
             # Configurar socket como no bloqueante DESPUÉS del handshake SSL
             sock.setblocking(False)
             return sock
             
         except Exception as e:
-            logging.error(f"❌ Error conectando al servidor de chat: {e}")
+            logger.error("❌ Error conectando al servidor de chat: %s", e)
             raise
     
     async def handle_client(self, websocket):
@@ -71,7 +80,7 @@ class WebSocketChatBridge:
         client_address = websocket.remote_address
         
         try:
-            logging.info(f"🌐 Cliente WebSocket conectado desde {client_address}")
+            logger.info("🌐 Cliente WebSocket conectado desde %s", client_address)
             
             # Conectar al servidor de chat
             chat_socket = await self.connect_to_chat_server()
@@ -82,7 +91,7 @@ class WebSocketChatBridge:
                 with open(server_public_key_path, 'r') as f:
                     server_public_key_pem = f.read().strip()
             else:
-                logging.error(f"❌ No se encontró la clave pública: {server_public_key_path}")
+                logger.error("❌ No se encontró la clave pública: %s", server_public_key_path)
                 await websocket.close()
                 return
             
@@ -90,19 +99,21 @@ class WebSocketChatBridge:
             
             # Función auxiliar para leer del socket SSL
             async def read_from_socket(sock, size):
-                """Lee datos del socket de forma asíncrona."""
+                """Lee datos del socket de forma asíncrona.
+                
+                Returns:
+                    Los datos leídos, b'' si el servidor cerró la conexión o None
+                    si aún no hay datos (SSL sin registro completo o socket sin datos)
+                """
                 try:
                     if self.enable_ssl:
                         # Para sockets SSL, usar recv en executor
                         return await loop.run_in_executor(None, sock.recv, size)
                     else:
                         return await loop.sock_recv(sock, size)
-                except ssl.SSLWantReadError:
-                    await asyncio.sleep(0.01)
-                    return b''
-                except BlockingIOError:
+                except (ssl.SSLWantReadError, BlockingIOError):
                     await asyncio.sleep(0.01)
-                    return b''
+                    return None
             
             async def write_to_socket(sock, data):
                 """Escribe datos al socket de forma asíncrona."""
@@ -127,9 +138,12 @@ class WebSocketChatBridge:
                     
                     while b'\n' not in buffer and attempts < max_attempts:
                         data = await read_from_socket(chat_socket, self.buffer_size)
+                        if data == b'':
+                            logger.error("❌ El servidor cerró la conexión durante la autenticación")
+                            return None
                         if data:
                             buffer += data
-                            logging.debug(f"📦 Recibidos {len(data)} bytes, buffer: {len(buffer)} bytes")
+                            logger.debug("📦 Recibidos %s bytes, buffer: %s bytes", len(data), len(buffer))
                         else:
                             await asyncio.sleep(0.1)
                             attempts += 1
@@ -141,55 +155,64 @@ class WebSocketChatBridge:
                     try:
                         return line.decode('utf-8').strip()
                     except UnicodeDecodeError as e:
-                        logging.error(f"❌ Error decodificando línea: {e}")
-                        logging.error(f"📄 Datos (hex): {line[:50].hex()}...")
+                        logger.error("❌ Error decodificando línea: %s", e)
+                        logger.error("📄 Datos (hex): %s...", line[:50].hex())
                         return None
                 
                 # 1. Esperar PUBLIC_KEY_READY
-                logging.info("⏳ Esperando PUBLIC_KEY_READY...")
+                logger.info("⏳ Esperando PUBLIC_KEY_READY...")
                 message = await read_next_line()
                 if message != 'PUBLIC_KEY_READY':
-                    logging.error(f"❌ Se esperaba PUBLIC_KEY_READY, recibido: {message}")
+                    logger.error("❌ Se esperaba PUBLIC_KEY_READY, recibido: %s", message)
                     return False
                 await websocket.send(message)
-                logging.info("✅ PUBLIC_KEY_READY recibido y enviado al cliente")
+                logger.info("✅ PUBLIC_KEY_READY recibido y enviado al cliente")
                 
                 # 2. Esperar CLIENT_PUBLIC_KEY
-                logging.info("⏳ Esperando CLIENT_PUBLIC_KEY...")
+                logger.info("⏳ Esperando CLIENT_PUBLIC_KEY...")
                 message = await read_next_line()
                 if message != 'CLIENT_PUBLIC_KEY':
-                    logging.error(f"❌ Se esperaba CLIENT_PUBLIC_KEY, recibido: {message}")
+                    logger.error("❌ Se esperaba CLIENT_PUBLIC_KEY, recibido: %s", message)
                     return False
                 await websocket.send(message)
-                logging.info("✅ CLIENT_PUBLIC_KEY recibido")
+                logger.info("✅ CLIENT_PUBLIC_KEY recibido")
                 
                 # Enviar clave pública del servidor al cliente web
                 await websocket.send(server_public_key_pem)
-                logging.info("📤 Clave pública del servidor enviada al cliente web")
+                logger.info("📤 Clave pública del servidor enviada al cliente web")
                 
                 # Esperar clave pública del cliente web
                 client_public_key = await websocket.recv()
-                logging.info("📥 Clave pública del cliente web recibida")
+                logger.info("📥 Clave pública del cliente web recibida")
+                
+                # Seleccionar sala desde la URL si el saludo no la trae ya
+                sala = self._sala_solicitada(websocket)
+                if sala and client_public_key.startswith('HELLO ') and ' room=' not in client_public_key:
+                    client_public_key += f' room={sala}'
                 
                 # Enviar al servidor TCP
                 await write_to_socket(
                     chat_socket,
                     (client_public_key + '\n').encode('utf-8')
                 )
-                logging.info("📤 Clave pública del cliente enviada al servidor TCP")
+                logger.info("📤 Clave pública del cliente enviada al servidor TCP")
                 
-                # 3. Esperar NICK
-                logging.info("⏳ Esperando NICK...")
+                # 3. Esperar NICK (los clientes con protocolo 2+ reciben antes PROTOCOL)
+                logger.info("⏳ Esperando NICK...")
                 message = await read_next_line()
+                if message and message.startswith('PROTOCOL '):
+                    await websocket.send(message)
+                    logger.info("🤝 Protocolo negociado: %s", message)
+                    message = await read_next_line()
                 if message != 'NICK':
-                    logging.error(f"❌ Se esperaba NICK, recibido: {message}")
+                    logger.error("❌ Se esperaba NICK, recibido: %s", message)
                     return False
                 await websocket.send(message)
-                logging.info("✅ NICK recibido y enviado al cliente")
+                logger.info("✅ NICK recibido y enviado al cliente")
                 
                 # Esperar nickname cifrado del cliente
                 encrypted_nick = await websocket.recv()
-                logging.info("📥 Nickname cifrado recibido del cliente")
+                logger.info("📥 Nickname cifrado recibido del cliente")
                 
                 # Enviar al servidor TCP
                 await write_to_socket(
@@ -198,17 +221,17 @@ class WebSocketChatBridge:
                 )
                 
                 # 4. Esperar PASSWORD
-                logging.info("⏳ Esperando PASSWORD...")
+                logger.info("⏳ Esperando PASSWORD...")
                 message = await read_next_line()
                 if message != 'PASSWORD':
-                    logging.error(f"❌ Se esperaba PASSWORD, recibido: {message}")
+                    logger.error("❌ Se esperaba PASSWORD, recibido: %s", message)
                     return False
                 await websocket.send(message)
-                logging.info("✅ PASSWORD recibido y enviado al cliente")
+                logger.info("✅ PASSWORD recibido y enviado al cliente")
                 
                 # Esperar password cifrado del cliente
                 encrypted_pass = await websocket.recv()
-                logging.info("📥 Password cifrado recibido del cliente")
+                logger.info("📥 Password cifrado recibido del cliente")
                 
                 # Enviar al servidor TCP
                 await write_to_socket(
@@ -217,31 +240,36 @@ class WebSocketChatBridge:
                 )
                 
                 # 5. Esperar AUTH_SUCCESS, AUTH_FAILED o SERVIDOR_LLENO
-                logging.info("⏳ Esperando resultado de autenticación...")
+                logger.info("⏳ Esperando resultado de autenticación...")
                 message = await read_next_line()
                 if message not in ['AUTH_SUCCESS', 'AUTH_FAILED', 'SERVIDOR_LLENO']:
-                    logging.error(f"❌ Respuesta de autenticación inesperada: {message}")
+                    logger.error("❌ Respuesta de autenticación inesperada: %s", message)
                     return False
                 
                 await websocket.send(message)
-                logging.info(f"✅ Autenticación: {message}")
+                logger.info("✅ Autenticación: %s", message)
+                # Lo que llegó detrás de AUTH_SUCCESS (INBOX, primeros mensajes)
+                # lo reenvía tcp_to_ws
+                nonlocal pendiente_tcp
+                pendiente_tcp = buffer
                 return message == 'AUTH_SUCCESS'
             
             # Ejecutar protocolo de autenticación
+            pendiente_tcp = b''
             auth_success = await handle_auth_protocol()
             
             if not auth_success:
-                logging.warning("⚠️  Autenticación fallida")
+                logger.warning("⚠️  Autenticación fallida")
                 return
             
-            logging.info("✅ Cliente autenticado correctamente")
+            logger.info("✅ Cliente autenticado correctamente")
             
             # Manejar mensajes del chat
             async def ws_to_tcp():
                 """Lee mensajes del WebSocket y los envía al TCP."""
                 try:
                     async for message in websocket:
-                        logging.debug(f"📤 WS -> TCP: {len(message)} bytes")
+                        logger.debug("📤 WS -> TCP: %s bytes", len(message))
                         if not message.endswith('\n'):
                             message += '\n'
                         await write_to_socket(
@@ -249,40 +277,43 @@ class WebSocketChatBridge:
                             message.encode('utf-8')
                         )
                 except websockets.exceptions.ConnectionClosed:
-                    logging.info("🔌 WebSocket cerrado")
+                    logger.info("🔌 WebSocket cerrado")
                 except Exception as e:
-                    logging.error(f"❌ Error WS -> TCP: {e}")
+                    logger.error("❌ Error WS -> TCP: %s", e)
             
             async def tcp_to_ws():
                 """Lee mensajes del TCP y los envía al WebSocket."""
                 try:
-                    buffer = b''
+                    buffer = pendiente_tcp
                     while True:
-                        data = await read_from_socket(chat_socket, self.buffer_size)
-                        
-                        if not data:
-                            # Si no hay datos, esperar un poco
-                            await asyncio.sleep(0.05)
-                            continue
-                        
-                        buffer += data
-                        
                         while b'\n' in buffer:
                             line, buffer = buffer.split(b'\n', 1)
                             try:
                                 message = line.decode('utf-8').strip()
                             except UnicodeDecodeError as e:
-                                logging.error(f"❌ Error decodificando mensaje: {e}")
+                                logger.error("❌ Error decodificando mensaje: %s", e)
                                 continue
                             
                             if message:
-                                logging.debug(f"📥 TCP -> WS: {message[:50]}...")
+                                if logger.isEnabledFor(logging.DEBUG):
+                                    logger.debug("📥 TCP -> WS: %s...", message[:50])
                                 await websocket.send(message)
                         
+                        data = await read_from_socket(chat_socket, self.buffer_size)
+                        if data is None:
+                            # Sin datos todavía (read_from_socket ya esperó)
+                            continue
+                        if not data:
+                            # EOF real: el servidor cerró la conexión (p. ej. tras un RECONNECT)
+                            await websocket.close()
+                            return
+                        
+                        buffer += data
+                        
                 except asyncio.CancelledError:
                     pass
                 except Exception as e:
-                    logging.error(f"❌ Error TCP -> WS: {e}")
+                    logger.error("❌ Error TCP -> WS: %s", e)
             
             # Ejecutar ambas tareas en paralelo
             await asyncio.gather(
@@ -291,7 +322,7 @@ class WebSocketChatBridge:
             )
             
         except Exception as e:
-            logging.error(f"❌ Error manejando cliente {client_address}: {e}")
+            logger.error("❌ Error manejando cliente %s: %s", client_address, e)
             import traceback
             traceback.print_exc()
         finally:
@@ -300,18 +331,39 @@ class WebSocketChatBridge:
                     chat_socket.close()
                 except:
                     pass
-            logging.info(f"👋 Cliente {client_address} desconectado")
+            logger.info("👋 Cliente %s desconectado", client_address)
+    
+    def perfilar(self):
+        """Lanza una ventana de muestreo de hilos y tareas de asyncio.
+        
+        Debe llamarse desde el bucle de eventos (p. ej. con SIGUSR2).
+        """
+        loop = asyncio.get_running_loop()
+        duracion = Config.PROFILE_SECONDS
+        intervalo = Config.PROFILE_INTERVAL_MS / 1000
+        tareas = asyncio.run_coroutine_threadsafe(muestrear_tareas(duracion, intervalo), loop)
+        try:
+            iniciar_perfil(
+                duracion, Config.PROFILE_DIR, 'websocket_bridge', Config.PROFILE_FORMAT, intervalo,
+                extra=tareas.result
+            )
+        except (RuntimeError, ValueError) as e:
+            tareas.cancel()
+            logger.warning("⚠️  %s", e)
     
     async def start(self):
         """Inicia el servidor WebSocket."""
-        logging.info("="*70)
-        logging.info("🌐 SERVIDOR WEBSOCKET - PUENTE CHAT")
-        logging.info("="*70)
-        logging.info(f"📍 WebSocket en:     ws://localhost:{self.ws_port}")
-        logging.info(f"🔗 Servidor chat:    {self.chat_host}:{self.chat_port}")
-        logging.info(f"🔐 SSL/TLS:          {'Habilitado' if self.enable_ssl else 'Deshabilitado'}")
-        logging.info("="*70)
-        logging.info("✅ Puente WebSocket listo. Presiona Ctrl+C para detener.\n")
+        logger.info("="*70)
+        logger.info("🌐 SERVIDOR WEBSOCKET - PUENTE CHAT")
+        logger.info("="*70)
+        logger.info("📍 WebSocket en:     ws://localhost:%s", self.ws_port)
+        logger.info("🔗 Servidor chat:    %s:%s", self.chat_host, self.chat_port)
+        logger.info("🔐 SSL/TLS:          %s", 'Habilitado' if self.enable_ssl else 'Deshabilitado')
+        logger.info("="*70)
+        logger.info("✅ Puente WebSocket listo. Presiona Ctrl+C para detener.\n")
+        
+        if hasattr(signal, 'SIGUSR2'):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, self.perfilar)
         
         async with websockets.serve(
             self.handle_client,
@@ -325,6 +377,7 @@ class WebSocketChatBridge:
 
 async def main():
     """Función principal."""
+    configurar_logging()
     bridge = WebSocketChatBridge()
     await bridge.start()
 